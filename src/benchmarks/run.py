@@ -0,0 +1,413 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               run.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        Benchmark suite for the hot paths of the GUI and the
+#                       core package, with stored baselines and a regression
+#                       threshold.
+#   Application Notes:  Runs headless: the plot is drawn on an Agg canvas and
+#                       uploads go to a loop:// serial port. Entries need a
+#                       display; without one get_vals() reads Tcl variables
+#                       instead, which cost the same Tcl round trip per field.
+#                       Baselines are machine-specific, so regenerate them with
+#                       --update-baseline after changing machines. Timings
+#                       drift between runs, so baselines are the median of
+#                       --rounds runs of the suite, and a benchmark only fails
+#                       when it is still too slow after as many runs.
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+## DEPENDENCIES
+###############################################################################
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))           # src/, for roomshaker and rscore
+
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import roomshaker
+from rscore import params
+from rscore.comms import sport
+from rscore.config import num_filters, FS
+from rscore.designer import design
+from rscore.dsp import log_grid, cascade_response, stack_cascades, batch_magnitude, create_allpass
+
+
+###############################################################################
+## BENCHMARKS
+###############################################################################
+
+
+BASELINE = os.path.join(HERE, "baseline.json")
+GRID_SIZES = (256, 1024, 4096, 16384)
+FILE_ROWS = 10000
+LIBRARY_SIZE = 2000
+COMPARE_SIZE = 500
+MEASUREMENT_POINTS = 262144
+LARGE_DEVICE_FILTERS = 64
+DEVICE_SAMPLES = 4096
+
+# Function to make a realistic preset: a low shelf followed by peaking filters
+def preset(seed=0):
+    rng = np.random.default_rng(seed)
+    coefs = design("peaking", rng.uniform(20, 200, num_filters), q=rng.uniform(0.5, 5, num_filters), gain_db=rng.uniform(-12, 6, num_filters))
+    coefs[0] = design("lowshelf", 40, gain_db=6, slope=1)[0]
+    return coefs.tolist()
+
+# Function to make a copy of a preset with one stage edited, as when a single field is typed into
+def edited(values, stage=3):
+    values = [list(row) for row in values]
+    values[stage] = design("peaking", 63, q=2, gain_db=-4)[0].tolist()
+    return values
+
+# Each group below yields (name, function to time); set-up happens before the first yield and clean-up after the last
+
+def cascade_benchmarks():
+    from scipy import signal as sp_signal
+    values = preset()
+
+    for n in GRID_SIZES:
+        freqs = log_grid(1, 400, n)
+        yield f"cascade_response[{n}]", lambda freqs=freqs: cascade_response(values, FS, freqs)
+
+    # The per-stage freqz loop the plot used before the cascade was vectorized, for reference
+    def freqz_loop(freqs):
+        H = np.ones(len(freqs), dtype=complex)
+        for b0, b1, b2, a1, a2 in values:
+            H *= sp_signal.freqz([b0, b1, b2], [1, -a1, -a2], worN=freqs, fs=FS)[1]
+        return H
+    for n in GRID_SIZES:
+        freqs = log_grid(1, 400, n)
+        yield f"freqz_loop[{n}]", lambda freqs=freqs: freqz_loop(freqs)
+
+    # Many presets at once, as in the library's comparison mode
+    batch = stack_cascades([preset(seed) for seed in range(COMPARE_SIZE)])
+    freqs = log_grid()
+    yield f"batch_magnitude[{COMPARE_SIZE} presets]", lambda: batch_magnitude(batch, FS, freqs)
+    yield f"cascade_response_loop[{COMPARE_SIZE} presets]", lambda: [cascade_response(coefs, FS, freqs).magnitude_db for coefs in batch]
+
+    # Pre-upload optimization, on a full preset and on a large device with most of its stages left as pass-through
+    from rscore import cascadeopt
+    sparse = np.vstack((values, np.tile(create_allpass(), (LARGE_DEVICE_FILTERS - num_filters, 1))))
+    yield f"cascadeopt.optimize[{num_filters} filters]", lambda: cascadeopt.optimize(values)
+    yield f"cascadeopt.optimize[{LARGE_DEVICE_FILTERS} filters, {num_filters} active]", lambda: cascadeopt.optimize(sparse)
+
+    # The float32 device model, one preset and the whole comparison batch
+    from rscore import devicemodel
+    signal = np.random.default_rng(0).standard_normal(DEVICE_SAMPLES).astype(np.float32)
+    device = devicemodel.device_coefs(batch)
+    yield f"devicemodel.simulate[1 preset, {DEVICE_SAMPLES} samples]", lambda: devicemodel.simulate(device[0], signal)
+    yield f"devicemodel.simulate[{COMPARE_SIZE} presets, {DEVICE_SAMPLES} samples]", lambda: devicemodel.simulate(device, signal)
+    yield f"devicemodel.analyze[{COMPARE_SIZE} presets]", lambda: devicemodel.analyze(batch)
+
+def plot_benchmarks():
+    roomshaker.load_backend()
+    p = roomshaker.plot(fs=FS)
+    p.build(8, 5, 100)
+    p.attach(FigureCanvasAgg(p.fig))
+
+    # Alternate between two presets that differ in one stage, so every call is a real edit
+    values = preset()
+    p.render(values)
+    next_values = itertools.cycle([edited(values), values]).__next__
+
+    yield "plot.cache.evaluate[one stage edited]", lambda: p.cache.evaluate(next_values())
+    yield "plot.render[one stage edited]", lambda: p.render(next_values())
+    yield "plot.blit", p.blit
+
+    # One frame of dragging a handle: re-design the stage, update the cache and blit
+    p.previous_coefs = values
+    p.handles.sync(values)
+    p.handles.active = 1
+    p.handles.values = [list(row) for row in values]
+    next_target = itertools.cycle([(40.0, -3.0), (45.0, -2.0)]).__next__
+    def drag_frame():
+        p.handles.target = next_target()
+        p.handles.frame()
+    yield "plot.handles.frame", drag_frame
+    p.handles.active = None
+    yield "plot.full_redraw", p.canvas.draw
+
+    # Comparison mode: the curves are part of the background, so moving between them only blits the highlight
+    magnitudes = batch_magnitude(stack_cascades([preset(seed) for seed in range(COMPARE_SIZE)]), FS, p.freqs)
+    p.comparison.show(magnitudes, [str(i) for i in range(COMPARE_SIZE)])
+    p.canvas.draw()
+    next_hovered = itertools.cycle([1, 2]).__next__
+    yield f"plot.comparison.hover[{COMPARE_SIZE} presets]", lambda: p.comparison.set_hovered(next_hovered())
+    yield f"plot.full_redraw[comparing {COMPARE_SIZE} presets]", p.canvas.draw
+
+def entry_benchmarks():
+    import tkinter as tk
+    try:
+        root = tk.Tk()
+        root.withdraw()
+        kind = "Entry"
+    except tk.TclError:
+        root = tk.Tcl()                             # No display
+        kind = "StringVar"
+
+    def field(text):
+        if kind == "StringVar":
+            return tk.StringVar(master=root, value=text)
+        entry = tk.Entry(root)
+        entry.insert(0, text)
+        return entry
+
+    entries = [[field(f"{val:.11f}") for val in row] for row in preset()]
+    yield f"get_vals[{kind}]", lambda: roomshaker.get_vals(entries)
+    if kind == "Entry":
+        root.destroy()
+
+    # The coefficient table the GUI uses: values are parsed on edit, so reading them doesn't touch Tk
+    for count in (num_filters, LARGE_DEVICE_FILTERS):
+        table = roomshaker.coef_table(count=count)
+        yield f"get_vals[coef_table, {count} filters]", lambda table=table: roomshaker.get_vals(table)
+    next_text = itertools.cycle(["0.5", "0.25"]).__next__
+    yield "coef_table.set_text", lambda: table.set_text(count // 2, 0, next_text())
+
+def packet_benchmarks():
+    values = preset()
+    port = sport()
+    packet = port.encode_packet(values[0], 0)
+
+    yield "encode_packet", lambda: port.encode_packet(values[0], 0)
+    yield "encode_frame", lambda: port.encode_frame(packet, 1)
+    yield f"encode_upload[{len(values)} filters]", lambda: port.encode_upload(values, list(range(len(values))))
+
+    port.bind("loop://")
+    yield "upload_filters[loop://]", lambda: port.upload_filters(values, reliable=False, force_full=True)
+    port.close()
+
+    # The device emulator parses and answers every packet, so these include the device's side of the protocol
+    port.bind("rsemu://")
+    yield "upload_filters[rsemu://]", lambda: port.upload_filters(values, reliable=False, force_full=True)
+    yield "upload_filters[rsemu://, reliable]", lambda: port.upload_filters(values, reliable=True, force_full=True)
+    port.close()
+
+def file_benchmarks():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        filename = os.path.join(tmpdir, "large_params.txt")
+        rows = preset() * (FILE_ROWS // num_filters)
+        params.write_params(filename, rows)
+
+        yield f"read_rows[{len(rows)} rows]", lambda: params.read_rows(filename)
+        yield f"load_params[{len(rows)} rows]", lambda: params.load_params(filename)
+        yield f"validate[{len(rows)} rows]", lambda: params.validate(rows, expected_filters=len(rows))
+
+        # The same number of values as a bank of presets
+        from rscore import bank
+        bank_filename = os.path.join(tmpdir, "large.rsbk")
+        bank.write_bank(bank_filename, [(f"preset {i}", rows[i:i+num_filters]) for i in range(0, len(rows), num_filters)])
+        b = bank.bank(bank_filename)
+        yield f"bank.open[{len(b)} presets]", lambda: bank.bank(bank_filename).close()
+        name = b.names[len(b) // 2]
+        yield "bank.lookup", lambda: b[name]
+        b.close()
+
+        # A REW export of a long sweep: linearly spaced FFT bins up to Nyquist
+        from rscore import measurement
+        measurement_filename = os.path.join(tmpdir, "measurement.txt")
+        freqs = np.linspace(0, FS / 2, MEASUREMENT_POINTS)
+        levels = 75 + 6 * np.sin(8 * np.log2(np.maximum(freqs, 1)))
+        with open(measurement_filename, 'w') as f:
+            f.write("* Measurement data measured by REW\nFreq(Hz) SPL(dB) Phase(degrees)\n")
+            f.writelines(f"{freq:.6f} {level:.3f} 0.000\n" for freq, level in zip(freqs, levels))
+        yield f"load_response[{MEASUREMENT_POINTS} points]", lambda: measurement.load_response(measurement_filename)
+        grid = log_grid()
+        smoother = measurement.smoother(freqs[1:], levels[1:], max_entries=0)
+        yield f"smooth[1/6 octave, {MEASUREMENT_POINTS} points]", lambda: smoother.smooth(6, grid)
+
+def preset_benchmarks():
+    from rscore import presets
+    rng = np.random.default_rng(0)
+    catalog = [presets.preset(f"Title {i}", design("lowshelf", rng.uniform(15, 60, 4), q=0.9, gain_db=rng.uniform(1, 5, 4)), kind="beq", tags=["film", "action" if i % 2 else "drama"])
+               for i in range(LIBRARY_SIZE)]
+    lib = presets.library(":memory:")
+
+    yield f"presets.add[{LIBRARY_SIZE} presets]", lambda: (lib.db.execute("DELETE FROM presets"), lib.add(catalog))
+    yield f"presets.search[text, {LIBRARY_SIZE} presets]", lambda: lib.search("title 12", tags=["action"])
+    yield f"presets.search[gain, {LIBRARY_SIZE} presets]", lambda: lib.search(min_gain=15, max_corner=40)
+    yield "presets.response", lambda: lib.response(LIBRARY_SIZE // 2)
+    lib.close()
+
+def probe_benchmarks():
+    from rscore.instrument import recorder
+    off = recorder(enabled=False)
+    on = recorder(enabled=True)
+
+    def block(probes):
+        with probes.span("block"):
+            pass
+    yield "probe.span[disabled]", lambda: block(off)
+    yield "probe.span[enabled]", lambda: block(on)
+    yield "probe.timed[disabled]", off.timed("call")(lambda: None)
+
+def telemetry_benchmarks():
+    from rscore import telemetry
+    live = telemetry.channel()
+    port = sport()
+    port.live = live
+    spectrum = "SPEC 0 1 " + " ".join(f"{-x:.1f}" for x in range(400))
+
+    yield "telemetry.route_line[level]", lambda: port.route_line("LVL -12.5 -20.25")
+    yield "telemetry.route_line[spectrum, 400 bins]", lambda: port.route_line(spectrum)
+    for i in range(live.level_capacity):
+        live.parse(f"LVL {-20 - i % 17} {-30 - i % 5}")
+    yield f"telemetry.level_history[{live.level_capacity} samples]", lambda: live.level_history(1e9, 600)
+
+GROUPS = (probe_benchmarks, cascade_benchmarks, plot_benchmarks, entry_benchmarks, packet_benchmarks, file_benchmarks, preset_benchmarks, telemetry_benchmarks)
+
+
+###############################################################################
+## MEASUREMENT
+###############################################################################
+
+
+# Function to time a function; returns the best of several runs, in seconds per call
+def measure(fn, repeat):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()                   # Enough calls to take at least 0.2 s
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+# Function to run every benchmark whose name contains one of the given words, or only the named ones
+def run(only=None, repeat=5, names=None):
+    results = {}
+    for group in GROUPS:
+        for name, fn in group():
+            if only and not any(word in name for word in only):
+                continue
+            if names is not None and name not in names:
+                continue
+            results[name] = measure(fn, repeat)
+            print(f"  {name:<40} {format_time(results[name]):>10}", file=sys.stderr)
+    return results
+
+def format_time(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+def machine():
+    return {"python": platform.python_version(), "platform": platform.platform(), "processor": platform.processor() or platform.machine()}
+
+def load_baseline():
+    try:
+        with open(BASELINE, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"machine": None, "results": {}}
+
+# Function to run the suite again and keep the fastest result of each benchmark
+# The machine drifts by up to 1.7x between runs, mostly on short benchmarks, and a single run is too noisy to gate on
+#   names:  benchmarks to run again, or None for all of them
+def rerun(results, only, repeat, names=None):
+    for name, seconds in run(only, repeat, names).items():
+        results[name] = min(seconds, results.get(name, seconds))
+    return results
+
+# Function to get the baseline of each benchmark: the median of several runs of the suite, a figure a typical run meets
+def typical(only, repeat, rounds):
+    runs = [run(only, repeat)]
+    for i in range(2, rounds + 1):
+        print(f"Round {i} of {rounds}", file=sys.stderr)
+        runs.append(run(only, repeat))
+    return {name: float(np.median([results[name] for results in runs])) for name in runs[0]}
+
+# Function to list the benchmarks that are more than threshold times slower than the baseline
+def slower(results, baseline, threshold):
+    return [name for name, seconds in results.items() if name in baseline["results"] and seconds > threshold * baseline["results"][name]]
+
+# Function to compare results to the baseline; returns the names of the benchmarks that regressed
+def compare(results, baseline, threshold):
+    failed = []
+    print(f"{'benchmark':<40} {'time':>10} {'baseline':>10} {'ratio':>6}  status")
+    for name, seconds in results.items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            print(f"{name:<40} {format_time(seconds):>10} {'-':>10} {'-':>6}  new")
+            continue
+        ratio = seconds / reference
+        status = "ok"
+        if ratio > threshold:
+            status = "REGRESSION"
+            failed.append(name)
+        print(f"{name:<40} {format_time(seconds):>10} {format_time(reference):>10} {ratio:>6.2f}  {status}")
+    return failed
+
+
+###############################################################################
+## MAIN FUNCTION
+###############################################################################
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Room Shaker hot paths and compare them to a stored baseline.")
+    parser.add_argument("--threshold", type=float, default=1.5, help="fail when a benchmark is this many times slower than its baseline (default: %(default)s)")
+    parser.add_argument("--update-baseline", action="store_true", help="store the results as the new baseline instead of comparing")
+    parser.add_argument("--only", nargs="+", metavar="WORD", help="only run benchmarks whose name contains one of these words")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per benchmark, the best one is kept (default: %(default)s)")
+    parser.add_argument("--rounds", type=int, default=3, help="runs of the suite: baselines are the median, and when comparing, "
+                        "benchmarks that look slower than the threshold are run again and the best result is kept (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    baseline = load_baseline()
+
+    if args.update_baseline:
+        results = typical(args.only, args.repeat, args.rounds)
+        baseline["machine"] = machine()
+        baseline["results"].update(results)
+        with open(BASELINE, 'w') as f:
+            json.dump(baseline, f, indent=4, sort_keys=True)
+            f.write("\n")
+        print(f"Stored {len(results)} results in {BASELINE}")
+        return 0
+
+    if baseline["machine"] != machine():
+        print(f"WARNING: the baseline was recorded on {baseline['machine']}, ratios may not be meaningful", file=sys.stderr)
+
+    # Only the benchmarks that look slow are run again; one that is, in every round, has regressed
+    results = run(args.only, args.repeat)
+    for i in range(2, args.rounds + 1):
+        names = slower(results, baseline, args.threshold)
+        if not names:
+            break
+        print(f"Round {i} of {args.rounds}: {', '.join(names)}", file=sys.stderr)
+        rerun(results, args.only, args.repeat, names)
+    failed = compare(results, baseline, args.threshold)
+    if failed:
+        print(f"{len(failed)} benchmark(s) more than {args.threshold}x slower than the baseline: {', '.join(failed)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
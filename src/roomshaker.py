@@ -12,7 +12,7 @@
 #   Description:        This file hold source code for the ROOM SHAKER GUI
 #                       application.
 #   Application Notes:  
-#   Known Bugs:         Exception raised when the user selects 'cancel' instead of choosing a file to load parameters from.
+#   Known Bugs:
 #   TODO:
 ###############################################################################
 
@@ -21,37 +21,45 @@
 ## DEPENDENCIES
 ###############################################################################
 
+import time
+start_time = time.perf_counter()    # Reference point for the startup benchmark
+
 import signal
 signal.signal(signal.SIGINT, signal.SIG_IGN)
-signal.signal(signal.SIGBREAK, signal.SIG_IGN)
+if hasattr(signal, "SIGBREAK"):     # Windows only
+    signal.signal(signal.SIGBREAK, signal.SIG_IGN)
 
 import tkinter as tk
 from tkinter import *
 from tkinter import filedialog
 from tkinter import ttk
-from PIL import ImageTk, Image
 import serial
-import serial.tools.list_ports
-import struct
 import os
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mticker
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-from scipy import signal as sp_signal
-import numpy as np
+import sys
 import math
-import csv
-import copy
-from ctypes import windll
-
-
-###############################################################################
-## Make sure these match the firmware config of the RoomShaker embedded device
-###############################################################################
-
-
-num_filters=6
-num_parameters=5
+import json
+import hashlib
+import subprocess
+import threading
+from array import array
+
+from rscore.config import num_filters, num_parameters, FS
+from rscore.comms import sport, upload_error
+from rscore import params
+from rscore.instrument import probes
+
+# numpy, matplotlib and the filter math are imported by load_backend() once the window is on screen
+np = None
+matplotlib = None
+Figure = None
+mticker = None
+LineCollection = None
+FigureCanvasTkAgg = None
+NavigationToolbar2Tk = None
+create_low_shelf = None
+create_allpass = None
+log_grid = None
+stage_cache = None
 
 
 ###############################################################################
@@ -60,6 +68,7 @@ num_parameters=5
 
 
 try:
+    from ctypes import windll
     windll.shcore.SetProcessDpiAwareness(1)
 except Exception:
     pass
@@ -78,11 +87,232 @@ coefs = []
 ###############################################################################
 
 
+# Function to import the plotting backend and filter math
+def load_backend():
+    global np, matplotlib, Figure, mticker, LineCollection, FigureCanvasTkAgg, NavigationToolbar2Tk, create_low_shelf, create_allpass, log_grid, stage_cache
+    import numpy as np
+    import matplotlib
+    matplotlib.use("TkAgg")
+    from matplotlib.figure import Figure
+    import matplotlib.ticker as mticker
+    from matplotlib.collections import LineCollection
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+    from rscore.dsp import create_low_shelf, create_allpass, log_grid, stage_cache
+
+# Function to find (and create) the per-user cache directory for resized images; returns None if there is nowhere to write
+def image_cache_dir():
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    path = os.path.join(base, "roomshaker", "images")
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError:
+        return None
+    return path
+
+# Function to load an image from imgs/ scaled to fit inside max_width x max_height
+# The scaled copy is cached on disk, keyed by the source file's hash and the target size, so PIL is only needed the first time
+def load_image(name, max_width, max_height):
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "imgs", name)
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:16]
+
+    cache_dir = image_cache_dir()
+    if cache_dir is not None:
+        cached = os.path.join(cache_dir, f"{digest}_{int(max_width)}x{int(max_height)}.png")
+        if os.path.exists(cached):
+            return tk.PhotoImage(file=cached)
+
+    from PIL import ImageTk, Image
+    img = Image.open(path)
+    resize_factor = min(max_width/img.width, max_height/img.height)
+    img = img.resize((max(1, int(img.width * resize_factor)), max(1, int(img.height * resize_factor))), Image.Resampling.LANCZOS)
+
+    if cache_dir is not None:
+        try:
+            img.save(cached + ".tmp", format="PNG")
+            os.replace(cached + ".tmp", cached)    # Never leave a half-written file behind for the next start
+        except OSError:
+            pass
+    return ImageTk.PhotoImage(img)
+
+# Function to run the GUI several times in fresh processes and report how long it takes to appear and to become usable
+def benchmark_startup(runs=5):
+    results = []
+    for i in range(runs):
+        launched = time.perf_counter()
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--startup-probe"], capture_output=True, text=True, check=True).stdout
+        probe = json.loads(out.strip().splitlines()[-1])
+        probe["process_exit"] = time.perf_counter() - launched
+        results.append(probe)
+
+    summary = {}
+    for key in ("first_paint", "interactive", "process_exit"):
+        times = sorted(result[key] for result in results)
+        summary[key] = {"median": times[len(times)//2], "min": times[0], "max": times[-1]}
+        print(f"{key:14s} median {1000*summary[key]['median']:7.1f} ms   min {1000*times[0]:7.1f} ms   max {1000*times[-1]:7.1f} ms")
+    return summary
+
 # Function to create widgets with all options
 def create_widget(parent, widget_type, **options):
     return widget_type(parent, **options)
 
 
+# Class for one coefficient of a coef_table, with the get/delete/insert calls the file loader and the dialogs make on an Entry
+# Only whole-field replacement is supported, which is all they do
+class coef_cell:
+
+    def __init__(self, table, row, col):
+        self.table = table
+        self.row = row
+        self.col = col
+
+    def get(self):
+        return self.table.text[self.row][self.col]
+
+    def delete(self, first, last=None):
+        self.table.set_text(self.row, self.col, "")
+
+    def insert(self, index, text):
+        self.table.set_text(self.row, self.col, str(text))
+
+
+# Class for the coefficient editor: the text and parsed value of every coefficient, shown through a fixed number of
+# rows of Entry widgets that are re-pointed at other biquads when scrolling, so any number of filters costs the same widgets
+# Values are parsed once, when they are edited, into a flat array; the table is built before numpy is loaded, hence array('d')
+class coef_table:
+
+    default_text = ["1.0000000"] + ["0.0000000"] * (num_parameters - 1)
+
+    def __init__(self, count=num_filters, visible_rows=num_filters):
+        self.visible_rows = visible_rows
+        self.text = []                      # Per biquad, the fields as typed
+        self.values = array('d')            # Row-major, num_parameters per biquad
+        self.invalid = set()                # (row, column) of the fields that aren't numbers
+        self.rows = []
+        self.listeners = []                 # Called after every change
+        self.slots = []                     # Per visible row: label, entries, their variables, load button
+        self.top = 0                        # Biquad shown in the first visible row
+        self.loading = False                # Set while the table writes to its own Entry variables
+        self.resize(count)
+
+    def __len__(self):
+        return len(self.text)
+
+    def __getitem__(self, row):
+        return self.rows[row]
+
+    # Function to change the number of biquads; new ones are pass-through
+    def resize(self, count):
+        del self.text[count:]
+        del self.values[count * num_parameters:]
+        self.invalid = {(row, col) for row, col in self.invalid if row < count}
+        while len(self.text) < count:
+            self.text.append(list(self.default_text))
+            self.values.extend(float(text) for text in self.default_text)
+        self.rows = [[coef_cell(self, row, col) for col in range(num_parameters)] for row in range(count)]
+        self.scroll_to(self.top)
+        self.changed()
+
+    # Function to change one field, from an Entry or from code
+    def set_text(self, row, col, text):
+        self.text[row][col] = text
+        try:
+            self.values[row * num_parameters + col] = float(text)
+            self.invalid.discard((row, col))
+        except ValueError:
+            self.invalid.add((row, col))
+
+        # Show it, unless it was typed into the Entry in the first place
+        k = row - self.top
+        if 0 <= k < len(self.slots) and not self.loading:
+            var = self.slots[k][2][col]
+            if var.get() != text:
+                self.loading = True
+                try:
+                    var.set(text)
+                finally:
+                    self.loading = False
+        self.changed()
+
+    def changed(self):
+        for listener in self.listeners:
+            listener()
+
+    # Function to get every biquad's coefficients; like get_vals(), raises ValueError while a field isn't a number
+    def get_values(self):
+        if self.invalid:
+            row, col = min(self.invalid)
+            raise ValueError(f"could not convert string to float: {self.text[row][col]!r}")
+        values = self.values.tolist()
+        return [values[i:i + num_parameters] for i in range(0, len(values), num_parameters)]
+
+    # Function to create the visible rows in a grid, starting at (first_row, first_column)
+    #   load_command:   called with the biquad index when a row's "Load from .txt..." button is pressed
+    def build(self, parent, first_row, first_column, load_command):
+        for k in range(self.visible_rows):
+            row = first_row + k
+            label = create_widget(parent, tk.Label, text="", font=("Helvetica", 12, "bold"))
+            label.grid(row=row, column=first_column)
+            entries = []
+            variables = []
+            for j in range(num_parameters):
+                var = tk.StringVar(master=parent)
+                var.trace_add('write', lambda *args, k=k, j=j: self.on_edit(k, j))
+                e = create_widget(parent, tk.Entry, width=10, textvariable=var)
+                e.grid(row=row, column=first_column+1+j)
+                entries.append(e)
+                variables.append(var)
+            button = create_widget(parent, tk.Button, text="Load from .txt...", command=lambda k=k: load_command(self.top + k), font=("Helvetica", 10, "bold"))
+            button.grid(row=row, column=first_column+1+num_parameters)
+            for widget in [label, *entries, button]:
+                widget.bind("<MouseWheel>", self.on_wheel)
+                widget.bind("<Button-4>", self.on_wheel)       # X11 reports the wheel as buttons 4 and 5
+                widget.bind("<Button-5>", self.on_wheel)
+            self.slots.append((label, entries, variables, button))
+
+        self.scrollbar = create_widget(parent, tk.Scrollbar, command=self.on_scrollbar)
+        self.scrollbar.grid(row=first_row, column=first_column+2+num_parameters, rowspan=self.visible_rows, sticky="ns")
+        self.scroll_to(0)
+
+    def on_edit(self, k, j):
+        if not self.loading:
+            self.set_text(self.top + k, j, self.slots[k][2][j].get())
+
+    # Function to show the biquads from `top` onwards in the visible rows; rows past the last biquad are hidden
+    def scroll_to(self, top):
+        if not self.slots:
+            return
+        self.top = max(0, min(int(top), len(self) - self.visible_rows))
+        self.loading = True
+        try:
+            for k, (label, entries, variables, button) in enumerate(self.slots):
+                row = self.top + k
+                widgets = [label, *entries, button]
+                if row < len(self):
+                    label.configure(text=f"Biquad {row}")
+                    for var, text in zip(variables, self.text[row]):
+                        var.set(text)
+                    for widget in widgets:
+                        widget.grid()
+                else:
+                    for widget in widgets:
+                        widget.grid_remove()
+        finally:
+            self.loading = False
+        if len(self):
+            self.scrollbar.set(self.top / len(self), min(1.0, (self.top + self.visible_rows) / len(self)))
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(round(float(amount) * len(self)))
+        elif action == "scroll":
+            self.scroll_to(self.top + int(amount) * (self.visible_rows if unit == "pages" else 1))
+
+    def on_wheel(self, event):
+        self.scroll_to(self.top + (-1 if event.num == 4 or event.delta > 0 else 1))
+        return "break"
+
+
 # Class to load filter parameters from external files
 class floader:
 
@@ -111,34 +341,81 @@ class floader:
     def set_all_fields(self, vals):
 
         # For each filter we have
-        for i in range(len(vals)):
+        for i in range(min(len(vals), len(self.fields))):
             
             if (len(vals[i]) == len(self.fields[i])):
                 # Set the fields for this filter
                 self.set_single_filter_fields(vals[i], self.fields[i])
 
-    # Function for opening the file explorer window to select BEQ file
+    # Function to load a preset into every filter; filters the preset doesn't use are set to pass-through
+    def set_preset(self, coefs):
+        if len(coefs) > len(self.fields):
+            raise ValueError(f"the preset has {len(coefs)} biquads, the device has {len(self.fields)}")
+        rows = [[f"{val:.11f}" for val in row] for row in coefs]
+        rows += [[f"{val:.11f}" for val in create_allpass()]] * (len(self.fields) - len(rows))
+        self.set_all_fields(rows)
+
+    # Function for opening the file explorer window to select a parameter file or BEQ file
     def browse_files(self, is_txt, is_single, filter_index=0):
 
         # Open file explorer
-        filename = filedialog.askopenfilename(initialdir = "/", title = "Select a File", filetypes = (("Text files", "*.txt*"), ("all files", "*.*")))
+        if is_txt:
+            filetypes = (("Text files", "*.txt*"), ("all files", "*.*"))
+        else:
+            filetypes = (("BEQ catalog", "*.json"), ("miniDSP biquads", "*.txt"), ("all files", "*.*"))
+        filename = filedialog.askopenfilename(initialdir = "/", title = "Select a File", filetypes = filetypes)
         
+        # Cancelled
+        if not filename:
+            return
+
+        # BEQ files go through the preset library; a single preset is also loaded straight away
+        if not is_txt:
+            from rscore import presets
+            try:
+                found, skipped = presets.parse_file(filename)
+                if len(found) == 1:
+                    self.set_preset(found[0].coefs)
+            except (OSError, ValueError) as e:
+                print(f"ERROR: {e}")
+                return
+            _library.open()
+            _library.add(found, skipped)
+            return
+
         # Load biquad filter parameters from file
-        row_data=[]
-        data_list = []
-        with open(filename, 'r', newline='') as f:
-            csv_reader = csv.reader(f)
-            for row in csv_reader:
-                for word in row:
-                    row_data.append(word)
-                data_list.append(row_data)
-                row_data = []
+        data_list = params.read_rows(filename)
 
         if (is_single==True):
             self.set_single_filter_fields(data_list[0], self.fields[filter_index])
         else:
             self.set_all_fields(data_list)
 
+    # Function to open a preset bank and list its presets in the bank dropdown
+    def browse_bank(self, cbox):
+        filename = filedialog.askopenfilename(initialdir = "/", title = "Select a preset bank", filetypes = (("Preset banks", "*.rsbk"), ("all files", "*.*")))
+        if not filename:
+            return
+
+        from rscore.bank import bank
+        try:
+            self.bank = bank(filename)
+        except (OSError, ValueError) as e:
+            print(f"ERROR: {e}")
+            return
+        cbox['values'] = self.bank.names
+        cbox['state'] = "readonly" if len(self.bank) else "disabled"
+        if len(self.bank):
+            cbox.current(0)
+            self.load_from_bank(0)
+
+    # Function to load a preset from the open bank; a mapped lookup, so switching presets doesn't touch the disk
+    def load_from_bank(self, index):
+        try:
+            self.set_preset(self.bank[index])
+        except ValueError as e:
+            print(f"ERROR: {e}")
+
     # Function to load a 10dB low shelf with a cutoff at 50 Hz
     def enable_super_bass(self, num_filters):
         params = []
@@ -150,223 +427,934 @@ class floader:
         self.set_all_fields(params)
 
 
-# Class to interact with the serial port
-class sport:
+# Class for the "Generate new filter.." dialog
+class generator:
 
-    ser = None
+    def __init__(self):
+        self.dialog = None
 
-    # Function to enumerate available COM ports
-    def open_com_port(self, cbox):
-        ports = serial.tools.list_ports.comports()
-        vals = []
-        for port, desc, hwid in sorted(ports):
-            # print(f"{port}: {desc} [{hwid}]")
-            vals.append(port)
-        cbox['values'] = vals
+    def store_fields(self, fields):
+        self.fields = fields
 
-    # Function to open a specific COM port
-    def bind(self, event, portname, buttons):
-        if portname != "Select COM Port..." and portname != '':
-            try:
-                
+    def open(self):
 
-                self.ser = serial.Serial(portname, 9600)
-            except Exception as e:
-                print(f"An error occurred: {e}")
-            
-            for button in buttons:
-                button["state"] = "active"
+        # Only one dialog at a time
+        if self.dialog is not None and self.dialog.winfo_exists():
+            self.dialog.lift()
+            return
 
-    # Function to upload filter parameters over COM port
-    def upload_filters(self, values):
+        from rscore.designer import FILTER_TYPES
+        self.dialog = create_widget(window, tk.Toplevel)
+        self.dialog.title("Generate new filter")
+
+        # Filter type and the biquad to write it to
+        self.kind = tk.StringVar(master=self.dialog, value="peaking")
+        self.index = tk.StringVar(master=self.dialog, value="0")
+        create_widget(self.dialog, tk.Label, text="Type", font=("Helvetica", 12, "bold")).grid(row=0, column=0, sticky="w", padx=5, pady=2)
+        create_widget(self.dialog, ttk.Combobox, textvariable=self.kind, values=FILTER_TYPES, state="readonly").grid(row=0, column=1, padx=5, pady=2)
+        create_widget(self.dialog, tk.Label, text="Biquad", font=("Helvetica", 12, "bold")).grid(row=1, column=0, sticky="w", padx=5, pady=2)
+        create_widget(self.dialog, ttk.Combobox, textvariable=self.index, values=[str(i) for i in range(len(self.fields))], state="readonly").grid(row=1, column=1, padx=5, pady=2)
+
+        # Design parameters
+        self.params = {}
+        for row, (name, text, default) in enumerate((("f0", "F0 (Hz)", "50"), ("q", "Q", "0.7071"), ("gain", "Gain (dB)", "0"), ("fp", "Fp (Hz, Linkwitz only)", "25"), ("qp", "Qp (Linkwitz only)", "0.5")), start=2):
+            self.params[name] = tk.StringVar(master=self.dialog, value=default)
+            create_widget(self.dialog, tk.Label, text=text, font=("Helvetica", 12, "bold")).grid(row=row, column=0, sticky="w", padx=5, pady=2)
+            create_widget(self.dialog, tk.Entry, textvariable=self.params[name], width=12).grid(row=row, column=1, padx=5, pady=2)
+
+        self.status = create_widget(self.dialog, tk.Label, text="", font=("Helvetica", 10))
+        self.status.grid(row=7, column=0, columnspan=2, padx=5, pady=2)
+        create_widget(self.dialog, tk.Button, text="Apply", command=self.apply, font=("Helvetica", 12, "bold")).grid(row=8, column=0, padx=5, pady=5)
+        create_widget(self.dialog, tk.Button, text="Close", command=self.dialog.destroy, font=("Helvetica", 12, "bold")).grid(row=8, column=1, padx=5, pady=5)
+
+    # Function to design the filter and write it to the selected biquad
+    def apply(self):
+        from rscore.designer import design
+        try:
+            values = {name: float(var.get()) for name, var in self.params.items()}
+            index = int(self.index.get())
+            coefs = design(self.kind.get(), values["f0"], q=values["q"], gain_db=values["gain"], fs=FS, fp=values["fp"], qp=values["qp"])[0]
+        except ValueError as e:
+            self.status["text"] = str(e)
+            return
 
-        # Split data into one USB packet per filter
-        # The maximum FS USB packet size is 64 bytes. By pre-emptively
-        # splitting the data into two packets, we can control
-        # when/where the data is split and insert our own
-        # headers.
+        _floader.set_single_filter_fields([f"{val:.11f}" for val in coefs], self.fields[index])
+        self.status["text"] = f"Biquad {index} set to {self.kind.get()} at {values['f0']:g} Hz"
 
-        # BYTE 0: NUMBER OF FILTERS PARAMETERS IN THIS PACKET
-        # BYTE 1: STARTING FILTER INDEX
-        # BYTES 2 to n: FILTER PARAMETERS
 
-        # Number of USB packets we need to send
-        num_filters = math.floor(len(values) / 5)
+# Class for the "Preset library..." dialog
+class library_browser:
 
-        # For each packet:
-        for i in range(num_filters):
-            filter_coefs = values[i]                        # Extract filter coefficients for this packet
-            if (i == (num_filters-1)):
-                self.send_packet(filter_coefs, i, True)     # If this is the last filter
-            else:
-                self.send_packet(filter_coefs, i, False)    # If this is not the last filter
+    def __init__(self):
+        self.dialog = None
+        self.lib = None
+        self.found = []
 
-    def send_packet(self, values, filter_index, last=False):
+    # Function to open the library on first use; responses are stored on the plot's grid so they can be previewed as they are
+    def connect(self):
+        if self.lib is None:
+            from rscore import presets
+            self.lib = presets.library(None, FS, *_plot.grid)
+        return self.lib
 
-        # Convert data to bytes
-        raw = bytearray()
-        for val in values:
-            raw.extend(struct.pack('f', val))
+    def open(self):
 
-        msg = bytearray()
-        msg.extend(bytes([len(values)]))              # 5 parameters in a single filter
-        msg.extend(bytes([filter_index]))         # Start at the nth index, calculated using the filter index 
-        msg.extend(raw)                             # Filter parameters
+        # Only one dialog at a time
+        if self.dialog is not None and self.dialog.winfo_exists():
+            self.dialog.lift()
+            return
 
-        if(last):
-            msg.extend(b'\xBB')      # Ending the message with 0xBB indicates to update the stored filter parameters, because all have been sent
-        else:
-            msg.extend(b'\xAA')       # Ending the message with 0xAA indicates to NOT update the stored filter parameters yet, because more are coming
-        self.ser.write(msg)
+        self.connect()
+        self.dialog = create_widget(window, tk.Toplevel)
+        self.dialog.title("Preset library")
+        self.dialog.protocol("WM_DELETE_WINDOW", self.close)
+
+        # Search box; every keystroke re-runs the (indexed) query
+        self.query = tk.StringVar(master=self.dialog)
+        create_widget(self.dialog, tk.Label, text="Search", font=("Helvetica", 12, "bold")).grid(row=0, column=0, sticky="w", padx=5, pady=2)
+        create_widget(self.dialog, tk.Entry, textvariable=self.query, width=40).grid(row=0, column=1, columnspan=3, sticky="ew", padx=5, pady=2)
+        self.query.trace_add('write', lambda *args: self.search())
+
+        # Results; selecting one previews it on the plot
+        self.results = create_widget(self.dialog, tk.Listbox, width=70, height=20, exportselection=False)
+        self.results.grid(row=1, column=0, columnspan=4, sticky="nsew", padx=5, pady=2)
+        scrollbar = create_widget(self.dialog, tk.Scrollbar, command=self.results.yview)
+        scrollbar.grid(row=1, column=4, sticky="ns")
+        self.results.configure(yscrollcommand=scrollbar.set)
+        self.results.bind("<<ListboxSelect>>", lambda event: self.preview())
+        self.results.bind("<Double-Button-1>", lambda event: self.load())
+
+        self.status = create_widget(self.dialog, tk.Label, text="", font=("Helvetica", 10))
+        self.status.grid(row=2, column=0, columnspan=4, padx=5, pady=2)
+        create_widget(self.dialog, tk.Button, text="Import...", command=lambda:_floader.browse_files(is_txt=False, is_single=False), font=("Helvetica", 12, "bold")).grid(row=3, column=0, padx=5, pady=5)
+        create_widget(self.dialog, tk.Button, text="Load", command=self.load, font=("Helvetica", 12, "bold")).grid(row=3, column=1, padx=5, pady=5)
+        create_widget(self.dialog, tk.Button, text="Compare all", command=self.compare, font=("Helvetica", 12, "bold")).grid(row=3, column=2, padx=5, pady=5)
+        create_widget(self.dialog, tk.Button, text="Close", command=self.close, font=("Helvetica", 12, "bold")).grid(row=3, column=3, padx=5, pady=5)
+        self.search()
+
+    def close(self):
+        _plot.show_preview(None)
+        _plot.comparison.hide()
+        self.dialog.destroy()
+
+    # Function to store parsed presets and show how many were new
+    def add(self, found, skipped):
+        added = self.connect().add(found)
+        self.search()
+        self.status["text"] = f"Imported {added} new presets" + (f", skipped {skipped} that couldn't be designed" if skipped else "")
+
+    def search(self):
+        _plot.comparison.hide()             # The curves on the plot would no longer match the list
+        self.found = self.lib.search(self.query.get(), max_stages=len(_floader.fields), limit=500)
+        self.results.delete(0, tk.END)
+        for entry in self.found:
+            self.results.insert(tk.END, entry.label())
+        self.status["text"] = f"{len(self.found)} of {self.lib.count()} presets"
+
+    # Function to show every result on the plot at once, evaluated as one batch; hovering a curve selects its row
+    def compare(self):
+        if not self.found:
+            return
+        from rscore.dsp import stack_cascades, batch_magnitude
+        with probes.span("compare"):
+            coefs = stack_cascades([self.lib.coefs(entry.id) for entry in self.found])
+            magnitudes = batch_magnitude(coefs, FS, _plot.freqs)
+        _plot.show_preview(None)
+        _plot.comparison.show(magnitudes, [entry.title for entry in self.found], on_hover=self.hovered)
+        self.status["text"] = f"Comparing {len(self.found)} presets, point at a curve to find it in the list"
+
+    def hovered(self, index):
+        if index is None:
+            return
+        self.results.selection_clear(0, tk.END)
+        self.results.selection_set(index)
+        self.results.see(index)
+        self.status["text"] = self.found[index].label()
+
+    def selected(self):
+        selection = self.results.curselection()
+        return self.found[selection[0]] if selection else None
+
+    def preview(self):
+        entry = self.selected()
+        if entry is not None:
+            _plot.show_preview(*self.lib.response(entry.id))
+
+    def load(self):
+        entry = self.selected()
+        if entry is None:
+            return
+        try:
+            _floader.set_preset(self.lib.coefs(entry.id))
+        except ValueError as e:
+            self.status["text"] = str(e)
+            return
+        self.status["text"] = f"Loaded {entry.title}"
 
-    def enable_autoeq(self):
-        
-        # Send 0xDE to indicate auto EQ mode is enabled
-        raw = bytearray()
-        raw.extend(b'\xDE')
-        self.ser.write(raw)
 
-    def receive_response(self, widget):
+# Class for the timing overlay, toggled with F12; the probes only record while it is shown (or ROOMSHAKER_PROFILE is set)
+class stats_overlay:
+
+    def __init__(self, refresh_ms=500):
+        self.refresh_ms = refresh_ms
+        self.frame = None
+        self.pending = None
+        self.was_enabled = False
+
+    def toggle(self, parent):
+        if self.frame is not None:
+            window.after_cancel(self.pending)
+            self.frame.destroy()
+            self.frame = None
+            probes.enable(self.was_enabled)
+            return
+
+        self.was_enabled = probes.enabled
+        probes.enable(True)
+        self.frame = create_widget(parent, tk.Frame, bd=1, relief="solid")
+        self.text = create_widget(self.frame, tk.Label, font=("Courier", 9), justify="left", anchor="w")
+        self.text.grid(row=0, column=0, columnspan=3, sticky="w", padx=3)
+        create_widget(self.frame, tk.Button, text="Export JSON...", command=lambda:self.export(chrome=False), font=("Helvetica", 9)).grid(row=1, column=0, padx=2, pady=2)
+        create_widget(self.frame, tk.Button, text="Export trace...", command=lambda:self.export(chrome=True), font=("Helvetica", 9)).grid(row=1, column=1, padx=2, pady=2)
+        create_widget(self.frame, tk.Button, text="Reset", command=probes.reset, font=("Helvetica", 9)).grid(row=1, column=2, padx=2, pady=2)
+        self.frame.place(relx=1.0, x=-5, y=5, anchor="ne")
+        self.refresh()
+
+    def refresh(self):
+        self.text["text"] = probes.report()
+        self.pending = window.after(self.refresh_ms, self.refresh)
+
+    # Function to save the probe statistics, or every recorded span as a Chrome trace
+    def export(self, chrome):
+        filename = filedialog.asksaveasfilename(title="Export timings", defaultextension=".json", filetypes=(("JSON files", "*.json"), ("all files", "*.*")))
+        if not filename:
+            return
+        try:
+            if chrome:
+                probes.export_chrome_trace(filename)
+            else:
+                probes.export_json(filename)
+        except OSError as e:
+            _sport.push_line(f"Export failed: {e}")
+
+
+# Class for the "Live data..." window: levels and spectra reported by the device, plotted as they arrive
+# The data lives in the telemetry channel's ring buffers; this window only ever draws a decimated view of it
+class live_view:
+
+    def __init__(self, history_s=60, refresh_ms=100, level_range=(-90, 6), spectrum_range=(-100, 6)):
+        self.history_s = history_s
+        self.refresh_ms = refresh_ms
+        self.level_range = level_range
+        self.spectrum_range = spectrum_range
+        self.channel = None
+        self.dialog = None
+        self.pending = None
+
+    # Function to start parsing telemetry out of the serial stream; needs numpy, so it runs once the backend is loaded
+    def connect(self):
+        from rscore import telemetry
+        self.channel = telemetry.channel()
+        _sport.live = self.channel
+
+    def open(self):
+
+        # Only one window at a time
+        if self.dialog is not None and self.dialog.winfo_exists():
+            self.dialog.lift()
+            return
+        if self.channel is None:
+            self.connect()
+
+        self.dialog = create_widget(window, tk.Toplevel)
+        self.dialog.title("Live data")
+        self.dialog.protocol("WM_DELETE_WINDOW", self.close)
+
+        # Fixed axes limits, so new data never forces a full redraw
+        self.fig = Figure(figsize=(7, 5), dpi=window.winfo_fpixels('1i'))
+        self.ax = self.fig.subplots(nrows=2, ncols=1)
+        self.ax[0].set_title("Level")
+        self.ax[0].set_xlabel("Time (s)")
+        self.ax[0].set_ylabel("Level (dB)")
+        self.ax[0].axis([-self.history_s, 0, *self.level_range])
+        self.ax[1].set_title("Spectrum")
+        self.ax[1].set_xlabel("Frequency (Hz)")
+        self.ax[1].set_ylabel("Level (dB)")
+        self.ax[1].set_xscale("log")
+        self.ax[1].axis([1, 400, *self.spectrum_range])
+        self.level_lines = []
+        self.spectrum_line, = self.ax[1].plot([], [], animated=True)
+        self.peak_line, = self.ax[1].plot([], [], '--', color='grey', animated=True)
+        self.spectrum_freqs = None
+        self.fig.set_layout_engine('constrained')
+
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.dialog)
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        self.canvas.get_tk_widget().grid(row=0, column=0, columnspan=3, sticky="nsew")
+        self.dialog.rowconfigure(0, weight=1)
+        self.dialog.columnconfigure(0, weight=1)
 
-        # Check if data has been received
-        if isinstance(self.ser, serial.Serial):
-            if self.ser.in_waiting > 0:
-                data = ((str(self.ser.read(self.ser.in_waiting)))[2:-1]).replace("\\n", "\n") + "\n"  # Newline characters that come via serial port are interpreted as literals, hence the need to replace them with true newline characters
-                widget.insert(tk.END, data)
+        self.status = create_widget(self.dialog, tk.Label, text="", font=("Helvetica", 10))
+        self.status.grid(row=1, column=0, sticky="w", padx=5, pady=2)
+        create_widget(self.dialog, tk.Button, text="Clear", command=self.clear, font=("Helvetica", 12, "bold")).grid(row=1, column=1, padx=5, pady=5)
+        create_widget(self.dialog, tk.Button, text="Close", command=self.close, font=("Helvetica", 12, "bold")).grid(row=1, column=2, padx=5, pady=5)
 
-        window.after(100, lambda:_sport.receive_response(widget))
+        self.background = None
+        self.version = None
+        self.canvas.draw()
+        self.refresh()
+
+    def close(self):
+        if self.pending is not None:
+            window.after_cancel(self.pending)
+            self.pending = None
+        self.dialog.destroy()
+        self.dialog = None
+
+    def clear(self):
+        self.channel.clear()
+
+    # Function to redraw, but only when the device has sent something since the last time
+    def refresh(self):
+        if self.channel.version != self.version:
+            self.version = self.channel.version
+            with probes.span("live.redraw"):
+                self.redraw()
+        self.pending = window.after(self.refresh_ms, self.refresh)
+
+    def redraw(self):
+
+        # One min/max pair per pixel column is all the axis can show
+        history = self.channel.level_history(self.history_s, max(1, int(self.ax[0].bbox.width)))
+        full = False
+        if len(history) != len(self.level_lines):
+            for line in self.level_lines:
+                line.remove()
+            self.level_lines = [self.ax[0].plot([], [], animated=True, label=f"Ch {k}")[0] for k in range(len(history))]
+            full = True
+        for line, (times, levels) in zip(self.level_lines, history):
+            line.set_data(times, levels)
+
+        spectrum = self.channel.latest_spectrum()
+        if spectrum is None:
+            self.spectrum_line.set_data([], [])
+            self.peak_line.set_data([], [])
+        else:
+            freqs, levels, peak = spectrum
+            if freqs is not self.spectrum_freqs:         # Only a change of bins moves the axis
+                self.spectrum_freqs = freqs
+                positive = freqs[freqs > 0]
+                if len(positive) > 1:
+                    self.ax[1].set_xlim(positive[0], positive[-1])
+                full = True
+            self.spectrum_line.set_data(freqs, levels)
+            self.peak_line.set_data(freqs, peak)
+
+        self.status["text"] = f"{len(self.channel.levels)} level samples, {self.channel.malformed} malformed lines"
+        if full or self.background is None:
+            self.canvas.draw()
+        else:
+            self.blit()
+
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.blit()
+
+    def blit(self):
+        if self.background is not None:
+            self.canvas.restore_region(self.background)
+        for line in self.level_lines:
+            self.ax[0].draw_artist(line)
+        self.ax[1].draw_artist(self.spectrum_line)
+        self.ax[1].draw_artist(self.peak_line)
+        self.canvas.blit(self.fig.bbox)
+
+
+# Class for the draggable filter handles on the magnitude axis: drag a handle to change F0 and gain, scroll over it to change Q
+# Stages that aren't peaking filters or shelves have no handle; pass-through stages get a hollow one, and dragging it adds a peaking filter
+class drag_handles:
+
+    def __init__(self, owner, frame_ms=16, pick_radius=10, commit_ms=300):
+        self.plot = owner
+        self.frame_ms = frame_ms            # While dragging, redraw at most once per display frame (60 Hz)
+        self.pick_radius = pick_radius      # Pixels
+        self.commit_ms = commit_ms          # Scrolling writes the Entry fields once it has stopped for this long
+        self.params = []                    # Per stage: [kind, f0, q, gain_db], or None if the stage can't be edited here
+        self.coefs = []                     # The coefficients the parameters were estimated from
+        self.values = None                  # Working copy of every stage while dragging or scrolling
+        self.active = None                  # Stage being dragged
+        self.target = None                  # Latest pointer position, applied on the next frame
+        self.frame_pending = None
+        self.commit_pending = None
+        self.last_frame = 0.0
+
+        ax = owner.ax[0]
+        self.markers, = ax.plot([], [], 'o', markersize=8, markerfacecolor='tab:orange', markeredgecolor='black', animated=True, zorder=5)
+        self.free, = ax.plot([], [], 'o', markersize=7, markerfacecolor='none', markeredgecolor='grey', animated=True, zorder=5)
+        owner.lines += [(ax, self.free), (ax, self.markers)]
+        self.readout = None                 # Called with a description of the stage being edited; a Tk label, since text is slow to blit
+
+        owner.canvas.mpl_connect('button_press_event', self.on_press)
+        owner.canvas.mpl_connect('motion_notify_event', self.on_motion)
+        owner.canvas.mpl_connect('button_release_event', self.on_release)
+        owner.canvas.mpl_connect('scroll_event', self.on_scroll)
+
+    # Function to estimate the parameters of every stage whose coefficients were changed outside the handles
+    def sync(self, values):
+        if self.active is not None:
+            return
+        from rscore.designer import estimate
+        free_freqs = np.geomspace(20, 200, max(2, len(values)))
+        params = []
+        for i, row in enumerate(values):
+            if i < len(self.coefs) and self.coefs[i] == row:
+                params.append(self.params[i])
+            elif tuple(row) == stage_cache.identity:
+                params.append(["identity", float(free_freqs[i]), 1.0, 0.0])
+            else:
+                found = estimate(row, self.plot.fs)
+                params.append(list(found) if found is not None else None)
+        self.params = params
+        self.coefs = [list(row) for row in values]
+        self.place()
+
+    # Function to move the handle artists to the current parameters
+    def place(self):
+        for line, identity in ((self.markers, False), (self.free, True)):
+            points = [(p[1], p[3]) for p in self.params if p is not None and (p[0] == "identity") == identity]
+            line.set_data([f for f, g in points], [g for f, g in points])
+        if self.readout is not None:
+            text = ""
+            if self.active is not None:
+                kind, f0, q, gain = self.params[self.active]
+                text = f"Biquad {self.active}: {kind} {f0:.1f} Hz, {gain:+.1f} dB, Q {q:.2f}"
+            self.readout(text)
+
+    # Function to find the stage whose handle is under the pointer
+    def hit(self, event):
+        if event.inaxes is not self.plot.ax[0]:
+            return None
+        stages = [i for i, p in enumerate(self.params) if p is not None]
+        if not stages:
+            return None
+        points = self.plot.ax[0].transData.transform([(self.params[i][1], self.params[i][3]) for i in stages])
+        distances = np.hypot(points[:, 0] - event.x, points[:, 1] - event.y)
+        k = int(np.argmin(distances))
+        return stages[k] if distances[k] <= self.pick_radius else None
+
+    def editable(self, event):
+        toolbar = getattr(self.plot, 'toolbar', None)
+        return (toolbar is None or not toolbar.mode) and len(self.plot.previous_coefs) == len(self.params)
+
+    def on_press(self, event):
+        if event.button != 1 or not self.editable(event):
+            return
+        if self.commit_pending is not None:
+            window.after_cancel(self.commit_pending)
+            self.commit(self.commit_pending_stage)
+        self.active = self.hit(event)
+        if self.active is not None:
+            self.values = [list(row) for row in self.plot.previous_coefs]
+
+    def on_motion(self, event):
+        if self.active is None or event.inaxes is not self.plot.ax[0] or event.xdata is None:
+            return
+        self.target = (event.xdata, event.ydata)
+        if self.frame_pending is None:
+            delay = max(0, int(1000 * (self.last_frame - time.perf_counter())) + self.frame_ms)
+            self.frame_pending = window.after(delay, self.frame)
+
+    # Function to apply the latest pointer position: re-design the stage and redraw through the stage cache and blitting
+    def frame(self):
+        self.frame_pending = None
+        self.last_frame = time.perf_counter()
+        if self.active is None or self.target is None:
+            return
+        params = self.params[self.active]
+        if params[0] == "identity":
+            params[0] = "peaking"
+        lo, hi = self.plot.ax[0].get_ylim()
+        params[1] = float(np.clip(self.target[0], self.plot.freqs[0], min(self.plot.freqs[-1], 0.45 * self.plot.fs)))
+        params[3] = float(np.clip(self.target[1], lo, hi))
+        self.redesign(self.active)
+
+    def redesign(self, stage):
+        from rscore.designer import design
+        kind, f0, q, gain = self.params[stage]
+        self.values[stage] = design(kind, f0, q=q, gain_db=gain, fs=self.plot.fs)[0].tolist()
+        self.place()
+        self.plot.render(self.values)
+
+    def on_release(self, event):
+        if self.active is None:
+            return
+        if self.frame_pending is not None:
+            window.after_cancel(self.frame_pending)
+            self.frame()
+        stage, self.active = self.active, None
+        self.place()
+        self.commit(stage)
+
+    def on_scroll(self, event):
+        if not self.editable(event):
+            return
+        stage = self.active if self.active is not None else self.hit(event)
+        if stage is None or self.params[stage][0] == "identity":
+            return
+        if self.values is None:
+            self.values = [list(row) for row in self.plot.previous_coefs]
+        self.params[stage][2] = float(np.clip(self.params[stage][2] * 1.15 ** event.step, 0.1, 20))
+        self.redesign(stage)
+        if self.active is None:
+            if self.commit_pending is not None:
+                window.after_cancel(self.commit_pending)
+            self.commit_pending = window.after(self.commit_ms, self.commit, stage)
+            self.commit_pending_stage = stage
+
+    # Function to write a stage back to its Entry fields, once the drag or scroll has finished
+    def commit(self, stage):
+        self.commit_pending = None
+        if self.values is None:
+            return
+        text = [f"{val:.11f}" for val in self.values[stage]]
+        row = [float(val) for val in text]
+
+        # These are the values the fields will hold, so the redraw their traces schedule finds nothing to do
+        self.coefs[stage] = row
+        self.plot.previous_coefs = [list(r) for r in self.values]
+        self.plot.previous_coefs[stage] = row
+        self.values = None
+        _floader.set_single_filter_fields(text, self.plot.data_fields[stage])
+
+
+# Class for comparing many presets on the magnitude axis: every curve is one segment of a single LineCollection, drawn
+# into the saved background once, so hovering only blits the highlighted curve
+class comparison:
+
+    def __init__(self, owner, pick_radius=6):
+        self.plot = owner
+        self.pick_radius = pick_radius      # Pixels
+        self.magnitudes = None              # (presets x freqs) dB, or None when nothing is being compared
+        self.labels = []
+        self.hovered = None
+        self.on_hover = None                # Called with the index of the curve under the pointer, or None
+        self.readout = None
+
+        ax = owner.ax[0]
+        self.collection = LineCollection([], colors=[(0.35, 0.35, 0.35, 0.3)], linewidths=0.7, zorder=1)
+        ax.add_collection(self.collection, autolim=False)
+        self.highlight, = ax.plot(owner.freqs, np.zeros_like(owner.freqs), color='tab:red', linewidth=2, animated=True, visible=False)
+        owner.lines.insert(0, (ax, self.highlight))     # Under the current filters
+        owner.canvas.mpl_connect('motion_notify_event', self.on_motion)
+
+    # Function to show the magnitudes of several presets, one row each
+    def show(self, magnitudes, labels, on_hover=None):
+        self.magnitudes = np.asarray(magnitudes)
+        self.labels = labels
+        self.on_hover = on_hover
+        segments = np.empty(self.magnitudes.shape + (2,))
+        segments[..., 0] = self.plot.freqs
+        segments[..., 1] = self.magnitudes
+        self.collection.set_segments(segments)
+        self.set_hovered(None, redraw=False)
+        self.plot.canvas.draw_idle()
+
+    def hide(self):
+        if self.magnitudes is None:
+            return
+        self.magnitudes = None
+        self.collection.set_segments([])
+        self.set_hovered(None, redraw=False)
+        self.on_hover = None
+        self.plot.canvas.draw_idle()
+
+    # Function to find the curve under the pointer: the closest one in the pointer's frequency bin, within pick_radius
+    def on_motion(self, event):
+        if self.magnitudes is None or self.plot.handles.active is not None:
+            return
+        ax = self.plot.ax[0]
+        if event.inaxes is not ax or event.xdata is None:
+            self.set_hovered(None)
+            return
+        k = min(int(np.searchsorted(self.plot.freqs, event.xdata)), len(self.plot.freqs) - 1)
+        lo, hi = ax.get_ylim()
+        distances = np.abs(self.magnitudes[:, k] - event.ydata)
+        index = int(np.argmin(distances))
+        self.set_hovered(index if distances[index] <= self.pick_radius * (hi - lo) / ax.bbox.height else None)
+
+    def set_hovered(self, index, redraw=True):
+        if index == self.hovered:
+            return
+        self.hovered = index
+        self.highlight.set_visible(index is not None)
+        if index is not None:
+            self.highlight.set_ydata(self.magnitudes[index])
+        if self.readout is not None:
+            self.readout(self.labels[index] if index is not None else "")
+        if self.on_hover is not None:
+            self.on_hover(index)
+        if redraw:
+            self.plot.blit()
 
 
 # Class to represent bode plot
 class plot:
 
-    def __init__(self, fs):
+    def __init__(self, fs, f_min=1, f_max=400, num_points=1024, debounce_ms=15):
         self.fs = fs
+        self.grid = (f_min, f_max, num_points)
+        self.freqs = None
+        self.cache = None
+        self.debounce_ms = debounce_ms                      # Edits arriving within this window are coalesced into a single redraw
         self.previous_coefs = []
+        self.pending = None
+        self.backgrounds = None
+        self.magnitude_db = None                            # Response of the current filters, kept for the predicted curve
+        self.measurement = None                             # measurement.smoother of the loaded room measurement
+        self.smoothing = 12                                 # 1/N octave, or None
+        self.measured_db = None
 
     def create(self, parent, toolbar_true, fields):
-
-        # Figure
-        plt.rcParams.update({'font.size': 8})
         screen_dpi = window.winfo_fpixels('1i')
-        self.fig, self.ax = plt.subplots(nrows=2, ncols=1, sharex=True, figsize=(parent.winfo_width()/(screen_dpi), parent.winfo_height()/(screen_dpi)), dpi=screen_dpi)
+        self.build(parent.winfo_width()/screen_dpi, parent.winfo_height()/screen_dpi, screen_dpi)
 
         # Place in tkinter window
-        self.fig.set_layout_engine('constrained')
-        self.canvas = FigureCanvasTkAgg(self.fig, master = parent)  
-        self.canvas.draw()
+        self.attach(FigureCanvasTkAgg(self.fig, master = parent))
         self.canvas.get_tk_widget().pack(pady=0)
 
+        # Readout for the handle being dragged or the compared preset under the pointer, floating over the top left of the plot
+        readout = create_widget(parent, tk.Label, font=("Helvetica", 9), bg="white")
+        def show_readout(text):
+            readout.configure(text=text)
+            if text:
+                readout.place(x=60, y=25)
+            else:
+                readout.place_forget()
+        self.handles.readout = show_readout
+        self.comparison.readout = show_readout
+
         # Optional: Add toolbar
         if (toolbar_true):
             self.toolbar = NavigationToolbar2Tk(self.canvas, parent)
             self.toolbar.update()
             self.toolbar.grid(row=7, column=7, rowspan=1)
 
-        # Save data fields
+        # Save data fields and redraw whenever one of them is edited
         self.data_fields = fields
+        self.subscribe(fields)
 
-    def update(self, entries):
+    # Function to create the grid, the cache and the figure; kept apart from create() so it can run without a window (e.g. the benchmarks)
+    def build(self, width, height, dpi):
 
-        # Get biquad parameters
-        values = get_vals(entries)
+        # Frequency grid and response cache
+        self.freqs = log_grid(*self.grid)                   # Only the bass band is plotted, so only the bass band is evaluated
+        self.cache = stage_cache(self.fs, self.freqs)       # Per-biquad responses, so an edit only re-evaluates the stage that changed
 
-        # Check for a change
-        if (self.previous_coefs == values):
-            window.after(250, self.update, entries)
-            self.previous_coefs = copy.deepcopy(values)
-            return
-            
-        # Store for next check
-        self.previous_coefs = copy.deepcopy(values)
-        
-        # Negate all a coefficients to reverse signs on a-coefficients; this is due to a mismatch in difference equation forms between the signal.freqz library and the CMSIS-DSP library
-        for i in range(num_filters):
-            values[i][3] = -1 * values[i][3]
-            values[i][4] = -1 * values[i][4]
+        # Figure
+        matplotlib.rcParams.update({'font.size': 8})
+        self.fig = Figure(figsize=(width, height), dpi=dpi)
+        self.ax = self.fig.subplots(nrows=2, ncols=1, sharex=True)
 
-        # Create 4 biquads
-        W = []
-        H = []
-        try:
-            # NOTE: all a coefficients are negated relative to what the Room Shaker gets; this is due to a mismatch in difference equation forms between the signal.freqz library and the CMSIS-DSP library
-            for i in range(num_filters):
-                W_temp, H_temp = sp_signal.freqz(b=values[i][0:3], a=([1.0] + values[i][3:5]), worN=int(self.fs/2), fs=self.fs)
-                W.append(W_temp)
-                H.append(H_temp)
-        except Exception as e:
-            print("ERROR: Are all 20 coefficients being passed to the plot.update() function? " + e)
-            W = [0]
-            H = [0]
-            H_all = H
-
-        # Cascade all biquads
-        H_all = H[0]
-        for i in range(1, num_filters):
-            H_all = H_all * H[i]                                                    # Multiply frequency responses
-        magnitude_db = 20 * np.log10(abs(H_all))                                    # Extract gain in dB
-        phase_degrees = np.unwrap(np.angle(H_all, deg=False)) * 360/( 2*math.pi)    # Extract phase in degrees
-        freq_degrees = W[0]
-
-        # Clear previously plotted curve
-        self.ax[0].clear()
-        self.ax[1].clear()
-
-        # Create bode plots
-        self.ax[0].semilogx(freq_degrees[0:400], magnitude_db[0:400])
+        # Static decorations are drawn once; only the curves change afterwards
         self.ax[0].set_title("Filter Frequency Response")
-        # self.ax[0].set_xlabel("Frequency (Hz)")
         self.ax[0].set_ylabel("Gain (dB)")
-        # self.ax[0].xaxis.set_major_locator(mticker.LogLocator(base=10.0, numticks=5))
-        self.ax[0].axis([1, 400, -20, 20])
+        self.ax[0].set_xscale("log")
+        self.ax[0].axis([self.freqs[0], self.freqs[-1], -20, 20])
         self.ax[0].locator_params(axis='y', nbins=6)
-        # plt.tight_layout()
-        self.canvas.draw()
-
-        self.ax[1].semilogx(freq_degrees[0:400], phase_degrees[0:400])
-        # self.ax[1].set_title("Filter Phase Response")
         self.ax[1].set_xlabel("Frequency (Hz)")
         self.ax[1].set_ylabel("Phase (Degrees)")
         self.ax[1].xaxis.set_major_locator(mticker.LogLocator(base=10.0, numticks=5))
-        # self.ax[1].axis([1, 400, -180, 180])
+        self.ax[1].set_ylim(-180, 180)
         self.ax[1].locator_params(axis='y', nbins=6)
-        # plt.tight_layout()
+
+        # Persistent curves; these are animated so they can be redrawn on their own with blitting
+        self.mag_line, = self.ax[0].plot(self.freqs, np.zeros_like(self.freqs), animated=True)
+        self.phase_line, = self.ax[1].plot(self.freqs, np.zeros_like(self.freqs), animated=True)
+
+        # Preview of a preset from the library, drawn under the current filters and hidden when there is none
+        self.preview_mag, = self.ax[0].plot(self.freqs, np.zeros_like(self.freqs), '--', color='grey', animated=True, visible=False)
+        self.preview_phase, = self.ax[1].plot(self.freqs, np.zeros_like(self.freqs), '--', color='grey', animated=True, visible=False)
+        # Room measurement and the response it would have with the current filters, hidden until one is loaded
+        self.measured_line, = self.ax[0].plot(self.freqs, np.zeros_like(self.freqs), color='tab:green', linewidth=0.8, animated=True, visible=False)
+        self.predicted_line, = self.ax[0].plot(self.freqs, np.zeros_like(self.freqs), color='black', linewidth=1.2, animated=True, visible=False)
+        self.lines = [(self.ax[0], self.preview_mag), (self.ax[1], self.preview_phase), (self.ax[0], self.measured_line), (self.ax[0], self.predicted_line), (self.ax[0], self.mag_line), (self.ax[1], self.phase_line)]
+        self.fig.set_layout_engine('constrained')
+
+    # Function to draw the figure on a canvas for the first time
+    def attach(self, canvas):
+        self.canvas = canvas
+        self.canvas.draw = probes.timed("canvas.draw")(self.canvas.draw)    # Full redraws, including the ones draw_idle() schedules
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        self.handles = drag_handles(self)
+        self.comparison = comparison(self)
         self.canvas.draw()
 
-        window.after(250, self.update, entries)
+    # Function to redraw whenever the coefficient table changes, typed or loaded from a file
+    def subscribe(self, table):
+        table.listeners.append(self.schedule_update)
+        self.schedule_update()
 
-def hz_to_rads(hz):
-    return (hz * math.pi / 180)
+    # Function to coalesce a burst of edits into a single redraw
+    def schedule_update(self, *args):
+        if self.pending is None:
+            self.pending = window.after(self.debounce_ms, self.update)
 
-def rads_to_hz(rads):
-    return (rads * 180 / math.pi)
+    def update(self):
+        self.pending = None
 
-def create_low_shelf(FS=48076, F0=50, SHELF_GAIN_dB=3, S=1):
-    # Modeled after the online Biquad Cookbook
-    # https://webaudio.github.io/Audio-EQ-Cookbook/audio-eq-cookbook.html
+        # Get biquad parameters; a field that is mid-edit (empty, "-", "1e") keeps the last valid curve on screen
+        try:
+            with probes.span("get_vals"):
+                values = get_vals(self.data_fields)
+        except ValueError:
+            return
 
-    # Intermediate variables
-    A = 10**(SHELF_GAIN_dB/40)
-    w0 = 2 * math.pi*F0/FS
-    cosw0 = math.cos(w0)
-    sinw0 = math.sin(w0)
-    alpha = (sinw0/2)*math.sqrt((A + 1/A) * (1/S - 1) + 2)
+        # Check for a change
+        if (self.previous_coefs == values):
+            return
+        self.previous_coefs = values
+        self.handles.sync(values)
+        self.render(values)
 
-    # Lowshelf filter parameters
-    b0 = A*((A+1)-(A-1)*cosw0+2*math.sqrt(A)*alpha)
-    b1 = 2*A*((A-1)-(A+1)*cosw0)
-    b2 = A*((A+1)-(A-1)*cosw0-2*math.sqrt(A)*alpha)
-    a0 = (A+1)+(A-1)*cosw0+2*math.sqrt(A)*alpha
-    a1 = -1 * (-2*((A-1)+(A+1)*cosw0))                  # Negate to comply with CMSIS-DSP
-    a2 = -1* ((A+1)+(A-1)*cosw0-2*math.sqrt(A)*alpha)   # Negate to comply with CMSIS-DSP
-    
-    # Normalize
-    return [b0/a0, b1/a0, b2/a0, a1/a0, a2/a0]
+    # Function to evaluate the cascade and redraw the curves
+    def render(self, values):
 
-def create_allpass():
-    return [1.0, 0.0, 0.0, 0.0, 0.0]
+        # Evaluate the cascade, re-using every stage that didn't change
+        try:
+            with probes.span("evaluate"):
+                resp = self.cache.evaluate(values)
+        except Exception as e:
+            print("ERROR: Are all " + str(len(values) * num_parameters) + " coefficients being passed to the plot.update() function? " + str(e))
+            return
+
+        self.magnitude_db = resp.magnitude_db
+        self.mag_line.set_ydata(resp.magnitude_db)
+        self.phase_line.set_ydata(resp.phase_degrees)
+        if self.measured_db is not None:
+            self.predicted_line.set_ydata(self.measured_db + resp.magnitude_db)
+
+        # The phase axis is the only one that rescales; changing its limits invalidates the saved background
+        if self.rescale_phase(resp.phase_degrees):
+            self.canvas.draw_idle()
+        else:
+            self.blit()
+
+    # Function to fit the phase axis to the data in 90 degree steps; returns True if the limits changed
+    def rescale_phase(self, phase_degrees):
+        lo, hi = self.ax[1].get_ylim()
+        data_lo = 90 * math.floor(np.nanmin(phase_degrees) / 90)
+        data_hi = 90 * math.ceil(np.nanmax(phase_degrees) / 90)
+        if data_hi - data_lo < 360:
+            center = 90 * round((data_lo + data_hi) / 180)
+            data_lo, data_hi = center - 180, center + 180
+
+        # Only rescale when the curve leaves the axis or the axis has become far too loose for it
+        if data_lo >= lo and data_hi <= hi and (hi - lo) <= 4 * (data_hi - data_lo):
+            return False
+        self.ax[1].set_ylim(data_lo, data_hi)
+        return True
+
+    # Called after every full redraw (startup, resize, rescale) to save the empty axes and draw the curves over them
+    def on_draw(self, event):
+        self.backgrounds = [self.canvas.copy_from_bbox(ax.bbox) for ax in self.ax]
+        for ax, line in self.lines:
+            ax.draw_artist(line)
+
+    # Function to redraw only the data region of each axis
+    @probes.timed("blit")
+    def blit(self):
+        if self.backgrounds is None:
+            self.canvas.draw_idle()
+            return
+        for background in self.backgrounds:
+            self.canvas.restore_region(background)
+        for ax, line in self.lines:
+            ax.draw_artist(line)
+        for ax in self.ax:
+            self.canvas.blit(ax.bbox)
+
+    # Function to show a room measurement (a measurement.smoother) with the response the current filters would give it, or hide them with None
+    # Returns the offset (dB) applied to the measurement so it sits around 0 dB on the axis
+    def set_measurement(self, measurement):
+        self.measurement = measurement
+        return self.refresh_measurement()
+
+    def set_smoothing(self, fraction):
+        self.smoothing = fraction
+        return self.refresh_measurement()
+
+    def refresh_measurement(self):
+        offset = 0.0
+        if self.measurement is None:
+            self.measured_db = None
+        else:
+            levels = self.measurement.smooth(self.smoothing, self.freqs)
+            offset = -float(np.nanmean(levels)) if np.any(np.isfinite(levels)) else 0.0
+            self.measured_db = levels + offset
+            self.measured_line.set_ydata(self.measured_db)
+            if self.magnitude_db is not None:
+                self.predicted_line.set_ydata(self.measured_db + self.magnitude_db)
+        for line in (self.measured_line, self.predicted_line):
+            line.set_visible(self.measured_db is not None)
+        self.blit()
+        return offset
+
+    # Function to show the stored response of a preset, or hide it with None
+    def show_preview(self, magnitude_db=None, phase_degrees=None):
+        for line, data in ((self.preview_mag, magnitude_db), (self.preview_phase, phase_degrees)):
+            line.set_visible(data is not None)
+            if data is not None:
+                line.set_ydata(data)
+        self.blit()
+
+# Port name of the built-in device emulator, listed after the real ports so the GUI can be tried without hardware
+EMULATOR_PORT = "rsemu://?name=gui"
+
+# Function to fill the COM port dropdown
+def list_ports(cbox):
+    cbox['values'] = _sport.list_ports() + [EMULATOR_PORT]
+
+# Function to open the selected COM port, enable the buttons that need it and size the coefficient table to the device
+#   query_filters:  ask the device for its filter count with 0xC1; off by default, since firmware that doesn't know the
+#                   opcode may take it for the start of a packet. Without it the device is assumed to have num_filters
+def bind_port(portname, buttons, table, query_filters=False):
+    if portname != "Select COM Port..." and portname != '':
+        try:
+            _sport.bind(portname)
+        except Exception as e:
+            print(f"An error occurred: {e}")
+            return
+
+        for button in buttons:
+            button["state"] = "active"
+
+        if not query_filters:
+            if len(table) != num_filters:
+                table.resize(num_filters)
+            return
+        try:
+            _sport.request_filter_count()
+        except serial.SerialException as e:
+            _sport.push_line(f"Couldn't ask the device for its filter count: {e}")
+            return
+        window.after(50, apply_filter_count, table, time.perf_counter() + FILTER_COUNT_TIMEOUT)
+
+# Seconds to wait for the device to report its filter count; older firmware doesn't, and has num_filters
+FILTER_COUNT_TIMEOUT = 0.5
+
+# Function to resize the coefficient table once the device has reported its filter count, polled so the GUI never waits
+def apply_filter_count(table, deadline):
+    count = _sport.filter_count
+    if count is None:
+        if time.perf_counter() < deadline:
+            window.after(50, apply_filter_count, table, deadline)
+            return
+        count = num_filters
+        _sport.push_line(f"The device didn't report its filter count, assuming {count}")
+    elif not 0 < count <= 255:                  # Filter indices are one byte
+        _sport.push_line(f"Ignoring invalid filter count {count} reported by the device")
+        return
+    else:
+        _sport.push_line(f"The device has {count} filters")
+    if count != len(table):
+        table.resize(count)
+
+# Function to change the baud rate of the serial port
+def set_baudrate(text):
+    try:
+        _sport.set_baudrate(int(text))
+    except (ValueError, serial.SerialException) as e:
+        _sport.push_line(f"Invalid baud rate {text}: {e}")
+
+# Function to load a room measurement (e.g. exported from REW) and show it on the plot
+def load_measurement():
+    filename = filedialog.askopenfilename(title="Select a measurement", filetypes=(("Text files", "*.txt *.csv *.frd"), ("all files", "*.*")))
+    if not filename:
+        return
+    from rscore import measurement
+    try:
+        freqs, levels_db = measurement.load_response(filename)
+    except (OSError, ValueError) as e:
+        _sport.push_line(f"Measurement not loaded: {e}")
+        return
+    offset = _plot.set_measurement(measurement.smoother(freqs, levels_db))
+    _sport.push_line(f"Loaded {os.path.basename(filename)}: {len(freqs)} points, shown {offset:+.1f} dB to fit the plot")
+
+# Smoothing choices for the measurement, as N in 1/N octave
+SMOOTHING = {"No smoothing": None, "1/48 octave": 48, "1/24 octave": 24, "1/12 octave": 12, "1/6 octave": 6, "1/3 octave": 3, "1 octave": 1}
+
+# Function to change the smoothing of the measurement, from one of the SMOOTHING labels
+def set_smoothing(label):
+    _plot.set_smoothing(SMOOTHING[label])
+
+# Function to show device output in the text box, keeping only the last max_lines lines
+def receive_response(widget, max_lines=2000):
+
+    # Drain whatever the reader thread has collected since the last call, in one insert
+    with probes.span("receive_response"):
+        lines = _sport.read_lines()
+        if lines:
+            widget.insert(tk.END, "\n".join(lines) + "\n")
+            excess = int(widget.index("end-1c").split(".")[0]) - 1 - max_lines      # The text always ends with an empty line
+            if excess > 0:
+                widget.delete("1.0", f"{excess + 1}.0")
+
+    window.after(50, receive_response, widget)
+
+# Function to upload the coefficients in the entry grid, reporting failures in the output box instead of raising into Tk
+#   optimize:   upload cascadeopt.optimize()'d coefficients, padded back to the size of the table; the table isn't changed
+@probes.timed("upload")
+def upload_filters(entries, force_full=False, optimize=False):
+    try:
+        values = get_vals(entries)
+        if optimize:
+            from rscore import cascadeopt
+            res = cascadeopt.optimize(values)
+            before, after = res.padded_estimates(len(values))
+            values = res.padded(len(values)).tolist()
+            _sport.push_line(f"Optimized: {res.before['stages']} -> {res.after['stages']} active stages, "
+                             + f"{res.before['cycles_per_sample']:.1f} -> {res.after['cycles_per_sample']:.1f} cycles/sample "
+                             + f"({before['cycles_per_sample']:.1f} -> {after['cycles_per_sample']:.1f} as uploaded, padded to {len(values)}), "
+                             + f"peak gain {before['peak_db']:+.1f} -> {after['peak_db']:+.1f} dB"
+                             + "".join(f"; {note}" for note in res.notes))
+        _sport.upload_filters(values, force_full=force_full)
+    except ValueError as e:
+        _sport.push_line(f"Upload aborted, invalid coefficient: {e}")
+    except (upload_error, serial.SerialException) as e:
+        _sport.push_line(f"Upload failed: {e}")
+
+# Function to run a WAV file through the filters in the entry grid, on a worker thread so the GUI stays responsive
+def render_wav(entries):
+    try:
+        values = get_vals(entries)
+    except ValueError as e:
+        _sport.push_line(f"Render aborted, invalid coefficient: {e}")
+        return
+
+    in_filename = filedialog.askopenfilename(title="Select a WAV file to render", filetypes=(("WAV files", "*.wav"), ("all files", "*.*")))
+    if not in_filename:
+        return
+    out_filename = filedialog.asksaveasfilename(title="Save rendered WAV as", defaultextension=".wav", filetypes=(("WAV files", "*.wav"), ("all files", "*.*")))
+    if not out_filename:
+        return
+
+    def work():
+        from rscore import render
+        try:
+            frames, seconds, elapsed = render.render(values, in_filename, out_filename)
+        except (OSError, ValueError) as e:
+            _sport.push_line(f"Render failed: {e}")
+            return
+        _sport.push_line(f"Rendered {os.path.basename(out_filename)}: {seconds:.1f} s of audio in {elapsed:.2f} s")
+
+    _sport.push_line(f"Rendering {os.path.basename(in_filename)}...")
+    threading.Thread(target=work, name="render", daemon=True).start()
 
 def get_vals(entries):
+    # The coefficient table parses its fields as they are edited
+    if isinstance(entries, coef_table):
+        return entries.get_values()
+
     # Retrieve values from Tkinter fields
     values = []
     for i in range(len(entries)):
@@ -382,35 +1370,51 @@ def get_vals(entries):
 ###############################################################################
 
 
-# MAIN WINDOW
-window = tk.Tk()
+# MAIN WINDOW (created by main(), so that importing this file doesn't open a window)
+window = None
 
 # Serial port
 _sport = sport()
 
 # Bode plot
-_plot = plot(fs=48076)  # Sampling frequency = 48kHz
+_plot = plot(fs=FS)  # Sampling frequency = 48kHz
 
 # File loader
 _floader = floader()
 
+# Filter generator
+_generator = generator()
+
+# Preset library
+_library = library_browser()
+
+# Timing overlay
+_overlay = stats_overlay()
+
+# Live measurement data
+_live = live_view()
+
 
 ###############################################################################
 ## MAIN FUNCTION
 ###############################################################################
 
 
-def main():
+def main(startup_probe=False):
 
     ## MAIN WINDOW
+    global window
+    window = tk.Tk()
     screenheight = window.winfo_screenheight()
     screenwidth = window.winfo_screenwidth()
-    window.minsize(int(0.7*screenwidth), int(0.7*screenheight))
-    window.maxsize(int(0.7*screenwidth), int(0.7*screenheight))
+    width = int(0.7*screenwidth)
+    height = int(0.7*screenheight)
+    window.minsize(width, height)
+    window.maxsize(width, height)
+    window.geometry(f"{width}x{height}")
     window.title("ROOM SHAKER")
-    icon = PhotoImage(file = os.path.join(os.path.dirname(__file__), "imgs\\icon.png"))
+    icon = PhotoImage(file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "imgs", "icon.png"))
     window.iconphoto(False, icon)
-    window.update()
     window.rowconfigure(0, weight=1)
     window.rowconfigure(1, weight=1)
     window.rowconfigure(2, weight=1)
@@ -420,39 +1424,31 @@ def main():
     window.columnconfigure(0, weight=1)
 
     ## FIRST ROW
-    first_row = create_widget(window, tk.Frame, height=2*window.winfo_height()/20, width=window.winfo_width())
+    first_row = create_widget(window, tk.Frame, height=2*height/20, width=width)
     first_row.grid(row=0, column=0)
     first_row.columnconfigure(0, weight=1)
     first_row.columnconfigure(1, weight=1)
     first_row.columnconfigure(2, weight=1)
     first_row.grid_propagate(False)
-    first_row.update()
 
     # Logo
-    bg = Image.open(os.path.join(os.path.dirname(__file__), "imgs\\room_shaker_transparent.png"))
-    resize_factor = 1.0 * min(first_row.winfo_width()/bg.width, first_row.winfo_height()/bg.height)
-    img = bg.resize((int(bg.width * resize_factor), int(bg.height * resize_factor)), Image.Resampling.LANCZOS)
-    tk_bg = ImageTk.PhotoImage(img)
+    tk_bg = load_image("room_shaker_transparent.png", width, 2*height/20)
     image_label = create_widget(first_row, tk.Label, image=tk_bg)
     image_label.grid(row=0, column=1)
 
     ## SECOND ROW
-    second_row = create_widget(window, tk.Frame, height=2*window.winfo_height()/20, width=window.winfo_width())
+    second_row = create_widget(window, tk.Frame, height=2*height/20, width=width)
     second_row.grid(row=1, column=0)
     second_row.columnconfigure(0, weight=1)
     second_row.columnconfigure(1, weight=1)
     second_row.columnconfigure(2, weight=1)
     second_row.grid_propagate(False)
-    second_row.update()
-    chart = Image.open(os.path.join(os.path.dirname(__file__), "imgs\\flow.png"))
-    chart_resize_factor = 0.9 * min((second_row.winfo_width()*.75)/chart.width, second_row.winfo_height()/chart.height)
-    chart_img = chart.resize((int(chart.width * chart_resize_factor), int(chart.height * chart_resize_factor)), Image.Resampling.LANCZOS)
-    chart_bg = ImageTk.PhotoImage(chart_img)
+    chart_bg = load_image("flow.png", 0.9*width*.75, 0.9*2*height/20)
     chart_label = create_widget(second_row, tk.Label, image=chart_bg)
     chart_label.grid(row=0, column=1)
 
     ## THIRD ROW
-    third_row = create_widget(window, tk.Frame, height=10*window.winfo_height()/20, width=window.winfo_width()) # bg="green"
+    third_row = create_widget(window, tk.Frame, height=10*height/20, width=width) # bg="green"
     third_row.grid(row=2, column=0, sticky="nsew")
     third_row.columnconfigure(0, weight=1)
     third_row.columnconfigure(1, weight=1)
@@ -466,13 +1462,9 @@ def main():
     third_row.columnconfigure(9, weight=20)
     third_row.columnconfigure(10, weight=1)
     third_row.grid_propagate(False)
-    third_row.update()
 
     # Biquad expression
-    bqd = Image.open(os.path.join(os.path.dirname(__file__), "imgs\\biquad_transparent.png"))
-    bqd_resize_factor = 1.0 * min((second_row.winfo_width()*.25)/bqd.width, (second_row.winfo_height()*.75)/bqd.height)
-    bqd_img = bqd.resize((int(bqd.width * bqd_resize_factor), int(bqd.height * bqd_resize_factor)), Image.Resampling.LANCZOS)
-    bqd_bg = ImageTk.PhotoImage(bqd_img)
+    bqd_bg = load_image("biquad_transparent.png", width*.25, (2*height/20)*.75)
     bqd_label = create_widget(third_row, tk.Label, image=bqd_bg)
     bqd_label.grid(row=0, column=1, columnspan=7)
 
@@ -488,11 +1480,6 @@ def main():
     a2_label = create_widget(third_row, tk.Label, text="a2", font=("Helvetica", 12, "bold"))
     a2_label.grid(row=1, column=6)
 
-    # Store labels and entry fields
-    labels = []     # List
-    entries = []    # List of lists
-    load_buttons = []   # List
-
     # Configure rows to support the correct number of filters
     third_row.rowconfigure(0, weight=1)
     for i in range(1, num_filters+3):
@@ -500,38 +1487,18 @@ def main():
     third_row.rowconfigure(num_filters+2, weight=10)
     # third_row.update()
 
-    # Generate all of the labels and input fields
-    for i in range(num_filters):
-        row=i+2
-        e = create_widget(third_row, tk.Label, text=("Biquad " + str(i)), font=("Helvetica", 12, "bold"))
-        e.grid(row=row, column=1)
-        labels.append(e)
-        entries.append([])
-        for j in range(num_parameters):
-            e = create_widget(third_row, tk.Entry, width=10)
-            e.grid(row=row, column=j+2)
-            entries[i].append(e)
-        e = create_widget(third_row, tk.Button, text="Load from .txt...", command=lambda n=i:_floader.browse_files(is_txt=True, is_single=True, filter_index=n), font=("Helvetica", 10, "bold"))
-        e.grid(row=row, column=num_parameters+2)
-        load_buttons.append(e)
-
-    # Set default values for all filters
-    for i in range(0, num_filters):
-        for j in range(num_parameters):
-            if (j == 0):
-                entries[i][j].insert(0, "1.0000000")
-            else:
-                entries[i][j].insert(0, "0.0000000")
+    # Coefficient table; num_filters rows are visible, and it scrolls when the device has more filters
+    table = coef_table(count=num_filters, visible_rows=num_filters)
+    table.build(third_row, first_row=2, first_column=1, load_command=lambda n:_floader.browse_files(is_txt=True, is_single=True, filter_index=n))
 
     # Create frequency response plot
     freq_plot_container = create_widget(third_row, tk.Frame, bg="pink") # bg="grey"
     freq_plot_container.grid(row=0, column=9, rowspan=num_filters+3, sticky="nsew")
     freq_plot_container.pack_propagate(False)
-    window.update_idletasks()
-    _plot.create(parent=freq_plot_container, toolbar_true=False, fields=entries)
+    window.bind("<F12>", lambda event:_overlay.toggle(freq_plot_container))
 
     # Quick options
-    quick_options_container = create_widget(third_row, tk.Frame,  height=3*window.winfo_height()/40)
+    quick_options_container = create_widget(third_row, tk.Frame,  height=3*height/40)
     quick_options_container.grid(row=num_filters+2, column=1, columnspan=7, sticky="nsew")
     quick_options_container.rowconfigure(0, weight=3)
     quick_options_container.rowconfigure(1, weight=1)
@@ -546,21 +1513,44 @@ def main():
     txt.grid(row=1, column=1)
     
     # Upload BEQ
-    # beq = create_widget(quick_options_container, tk.Button, text="Load from BEQDesigner file...", command=lambda:_floader.browse_files(is_txt=False, is_single=False), font=("Helvetica", 12, "bold"))
-    # beq.grid(row=1, column=2)
-    # beq["state"] = "disabled" # Disable this button until it is fully implemented
+    beq = create_widget(quick_options_container, tk.Button, text="Load from BEQDesigner file...", command=lambda:_floader.browse_files(is_txt=False, is_single=False), font=("Helvetica", 12, "bold"))
+    beq.grid(row=2, column=1)
+
+    # Preset library
+    library = create_widget(quick_options_container, tk.Button, text="Preset library...", command=_library.open, font=("Helvetica", 12, "bold"))
+    library.grid(row=2, column=3)
+
+    # Preset bank: every preset of a bank file, one click apart
+    bank_presets = create_widget(quick_options_container, ttk.Combobox, state="disabled", width=30)
+    bank_presets.grid(row=3, column=2, columnspan=2)
+    bank_presets.bind("<<ComboboxSelected>>", lambda event:_floader.load_from_bank(bank_presets.current()))
+    bank_button = create_widget(quick_options_container, tk.Button, text="Load bank...", command=lambda:_floader.browse_bank(bank_presets), font=("Helvetica", 12, "bold"))
+    bank_button.grid(row=3, column=1)
+
+    # Room measurement, with the response the current filters would give it
+    measurement_button = create_widget(quick_options_container, tk.Button, text="Load measurement...", command=load_measurement, font=("Helvetica", 12, "bold"))
+    measurement_button.grid(row=4, column=1)
+    smoothing = tk.StringVar(value=next(label for label, fraction in SMOOTHING.items() if fraction == _plot.smoothing))
+    smoothing_box = create_widget(quick_options_container, ttk.Combobox, textvariable=smoothing, values=list(SMOOTHING), state="readonly", width=12)
+    smoothing_box.bind("<<ComboboxSelected>>", lambda event: set_smoothing(smoothing.get()))
+    smoothing_box.grid(row=4, column=2)
+    clear_measurement = create_widget(quick_options_container, tk.Button, text="Clear measurement", command=lambda:_plot.set_measurement(None), font=("Helvetica", 12, "bold"))
+    clear_measurement.grid(row=4, column=3)
 
     # Filter configurator
-    configurator = create_widget(quick_options_container, tk.Button, text="Generate new filter..", font=("Helvetica", 12, "bold"))
+    configurator = create_widget(quick_options_container, tk.Button, text="Generate new filter..", command=_generator.open, font=("Helvetica", 12, "bold"))
     configurator.grid(row=1, column=2)
-    configurator["state"] = "disabled" # Disable this button until it is fully implemented
+
+    # Render a WAV file through the current filters
+    render = create_widget(quick_options_container, tk.Button, text="Render .wav...", command=lambda:render_wav(table), font=("Helvetica", 12, "bold"))
+    render.grid(row=2, column=2)
 
     # Superbass Mode
-    beq = create_widget(quick_options_container, tk.Button, text="Super Bass Mode", command=lambda:_floader.enable_super_bass(len(entries)), font=("Helvetica", 12, "bold"))
+    beq = create_widget(quick_options_container, tk.Button, text="Super Bass Mode", command=lambda:_floader.enable_super_bass(len(table)), font=("Helvetica", 12, "bold"))
     beq.grid(row=1, column=3)
 
     ## FOURTH ROW
-    # fourth_row = create_widget(window, tk.Frame, height=3*window.winfo_height()/40, width=window.winfo_width())
+    # fourth_row = create_widget(window, tk.Frame, height=3*height/40, width=width)
     # fourth_row.grid(row=3, column=0)
     # fourth_row.grid_propagate(False)
     # fourth_row.columnconfigure(0, weight=2)
@@ -571,7 +1561,7 @@ def main():
     # fourth_row.rowconfigure(2, weight=1)
 
     ## FIFTH ROW
-    fifth_row = create_widget(window, tk.Frame, height=3*window.winfo_height()/40, width=window.winfo_width())
+    fifth_row = create_widget(window, tk.Frame, height=3*height/40, width=width)
     fifth_row.grid(row=4, column=0)
     fifth_row.grid_propagate(False)
     fifth_row.columnconfigure(0, weight=1)
@@ -585,25 +1575,57 @@ def main():
     fifth_row.grid_propagate(False)
     # fifth_row.update()
 
+    # Optimize the cascade (drop and merge stages, order for headroom) before uploading it
+    optimize = tk.BooleanVar(value=False)
+
     # Upload Filters
-    upload = create_widget(fifth_row, tk.Button, text="Upload Filters", command=lambda:_sport.upload_filters(get_vals(entries)), font=("Helvetica", 12, "bold"))
+    upload = create_widget(fifth_row, tk.Button, text="Upload Filters", command=lambda:upload_filters(table, optimize=optimize.get()), font=("Helvetica", 12, "bold"))
     upload["state"] = "disabled"
     upload.grid(row=1, column=2)
 
+    # Force full sync, for when the device and the last upload may have diverged
+    full_sync = create_widget(fifth_row, tk.Button, text="Force Full Sync", command=lambda:upload_filters(table, force_full=True, optimize=optimize.get()), font=("Helvetica", 10, "bold"))
+    full_sync["state"] = "disabled"
+    full_sync.grid(row=2, column=2)
+
+    # Reliable upload (needs firmware that acknowledges frames)
+    reliable = tk.BooleanVar(value=_sport.reliable)
+    reliable_check = create_widget(fifth_row, tk.Checkbutton, text="Reliable upload", variable=reliable, command=lambda:setattr(_sport, "reliable", reliable.get()), font=("Helvetica", 12, "bold"))
+    reliable_check.grid(row=1, column=4)
+
     # Enable Auto EQ
     autoeq = create_widget(fifth_row, tk.Button, text="Enable Auto EQ", command=_sport.enable_autoeq, font=("Helvetica", 12, "bold"))
     autoeq["state"] = "disabled"
     autoeq.grid(row=1, column=3)
 
+    # Live levels and spectra reported by the device
+    live = create_widget(fifth_row, tk.Button, text="Live data...", command=_live.open, font=("Helvetica", 12, "bold"))
+    live.grid(row=2, column=3)
+
+    optimize_check = create_widget(fifth_row, tk.Checkbutton, text="Optimize before upload", variable=optimize, font=("Helvetica", 10, "bold"))
+    optimize_check.grid(row=2, column=4)
+
+    # Ask the device for its filter count when the port is opened (needs firmware that answers 0xC1)
+    query_filters = tk.BooleanVar(value=False)
+    query_check = create_widget(fifth_row, tk.Checkbutton, text="Ask for filter count", variable=query_filters, font=("Helvetica", 10, "bold"))
+    query_check.grid(row=1, column=0)
+
     # Select COM Port
     port = tk.StringVar()
-    com = create_widget(fifth_row, ttk.Combobox, textvariable=port, postcommand=lambda:_sport.open_com_port(com), font=("Helvetica", 12, "bold"))
+    com = create_widget(fifth_row, ttk.Combobox, textvariable=port, postcommand=lambda:list_ports(com), font=("Helvetica", 12, "bold"))
     com.set('Select COM Port...')
-    com.bind("<<ComboboxSelected>>", lambda event: _sport.bind(event, port.get(), [upload, autoeq]))
+    com.bind("<<ComboboxSelected>>", lambda event: bind_port(port.get(), [upload, full_sync, autoeq], table, query_filters.get()))
     com.grid(row=1, column=1)
 
+    # Baud rate; applied to the open port straight away
+    baud = tk.StringVar(value=str(_sport.baudrate))
+    baud_box = create_widget(fifth_row, ttk.Combobox, textvariable=baud, values=["9600", "115200", "230400", "460800", "921600"], width=10, font=("Helvetica", 10, "bold"))
+    baud_box.bind("<<ComboboxSelected>>", lambda event: set_baudrate(baud.get()))
+    baud_box.bind("<Return>", lambda event: set_baudrate(baud.get()))
+    baud_box.grid(row=2, column=1)
+
     ## SIXTH ROW
-    sixth_row = create_widget(window, tk.Frame, height=3*window.winfo_height()/20, width=window.winfo_width())
+    sixth_row = create_widget(window, tk.Frame, height=3*height/20, width=width)
     sixth_row.grid(row=5, column=0)
     sixth_row.columnconfigure(0, weight=1)
     sixth_row.columnconfigure(1, weight=1)
@@ -618,19 +1640,40 @@ def main():
     output = create_widget(sixth_row, tk.Text, height=6, width=100)
     output.grid(row=1, column=1)
 
-    # Store entry fields for file loader
-    _floader.store_fields(fields=entries)
+    # Store entry fields for file loader and filter generator
+    _floader.store_fields(fields=table)
+    _generator.store_fields(fields=table)
 
     # Checking for received data
-    _sport.receive_response(output)
+    receive_response(output)
+
+    # Stop the reader thread and release the port on exit
+    window.protocol("WM_DELETE_WINDOW", lambda:(_sport.close(), window.destroy()))
+
+    # Show the window before loading the plotting backend, then add the plot
+    window.update()
+    first_paint = time.perf_counter() - start_time
+    load_backend()
+    _live.connect()
+    _plot.create(parent=freq_plot_container, toolbar_true=False, fields=table)
+    window.update()
+    interactive = time.perf_counter() - start_time
 
-    window.after(250, _plot.update, entries)
+    # Startup benchmark: report and quit
+    if startup_probe:
+        print(json.dumps({"first_paint": first_paint, "interactive": interactive}))
+        window.destroy()
+        return
 
     ## BEGIN TKINTER EVENT LOOP
     window.mainloop()
     
 
-main()
+if __name__ == "__main__":
+    if "--benchmark-startup" in sys.argv:
+        benchmark_startup()
+    else:
+        main(startup_probe="--startup-probe" in sys.argv)
 
 
 ###############################################################################
@@ -0,0 +1,27 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               __init__.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        ROOM SHAKER core library: filter math, parameter
+#                       files and the serial protocol, with no GUI
+#                       dependencies.
+#   Application Notes:  Submodules are deliberately not imported here so that
+#                       the CLI only pays for what it uses (e.g. an upload
+#                       never imports numpy).
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
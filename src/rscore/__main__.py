@@ -0,0 +1,31 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               __main__.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        Entry point for "python -m rscore".
+#   Application Notes:
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+import sys
+
+from rscore.cli import main
+
+if __name__ == "__main__":     # Worker processes (e.g. autoeq on Windows) re-import this module
+    sys.exit(main())
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
@@ -0,0 +1,185 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               autoeq.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        Host-side auto EQ: fits a cascade of parametric
+#                       (peaking) biquads so that measured + filters matches a
+#                       target curve.
+#   Application Notes:  Each stage is parametrized as [ln F0, ln Q, gain dB].
+#                       The cascade magnitude and its Jacobian are evaluated
+#                       analytically for all stages in one broadcast, and the
+#                       bounded least squares problem is solved from several
+#                       starting points in parallel processes. Peaking biquads
+#                       with 0 < F0 < FS/2 and Q > 0 are always stable, so the
+#                       bounds are also the stability constraint.
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+## DEPENDENCIES
+###############################################################################
+
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .config import num_filters, FS
+from .designer import design
+from .dsp import log_grid
+from .measurement import resample
+
+
+###############################################################################
+## CASCADE MODEL
+###############################################################################
+
+
+DB_PER_NEPER = 20 / math.log(10)
+
+# Function to evaluate the magnitude (dB) of a cascade of peaking biquads and its Jacobian
+#   x:      flat array [ln f0, ln q, gain_db] * stages
+#   Returns db (len(freqs),) and jac (len(freqs), len(x))
+def peaking_cascade(x, freqs, fs=FS):
+    x = np.asarray(x, dtype=float).reshape(-1, 3)
+    f0 = np.exp(x[:, 0])[:, None]
+    q = np.exp(x[:, 1])[:, None]
+    gain = x[:, 2][:, None]
+
+    # Intermediate variables, (stages x 1)
+    A = 10**(gain/40)
+    w0 = 2*np.pi*f0/fs
+    cosw0 = np.cos(w0)
+    sinw0 = np.sin(w0)
+    alpha = sinw0/(2*q)
+
+    # Textbook coefficients and their response, (stages x freqs)
+    z = np.exp(-2j*np.pi*np.asarray(freqs, dtype=float)/fs)[None, :]
+    z2 = z*z
+    N = (1 + alpha*A) - 2*cosw0*z + (1 - alpha*A)*z2
+    D = (1 + alpha/A) - 2*cosw0*z + (1 - alpha/A)*z2
+    db = DB_PER_NEPER*np.sum(np.log(np.abs(N/D)), axis=0)
+
+    # Derivatives of the intermediates with respect to [ln f0, ln q, gain]
+    dA = (0*A, 0*A, A*math.log(10)/40)
+    dw0 = (w0, 0*w0, 0*w0)
+    dalpha = (cosw0*w0/(2*q), -alpha, 0*alpha)
+
+    # d(dB)/dp = 20/ln(10) * Re(dN/N - dD/D), one column per stage and parameter
+    jac = np.empty((z.shape[1], x.size))
+    for k in range(3):
+        db_side = dalpha[k]*A + alpha*dA[k]
+        da_side = dalpha[k]/A - alpha*dA[k]/A**2
+        d_cos = 2*sinw0*dw0[k]
+        dN = db_side + d_cos*z - db_side*z2
+        dD = da_side + d_cos*z - da_side*z2
+        jac[:, k::3] = DB_PER_NEPER*np.real(dN/N - dD/D).T
+
+    return db, jac
+
+# Function to convert fitted parameters to (stages x 3) [f0, q, gain_db]
+def to_params(x):
+    x = np.asarray(x, dtype=float).reshape(-1, 3)
+    return np.column_stack((np.exp(x[:, 0]), np.exp(x[:, 1]), x[:, 2]))
+
+
+###############################################################################
+## FITTING
+###############################################################################
+
+
+# Class to hold the result of a fit
+class fit:
+
+    def __init__(self, params, coefs, freqs, error_before, error_after, starts, elapsed):
+        self.params = params                # (stages x 3) [f0, q, gain_db]
+        self.coefs = coefs                  # (stages x 5) CMSIS-DSP coefficients
+        self.freqs = freqs                  # Grid the fit was done on
+        self.error_before = error_before    # Residuals (dB) without filters
+        self.error_after = error_after      # Residuals (dB) with the fitted filters
+        self.starts = starts
+        self.elapsed = elapsed
+
+    def rms_before(self):
+        return float(np.sqrt(np.mean(self.error_before**2)))
+
+    def rms_after(self):
+        return float(np.sqrt(np.mean(self.error_after**2)))
+
+# Function to run one bounded least squares fit; at module level so it can run in a worker process
+def fit_once(job):
+    from scipy.optimize import least_squares
+
+    x0, error, freqs, lower, upper, fs = job
+    residual = lambda x: error + peaking_cascade(x, freqs, fs)[0]
+    jacobian = lambda x: peaking_cascade(x, freqs, fs)[1]
+    result = least_squares(residual, np.clip(x0, lower, upper), jac=jacobian, bounds=(lower, upper), method="trf", x_scale="jac")
+    return result.cost, result.x
+
+# Function to pick starting points: the first one places a stage on each of the largest deviations, the others are random
+def starting_points(error, freqs, stages, starts, q_range, gain_range, seed):
+    rng = np.random.default_rng(seed)
+    points = []
+
+    # Greedy: cut (or boost) the worst remaining deviation, then mask out the octave around it
+    x = []
+    remaining = error.copy()
+    for i in range(stages):
+        k = int(np.argmax(np.abs(remaining)))
+        x.extend((math.log(freqs[k]), math.log(2.0), float(np.clip(-remaining[k], *gain_range))))
+        remaining[np.abs(np.log2(freqs/freqs[k])) < 0.5] = 0
+    points.append(np.array(x))
+
+    for i in range(1, starts):
+        x = np.column_stack((rng.uniform(math.log(freqs[0]), math.log(freqs[-1]), stages),
+                             rng.uniform(math.log(q_range[0]), math.log(q_range[1]), stages),
+                             rng.uniform(gain_range[0], gain_range[1], stages)/4))
+        points.append(x.ravel())
+    return points
+
+# Function to fit parametric stages to a measurement
+#   measured:   (freqs, levels_db) of the room
+#   target:     (freqs, levels_db) of the target curve, or None for flat
+#   align:      shift the target to the measurement's average level, since the filters can't change the overall level
+def fit_response(measured, target=None, stages=num_filters, f_min=15, f_max=250, num_points=256, q_range=(0.3, 10.0), gain_range=(-15.0, 6.0), starts=8, workers=None, seed=0, fs=FS, align=True):
+    start = time.perf_counter()
+
+    freqs = log_grid(f_min, f_max, num_points)
+    measured_db = resample(measured[0], measured[1], freqs)
+    target_db = np.zeros_like(freqs) if target is None else resample(target[0], target[1], freqs)
+    if align:
+        target_db = target_db + np.mean(measured_db - target_db)
+    error = measured_db - target_db
+
+    lower = np.tile((math.log(f_min), math.log(q_range[0]), gain_range[0]), stages)
+    upper = np.tile((math.log(f_max), math.log(q_range[1]), gain_range[1]), stages)
+    jobs = [(x0, error, freqs, lower, upper, fs) for x0 in starting_points(error, freqs, stages, starts, q_range, gain_range, seed)]
+
+    if workers == 1 or len(jobs) == 1:
+        results = [fit_once(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(fit_once, jobs))
+    cost, x = min(results, key=lambda result: result[0])
+
+    params = to_params(x)
+    coefs = design("peaking", params[:, 0], q=params[:, 1], gain_db=params[:, 2], fs=fs)
+    error_after = error + peaking_cascade(x, freqs, fs)[0]
+    return fit(params, coefs, freqs, error, error_after, len(jobs), time.perf_counter() - start)
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
@@ -0,0 +1,175 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               bank.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        Binary preset banks: many presets in one file, loaded
+#                       by memory-mapping it.
+#   Application Notes:  Layout, little endian:
+#                         header    magic "RSBK", version, bytes per value,
+#                                   presets, parameters per biquad, offsets
+#                         index     per preset: first biquad, biquads,
+#                                   name offset and length
+#                         names     UTF-8, back to back
+#                         data      (biquads x parameters) float32/float64,
+#                                   16 byte aligned
+#                       Opening a bank reads only the header, index and names;
+#                       a preset is a view into the mapped data block.
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+## DEPENDENCIES
+###############################################################################
+
+import os
+import re
+import struct
+
+import numpy as np
+
+from .config import num_parameters
+from . import params
+
+
+###############################################################################
+## BANK FILES
+###############################################################################
+
+
+MAGIC = b'RSBK'
+VERSION = 1
+HEADER = struct.Struct('<4sHBxIHxxQQ')     # magic, version, bytes per value, presets, parameters, names offset, data offset
+INDEX_DTYPE = np.dtype([('first', '<u4'), ('stages', '<u2'), ('flags', '<u2'), ('name_offset', '<u4'), ('name_length', '<u4')])
+VALUE_TYPES = {4: np.dtype('<f4'), 8: np.dtype('<f8')}
+ALIGNMENT = 16
+
+# Function to write presets to a bank
+#   presets:    list of (name, coefficients), each (biquads x parameters)
+#   dtype:      float32 (what the device uses) or float64
+def write_bank(filename, presets, dtype=np.float32):
+    dtype = np.dtype(dtype).newbyteorder('<')
+    if dtype.itemsize not in VALUE_TYPES or dtype.kind != 'f':
+        raise ValueError("banks hold float32 or float64 values")
+
+    names = [name.encode('utf-8') for name, _ in presets]
+    blocks = [np.asarray(coefs, dtype=float).reshape(-1, num_parameters) for _, coefs in presets]
+    index = np.zeros(len(presets), dtype=INDEX_DTYPE)
+    stages = np.array([len(block) for block in blocks], dtype=np.int64)
+    lengths = np.array([len(name) for name in names], dtype=np.int64)
+    if np.any(stages > 0xFFFF) or stages.sum() > 0xFFFFFFFF:
+        raise ValueError("too many biquads for one bank")
+    index['stages'] = stages
+    index['first'] = np.cumsum(stages) - stages
+    index['name_length'] = lengths
+    index['name_offset'] = np.cumsum(lengths) - lengths
+
+    names_offset = HEADER.size + index.nbytes
+    data_offset = -(-(names_offset + int(lengths.sum())) // ALIGNMENT) * ALIGNMENT
+    data = np.concatenate(blocks) if blocks else np.zeros((0, num_parameters))
+
+    with open(filename, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, dtype.itemsize, len(presets), num_parameters, names_offset, data_offset))
+        f.write(index.tobytes())
+        f.write(b''.join(names))
+        f.write(bytes(data_offset - f.tell()))
+        f.write(data.astype(dtype).tobytes())
+
+# Class to read a bank; the file is memory-mapped and presets are views into it, so opening is independent of the bank size
+class bank:
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.raw = np.memmap(filename, dtype=np.uint8, mode='r')
+        if len(self.raw) < HEADER.size:
+            raise ValueError(f"{filename} is not a preset bank")
+        magic, version, value_size, presets, parameters, names_offset, data_offset = HEADER.unpack(self.raw[:HEADER.size].tobytes())
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not a preset bank")
+        if version > VERSION:
+            raise ValueError(f"{filename} is a version {version} bank, this version reads up to {VERSION}")
+        if value_size not in VALUE_TYPES or parameters != num_parameters:
+            raise ValueError(f"{filename}: unsupported layout ({value_size} byte values, {parameters} parameters)")
+
+        self.index = self.raw[HEADER.size:HEADER.size + presets * INDEX_DTYPE.itemsize].view(INDEX_DTYPE)
+        names = self.raw[names_offset:data_offset].tobytes()
+        self.names = [names[o:o+n].decode('utf-8') for o, n in zip(self.index['name_offset'].tolist(), self.index['name_length'].tolist())]
+        self.lookup = {name: i for i, name in reversed(list(enumerate(self.names)))}    # First preset wins on duplicate names
+
+        total = int(self.index['stages'].sum())
+        end = data_offset + total * parameters * value_size
+        if len(self.index) != presets or end > len(self.raw):
+            raise ValueError(f"{filename} is truncated")
+        self.data = self.raw[data_offset:end].view(VALUE_TYPES[value_size]).reshape(total, parameters)
+
+    def __len__(self):
+        return len(self.index)
+
+    # Function to get a preset by position or name, as a read-only (biquads x parameters) view
+    def __getitem__(self, key):
+        i = self.lookup[key] if isinstance(key, str) else key
+        first, stages = int(self.index['first'][i]), int(self.index['stages'][i])
+        return self.data[first:first+stages]
+
+    # Function to release the mapping; it is unmapped once no preset views are left
+    def close(self):
+        self.data = self.index = self.raw = None
+
+
+###############################################################################
+## CONVERTERS
+###############################################################################
+
+
+# Function to read a parameter file straight into an array; files numpy can't parse go through params.load_params
+def read_text(filename):
+    try:
+        values = np.loadtxt(filename, delimiter=",", ndmin=2)
+    except ValueError:
+        values = np.array(params.load_params(filename), dtype=float)
+    if values.size == 0 or values.shape[1] != num_parameters:
+        raise ValueError(f"{filename}: expected {num_parameters} values per row")
+    return values
+
+# Function to pack parameter files into a bank, one preset per file named after the file; returns the number of presets
+def text_to_bank(filenames, out_filename, dtype=np.float32):
+    presets = [(os.path.splitext(os.path.basename(filename))[0], read_text(filename)) for filename in filenames]
+    write_bank(out_filename, presets, dtype)
+    return len(presets)
+
+# Function to unpack a bank into one parameter file per preset; returns the files written
+# Presets whose names end up the same (ignoring case, for Windows) get a counter, so none overwrites another
+def bank_to_text(bank_filename, out_dir):
+    b = bank(bank_filename)
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+    used = set()
+    try:
+        for i, name in enumerate(b.names):
+            stem = re.sub(r'[<>:"/\\|?*\x00-\x1f]', "_", name) or f"preset_{i}"
+            unique, count = stem, 1
+            while unique.lower() in used:
+                count += 1
+                unique = f"{stem}_{count}"
+            used.add(unique.lower())
+            filename = os.path.join(out_dir, unique + ".txt")
+            params.write_params(filename, b[i].tolist())
+            written.append(filename)
+    finally:
+        b.close()
+    return written
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
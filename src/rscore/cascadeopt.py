@@ -0,0 +1,271 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               cascadeopt.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        Pre-upload optimization of a biquad cascade: removes
+#                       stages that do nothing, merges stages that cancel or
+#                       that fit in one biquad, orders the rest for headroom
+#                       and estimates what the cascade costs on the device.
+#   Application Notes:  Every stage is handled as a numerator and a monic
+#                       denominator, [b0, b1, b2] and [1, -a1, -a2]. When the
+#                       zeros of one stage match the poles of another, the
+#                       two collapse into a single stage; when they match the
+#                       poles of the same stage, it is a plain gain. Gains are
+#                       folded into the numerator of a remaining stage.
+#                       Sections are then ordered greedily, so that the peak
+#                       gain of the running product stays as low as possible
+#                       (cuts before boosts). The result is checked against
+#                       the original response and discarded if it differs.
+#
+#                       Cycle figures are rough estimates for CMSIS-DSP's
+#                       float32 biquad functions on a Cortex-M4F and assume
+#                       the firmware runs only the stages it is given; the
+#                       noise figure models float32 rounding in each stage,
+#                       shaped by that stage's poles and the stages after it.
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+## DEPENDENCIES
+###############################################################################
+
+import numpy as np
+
+from .config import num_parameters, FS
+from .dsp import create_allpass, stage_response
+
+
+###############################################################################
+## COST MODEL
+###############################################################################
+
+
+# Cycles per sample for each stage, per block for each stage (loading coefficients and state) and per block
+COST_MODELS = {
+    "df1_f32": {"function": "arm_biquad_cascade_df1_f32", "stage": 14, "stage_block": 30, "block": 20},
+    "df2t_f32": {"function": "arm_biquad_cascade_df2T_f32", "stage": 10, "stage_block": 25, "block": 20},
+}
+
+ROUNDING_OPS = 9                            # 5 multiplies and 4 adds per stage and sample
+UNIT_ROUNDOFF = 2.0**-24                    # float32
+
+# Function to get the frequency grids for the headroom and noise estimates: log spaced for the peaks, uniform for the noise power
+def analysis_grids(fs, num_points=2048):
+    return np.geomspace(1, 0.499 * fs, num_points), np.linspace(0, 0.5 * fs, 4 * num_points, endpoint=False)
+
+# Function to estimate the cost of a cascade on the device
+#   Returns stages, cycles per sample, millions of cycles per second at fs, peak gain of any intermediate
+#   result (dB) and the rounding noise at the output (dB relative to a full scale sine)
+def estimate(coefs, fs=FS, model="df1_f32", block_size=32):
+    coefs = np.asarray(coefs, dtype=float).reshape(-1, num_parameters)
+    costs = COST_MODELS[model]
+    cycles = len(coefs) * (costs["stage"] + costs["stage_block"] / block_size) + costs["block"] / block_size
+    result = {"stages": len(coefs), "cycles_per_sample": cycles, "mcycles_per_second": cycles * fs / 1e6, "peak_db": 0.0, "noise_dbfs": -np.inf}
+    if len(coefs) == 0:
+        return result
+
+    log_freqs, linear_freqs = analysis_grids(fs)
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        # Signal level at the output of every stage, for a full scale input at the worst frequency
+        H, _ = stage_response(coefs, fs, log_freqs)
+        levels = np.max(np.cumprod(np.abs(H), axis=0), axis=1)
+        result["peak_db"] = float(20 * np.log10(np.max(levels)))
+
+        # Rounding noise injected in stage k, at the larger of its input and output level, goes through 1/A_k and every later stage
+        H, _ = stage_response(coefs, fs, linear_freqs)
+        z = np.exp(-2j * np.pi * linear_freqs / fs)
+        after = np.cumprod(np.abs(H[::-1]), axis=0)[::-1]                          # after[k] = |H_k ... H_N|
+        after = np.vstack((after[1:], np.ones(len(linear_freqs))))                 # Stages after k only
+        A = 1 - coefs[:, 3:4] * z - coefs[:, 4:5] * z * z
+        noise_gain = np.mean((after / np.abs(A))**2, axis=1)
+        inputs = np.concatenate(([1.0], levels[:-1]))
+        variance = ROUNDING_OPS * (UNIT_ROUNDOFF * np.maximum(inputs, levels))**2 / 3
+        result["noise_dbfs"] = float(10 * np.log10(np.sum(variance * noise_gain) / 0.5))
+    return result
+
+
+###############################################################################
+## OPTIMIZATION
+###############################################################################
+
+
+# Class to hold an optimized cascade and what was done to it
+class result:
+
+    def __init__(self, original, coefs, before, after, notes, deviation_db, fs, model, block_size):
+        self.original = original            # (stages x 5) input coefficients
+        self.coefs = coefs                  # (stages x 5) CMSIS-DSP coefficients, possibly fewer stages than the input
+        self.before = before                # estimate() of the input
+        self.after = after                  # estimate() of the output
+        self.notes = notes                  # One line per change
+        self.deviation_db = deviation_db    # Largest difference between the two responses
+        self.fs = fs
+        self.model = model
+        self.block_size = block_size
+
+    # Function to pad the cascade with pass-through stages, for firmware that always runs a fixed number of stages
+    def padded(self, num_stages):
+        return pad(self.coefs, num_stages)
+
+    # Function to estimate the input and the output as uploaded to firmware that runs num_stages stages; returns (before, after)
+    # An input with more stages than that is estimated as it is
+    def padded_estimates(self, num_stages):
+        before = pad(self.original, max(num_stages, len(self.original)))
+        return (estimate(before, self.fs, self.model, self.block_size),
+                estimate(self.padded(num_stages), self.fs, self.model, self.block_size))
+
+# Function to pad a cascade to num_stages with pass-through stages
+def pad(coefs, num_stages):
+    if len(coefs) > num_stages:
+        raise ValueError(f"the cascade has {len(coefs)} stages, more than {num_stages}")
+    return np.vstack((coefs, np.tile(create_allpass(), (num_stages - len(coefs), 1))))
+
+# Function to check whether p is a multiple of the monic polynomial q; returns the factor, or None
+def multiple(p, q, tol):
+    if abs(p[0]) <= tol:
+        return None
+    if np.max(np.abs(p / p[0] - q)) <= tol * max(1.0, np.max(np.abs(q))):
+        return float(p[0])
+    return None
+
+# Function to remove and merge stages; works on (numerator, monic denominator) pairs, returns (stages, gain, notes)
+def simplify(stages, tol):
+    notes = []
+    gain = 1.0
+    labels = [f"{i}" for i in range(len(stages))]
+    changed = True
+    while changed:
+        changed = False
+
+        # Stages whose zeros cancel their own poles are a gain (1 for pass-through stages)
+        for i, (num, den) in enumerate(stages):
+            k = multiple(num, den, tol)
+            if k is not None:
+                gain *= k
+                notes.append(f"stage {labels[i]}: pass-through, removed" if abs(k - 1) <= tol else f"stage {labels[i]}: plain gain of {k:g}, folded into another stage")
+                del stages[i], labels[i]
+                changed = True
+                break
+        if changed:
+            continue
+
+        # Zeros of one stage cancelling the poles of another: both fit in one stage
+        for i, j in ((i, j) for i in range(len(stages)) for j in range(len(stages)) if i != j):
+            k = multiple(stages[i][0], stages[j][1], tol)
+            if k is not None:
+                merged = (k * stages[j][0], stages[i][1])
+                notes.append(f"stages {labels[i]} and {labels[j]}: zeros of {labels[i]} cancel the poles of {labels[j]}, merged")
+                stages[i], labels[i] = merged, f"{labels[i]}+{labels[j]}"
+                del stages[j], labels[j]
+                changed = True
+                break
+        if changed:
+            continue
+
+        # Two first order stages make one biquad
+        first_order = [i for i, (num, den) in enumerate(stages) if abs(num[2]) <= tol and abs(den[2]) <= tol]
+        if len(first_order) >= 2:
+            i, j = first_order[:2]
+            merged = (np.convolve(stages[i][0][:2], stages[j][0][:2]), np.convolve(stages[i][1][:2], stages[j][1][:2]))
+            notes.append(f"stages {labels[i]} and {labels[j]}: first order, merged")
+            stages[i], labels[i] = merged, f"{labels[i]}+{labels[j]}"
+            del stages[j], labels[j]
+            changed = True
+
+    return stages, gain, notes
+
+# Function to order stages so the running product peaks as little as possible; greedy, one stage at a time
+def order_for_headroom(stages, fs):
+    if len(stages) < 2:
+        return list(range(len(stages)))
+    log_freqs, _ = analysis_grids(fs)
+    magnitude = np.abs(stage_response(to_cmsis(stages), fs, log_freqs)[0])
+    running = np.ones(len(log_freqs))
+    remaining = list(range(len(stages)))
+    order = []
+    while remaining:
+        peaks = [np.max(running * magnitude[i]) for i in remaining]
+        best = remaining[int(np.argmin(peaks))]
+        order.append(best)
+        remaining.remove(best)
+        running = running * magnitude[best]
+    return order
+
+# Function to convert (numerator, monic denominator) pairs back to CMSIS-DSP coefficients
+def to_cmsis(stages):
+    return np.array([[num[0], num[1], num[2], -den[1], -den[2]] for num, den in stages]).reshape(-1, num_parameters)
+
+# Function to put a leftover gain where it costs the least headroom: into the first stage for cuts, the last for boosts
+def fold_gain(coefs, gain, tol):
+    if abs(gain - 1) <= tol:
+        return coefs
+    if len(coefs) == 0:
+        return np.array([[gain, 0.0, 0.0, 0.0, 0.0]])
+    coefs[0 if abs(gain) < 1 else -1, 0:3] *= gain
+    return coefs
+
+# Function to optimize a cascade without changing its response
+#   tol:            relative tolerance for two polynomials to be considered equal
+#   max_error_db:   if the optimized response differs by more than this anywhere, the input is returned unchanged
+def optimize(coefs, fs=FS, reorder=True, tol=1e-6, max_error_db=0.01, model="df1_f32", block_size=32):
+    coefs = np.asarray(coefs, dtype=float).reshape(-1, num_parameters)
+    stages = [(row[0:3].copy(), np.array([1.0, -row[3], -row[4]])) for row in coefs]
+    stages, gain, notes = simplify(stages, tol)
+
+    optimized = fold_gain(to_cmsis(stages), gain, tol)
+
+    # Only reorder if it buys headroom, or the same headroom with less noise; when the final response sets the peak, it rarely does
+    if reorder:
+        order = order_for_headroom(stages, fs)
+        if order != sorted(order):
+            kept, reordered = estimate(optimized, fs, model, block_size), estimate(fold_gain(to_cmsis([stages[i] for i in order]), gain, tol), fs, model, block_size)
+            if (reordered["peak_db"] < kept["peak_db"] - 0.1 or
+                    (reordered["peak_db"] <= kept["peak_db"] + 1e-9 and reordered["noise_dbfs"] < kept["noise_dbfs"])):
+                optimized = fold_gain(to_cmsis([stages[i] for i in order]), gain, tol)
+                notes.append(f"reordered for headroom, peak gain {kept['peak_db']:+.1f} -> {reordered['peak_db']:+.1f} dB")
+
+    # Never hand back something that sounds different
+    log_freqs, _ = analysis_grids(fs)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        before_db = 20 * np.log10(np.maximum(np.abs(np.prod(stage_response(coefs, fs, log_freqs)[0], axis=0)), 1e-12))
+        after_db = 20 * np.log10(np.maximum(np.abs(np.prod(stage_response(optimized, fs, log_freqs)[0], axis=0)), 1e-12)) if len(optimized) else np.zeros(len(log_freqs))
+    deviation = float(np.max(np.abs(before_db - after_db)))
+    if not deviation <= max_error_db:
+        notes = [f"the optimized cascade differs by {deviation:.3g} dB, kept the original"]
+        optimized = coefs
+
+    return result(coefs, optimized, estimate(coefs, fs, model, block_size), estimate(optimized, fs, model, block_size), notes, deviation, fs, model, block_size)
+
+# Function to format the before/after estimates of an optimization as a table
+#   padded:     number of stages the upload is padded to; adds the before/after estimates at that length
+def format_report(res, padded=None):
+    rows = [("stages", "{:d}", "stages"), ("cycles/sample", "{:.1f}", "cycles_per_sample"), ("Mcycles/s", "{:.2f}", "mcycles_per_second"),
+            ("peak gain (dB)", "{:+.2f}", "peak_db"), ("noise (dBFS)", "{:.1f}", "noise_dbfs")]
+    columns = [("BEFORE", res.before), ("AFTER", res.after)]
+    if padded is not None:
+        columns += zip((f"BEFORE@{padded}", f"AFTER@{padded}"), res.padded_estimates(padded))
+    lines = [f"{'':16s}" + "".join(f"{title:>10s}" for title, _ in columns)]
+    for label, fmt, key in rows:
+        lines.append(f"{label:16s}" + "".join(f"{fmt.format(estimates[key]):>10s}" for _, estimates in columns))
+    if padded is not None:
+        lines.append(f"  @{padded}: both padded to {padded} stages with pass-through stages, as uploaded")
+    lines += [f"  {note}" for note in res.notes]
+    lines.append(f"Largest response difference {res.deviation_db:.2g} dB")
+    return "\n".join(lines)
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
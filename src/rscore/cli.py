@@ -0,0 +1,452 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               cli.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        "roomshaker" command line interface for scripted,
+#                       GUI-less use of the core library.
+#   Application Notes:  Run with "python -m rscore <command>" from the src
+#                       directory. Heavy modules are imported inside the
+#                       command that needs them to keep startup fast.
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+## DEPENDENCIES
+###############################################################################
+
+import argparse
+import sys
+import time
+
+from .config import num_filters
+from . import params
+
+
+###############################################################################
+## COMMANDS
+###############################################################################
+
+
+# Function to load and validate a parameter file, printing any problems; returns None if the file can't be used
+def load_checked(filename, expected_filters):
+    try:
+        values = params.load_params(filename)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return None
+
+    errors = params.validate(values, expected_filters)
+    for error in errors:
+        print(f"ERROR: {filename}: {error}", file=sys.stderr)
+    if errors:
+        return None
+    return values
+
+def cmd_ports(args):
+    from .comms import sport
+    for port in sport().list_ports():
+        print(port)
+    return 0
+
+def cmd_validate(args):
+    values = load_checked(args.file, args.filters)
+    if values is None:
+        return 1
+    print(f"{args.file}: {len(values)} filters OK")
+    return 0
+
+def cmd_upload(args):
+    values = load_checked(args.file, args.filters)
+    if values is None:
+        return 1
+
+    import serial
+    from .comms import sport, upload_error
+    port = sport(baudrate=args.baud, reliable=args.reliable, timeout=args.timeout, write_timeout=args.write_timeout, flush=not args.no_flush)
+    try:
+        port.bind(args.port)
+    except serial.SerialException as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+
+    status = 0
+    try:
+        port.upload_filters(values, force_full=True)
+    except (upload_error, serial.SerialException) as e:
+        print(f"ERROR: upload failed: {e}", file=sys.stderr)
+        status = 1
+    finally:
+        # Give the device a moment to report back before closing the port
+        time.sleep(args.listen)
+        for line in port.read_lines(max_lines=sys.maxsize):
+            print(line)
+        port.close()
+    return status
+
+def cmd_provision(args):
+    values = load_checked(args.file, args.filters)
+    if values is None:
+        return 1
+
+    from .comms import sport
+    from . import provision
+    try:
+        ports = provision.expand_ports(args.ports, sport().list_ports())
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    results = provision.provision(values, ports, max_workers=args.workers, baudrate=args.baud, reliable=args.reliable, listen=args.listen,
+                                  timeout=args.timeout, write_timeout=args.write_timeout, flush=not args.no_flush)
+    elapsed = time.perf_counter() - start
+
+    print(provision.format_table(results))
+    failed = sum(1 for res in results if not res.ok)
+    print(f"{len(results) - failed} of {len(results)} devices provisioned in {1000*elapsed:.1f} ms")
+    return 1 if failed else 0
+
+def cmd_autoeq(args):
+    from . import autoeq, measurement
+    try:
+        measured = measurement.load_response(args.measurement)
+        target = measurement.load_response(args.target) if args.target else None
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    if args.smooth:
+        measured = (measured[0], measurement.smoother(*measured).smooth(args.smooth, measured[0]))
+
+    res = autoeq.fit_response(measured, target, stages=args.filters, f_min=args.fmin, f_max=args.fmax,
+                              gain_range=(-args.max_cut, args.max_boost), starts=args.starts, workers=args.workers, seed=args.seed)
+
+    print("STAGE  F0 (Hz)   Q      GAIN (dB)")
+    for i, (f0, q, gain) in enumerate(res.params):
+        print(f"{i:<5d}  {f0:8.2f}  {q:5.2f}  {gain:+7.2f}")
+    print(f"RMS error {res.rms_before():.2f} dB -> {res.rms_after():.2f} dB ({res.starts} starts, {res.elapsed:.2f} s)")
+
+    errors = params.validate(res.coefs.tolist(), args.filters)
+    for error in errors:
+        print(f"ERROR: {error}", file=sys.stderr)
+    if errors:
+        return 1
+    if args.out:
+        params.write_params(args.out, res.coefs.tolist())
+        print(f"Wrote {args.out}")
+    return 0
+
+def cmd_render(args):
+    values = load_checked(args.params, None)
+    if values is None:
+        return 1
+
+    from . import render
+    from .config import FS
+    try:
+        info = render.read_wav_info(args.input)
+        if abs(info.sample_rate - FS) > 0.01 * FS:
+            print(f"WARNING: {args.input} is {info.sample_rate} Hz, the filters were designed for {FS} Hz", file=sys.stderr)
+        frames, seconds, elapsed = render.render(values, args.input, args.output, block_frames=args.block)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    print(f"Rendered {seconds:.1f} s of audio in {elapsed:.2f} s ({seconds / max(elapsed, 1e-9):.0f}x real time)")
+    return 0
+
+
+def cmd_presets(args):
+    from . import presets
+    lib = presets.library(args.db)
+    try:
+        if args.action == "import":
+            try:
+                added, skipped = lib.import_files(args.files)
+            except (OSError, ValueError) as e:
+                print(f"ERROR: {e}", file=sys.stderr)
+                return 1
+            print(f"Added {added} presets ({skipped} skipped), {lib.count()} in {lib.filename}")
+        elif args.action == "search":
+            start = time.perf_counter()
+            found = lib.search(" ".join(args.text), tags=args.tag or (), min_gain=args.min_gain, max_gain=args.max_gain,
+                               min_corner=args.min_corner, max_corner=args.max_corner, max_stages=args.max_stages, limit=args.limit)
+            for e in found:
+                print(f"{e.id:>6}  {e.label()}")
+            print(f"{len(found)} found in {1000 * (time.perf_counter() - start):.1f} ms", file=sys.stderr)
+        elif args.action == "export":
+            try:
+                params.write_params(args.output, lib.coefs(args.id).tolist())
+            except KeyError:
+                print(f"ERROR: no preset with id {args.id}", file=sys.stderr)
+                return 1
+    finally:
+        lib.close()
+    return 0
+
+
+def cmd_bank(args):
+    from . import bank
+    try:
+        if args.action == "pack":
+            count = bank.text_to_bank(args.files, args.output, dtype="float64" if args.float64 else "float32")
+            print(f"Packed {count} presets into {args.output}")
+        elif args.action == "unpack":
+            written = bank.bank_to_text(args.bank, args.directory)
+            print(f"Wrote {len(written)} parameter files to {args.directory}")
+        elif args.action == "list":
+            b = bank.bank(args.bank)
+            for i, name in enumerate(b.names):
+                print(f"{i:>5}  {name}  ({len(b[i])} biquads)")
+            b.close()
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+def cmd_optimize(args):
+    values = load_checked(args.file, None)
+    if values is None:
+        return 1
+
+    from . import cascadeopt
+    res = cascadeopt.optimize(values, reorder=not args.no_reorder, model=args.model, block_size=args.block)
+
+    # The firmware keeps the old values in stages that aren't uploaded, so fill them with pass-through stages
+    # The report then also compares the input and the output at that length, which is what the device runs
+    coefs = res.coefs
+    if not args.no_pad:
+        try:
+            coefs = res.padded(args.filters)
+        except ValueError as e:
+            print(f"ERROR: {e}; use --filters or --no-pad", file=sys.stderr)
+            return 1
+    print(cascadeopt.format_report(res, padded=None if args.no_pad else args.filters))
+    if args.out:
+        params.write_params(args.out, coefs.tolist())
+        print(f"Wrote {args.out}")
+    return 0
+
+def cmd_check(args):
+    from . import bank, devicemodel
+    names, presets = [], []
+    for filename in args.files:
+        try:
+            if filename.lower().endswith(".rsbk"):
+                b = bank.bank(filename)
+                names += [f"{filename}:{name}" for name in b.names]
+                presets += [b[i] for i in range(len(b))]
+                b.close()
+            else:
+                presets.append(params.load_params(filename))
+                names.append(filename)
+        except (OSError, ValueError) as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            return 1
+    if not presets:
+        print("ERROR: no presets to check", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    res = devicemodel.analyze(presets, structure=args.structure, level_db=args.level, signal_samples=args.samples, tail_samples=args.samples)
+    print(res.format_table(names))
+    failed = sum(1 for i in range(len(res)) if res.problems(i))
+    print(f"{len(res) - failed} of {len(res)} presets OK on a float32 {args.structure.upper()} device ({time.perf_counter() - start:.2f} s)")
+    return 1 if failed else 0
+
+# Function to collect the emulator options shared by emulate and loadtest
+def emulator_options(args):
+    return {"filters": args.filters, "answer_query": not args.legacy, "latency": args.latency, "bandwidth": args.bandwidth,
+            "drop": args.drop, "corrupt": args.corrupt, "reply_drop": args.reply_drop, "chatter": args.chatter, "seed": args.seed}
+
+def cmd_emulate(args):
+    from . import emulator
+    emu = emulator.emulator(**emulator_options(args))
+    emu.on_reply = lambda line: print(f"{time.strftime('%H:%M:%S')}  {line}")
+    try:
+        name = emu.open_pty()
+    except OSError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    print(f"Emulating a device with {args.filters} filters on {name} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emu.stop()
+    for i, row in enumerate(emu.device.active):
+        print(f"{i:<3d}" + ", ".join(f"{value:.11f}" for value in row))
+    return 0
+
+def cmd_loadtest(args):
+    from . import emulator
+    try:
+        res = emulator.load_test(uploads=args.uploads, reliable=args.reliable, changed=args.changed, use_pty=args.pty, baudrate=args.baud,
+                                 window_size=args.window, ack_timeout=args.ack_timeout, **emulator_options(args))
+    except OSError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+    print(res.summary())
+    return 0 if res.ok() else 1
+
+
+###############################################################################
+## MAIN FUNCTION
+###############################################################################
+
+
+# Function to add the serial port settings shared by the commands that upload
+def add_transport_arguments(p):
+    p.add_argument("--timeout", type=float, default=0.1, metavar="SECONDS", help="read timeout (default: %(default)s)")
+    p.add_argument("--write-timeout", type=float, default=None, metavar="SECONDS", help="fail a write that takes longer than this (default: wait)")
+    p.add_argument("--no-flush", action="store_true", help="don't wait for the data to be transmitted before reporting an upload done")
+
+# Function to add the device emulator settings shared by emulate and loadtest
+def add_emulator_arguments(p):
+    p.add_argument("--filters", type=int, default=num_filters, help="number of filters on the emulated device (default: %(default)s)")
+    p.add_argument("--legacy", action="store_true", help="don't answer the filter count query, like older firmware")
+    p.add_argument("--latency", type=float, default=0.0, metavar="SECONDS", help="one way delay of the link (default: %(default)s)")
+    p.add_argument("--bandwidth", type=float, default=None, metavar="BYTES/S", help="throughput of the link in each direction (default: unlimited)")
+    p.add_argument("--drop", type=float, default=0.0, metavar="P", help="probability of losing each byte sent to the device (default: %(default)s)")
+    p.add_argument("--corrupt", type=float, default=0.0, metavar="P", help="probability of a bit error in each byte sent to the device (default: %(default)s)")
+    p.add_argument("--reply-drop", type=float, default=0.0, metavar="P", help="probability of losing each line the device sends (default: %(default)s)")
+    p.add_argument("--chatter", type=float, default=0.0, metavar="LINES/S", help="level readings sent by the device per second (default: %(default)s)")
+    p.add_argument("--seed", type=int, default=0)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="roomshaker", description="Upload filter parameters to the Room Shaker embedded bass equalizer.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("ports", help="list available serial ports")
+    p.set_defaults(func=cmd_ports)
+
+    p = commands.add_parser("validate", help="check a parameter file")
+    p.add_argument("file")
+    p.add_argument("--filters", type=int, default=num_filters, help="number of filters on the device (default: %(default)s)")
+    p.set_defaults(func=cmd_validate)
+
+    p = commands.add_parser("upload", help="validate a parameter file and upload it to one device")
+    p.add_argument("file")
+    p.add_argument("--port", required=True, help="serial port name or pyserial URL")
+    p.add_argument("--filters", type=int, default=num_filters, help="number of filters on the device (default: %(default)s)")
+    p.add_argument("--baud", type=int, default=9600)
+    p.add_argument("--reliable", action="store_true", help="use the acknowledged upload protocol")
+    add_transport_arguments(p)
+    p.add_argument("--listen", type=float, default=0.2, metavar="SECONDS", help="time to wait for device output after the upload (default: %(default)s)")
+    p.set_defaults(func=cmd_upload)
+
+    p = commands.add_parser("provision", help="upload a parameter file to many devices at once")
+    p.add_argument("file")
+    p.add_argument("--ports", nargs="+", required=True, metavar="PORT", help="port names, pyserial URLs or globs such as /dev/ttyACM* or COM*")
+    p.add_argument("--workers", type=int, default=None, help="maximum number of devices in flight (default: all)")
+    p.add_argument("--filters", type=int, default=num_filters, help="number of filters on the device (default: %(default)s)")
+    p.add_argument("--baud", type=int, default=9600)
+    p.add_argument("--reliable", action="store_true", help="use the acknowledged upload protocol, which also verifies each device")
+    add_transport_arguments(p)
+    p.add_argument("--listen", type=float, default=0.0, metavar="SECONDS", help="time to wait for device output after each upload (default: %(default)s)")
+    p.set_defaults(func=cmd_provision)
+
+    p = commands.add_parser("autoeq", help="fit parametric filters to a measured room response")
+    p.add_argument("measurement", help="measured response, frequency and level (dB) per line")
+    p.add_argument("--target", help="target curve in the same format (default: flat)")
+    p.add_argument("--smooth", type=float, default=None, metavar="N", help="smooth the measurement to 1/N octave before fitting")
+    p.add_argument("--out", help="parameter file to write the fitted filters to")
+    p.add_argument("--filters", type=int, default=num_filters, help="number of filters to fit (default: %(default)s)")
+    p.add_argument("--fmin", type=float, default=15, help="lowest frequency to correct (default: %(default)s)")
+    p.add_argument("--fmax", type=float, default=250, help="highest frequency to correct (default: %(default)s)")
+    p.add_argument("--max-boost", type=float, default=6, help="maximum boost per filter in dB (default: %(default)s)")
+    p.add_argument("--max-cut", type=float, default=15, help="maximum cut per filter in dB (default: %(default)s)")
+    p.add_argument("--starts", type=int, default=8, help="number of starting points (default: %(default)s)")
+    p.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=cmd_autoeq)
+
+    p = commands.add_parser("render", help="run a WAV file through the filters of a parameter file")
+    p.add_argument("input")
+    p.add_argument("output")
+    p.add_argument("--params", required=True, help="parameter file with the filters to apply")
+    p.add_argument("--block", type=int, default=65536, help="frames per block (default: %(default)s)")
+    p.set_defaults(func=cmd_render)
+
+    p = commands.add_parser("presets", help="import, search and export presets in the preset library")
+    p.add_argument("--db", help="library file (default: the per-user library)")
+    actions = p.add_subparsers(dest="action", required=True)
+    a = actions.add_parser("import", help="add parameter files, BEQ catalog JSON files or miniDSP biquad text")
+    a.add_argument("files", nargs="+")
+    a = actions.add_parser("search", help="list presets matching all of the given criteria")
+    a.add_argument("text", nargs="*", help="words to find in the title or tags")
+    a.add_argument("--tag", action="append", help="required tag, may be repeated")
+    a.add_argument("--min-gain", type=float, help="minimum shelf gain in dB")
+    a.add_argument("--max-gain", type=float, help="maximum shelf gain in dB")
+    a.add_argument("--min-corner", type=float, help="minimum corner frequency in Hz")
+    a.add_argument("--max-corner", type=float, help="maximum corner frequency in Hz")
+    a.add_argument("--max-stages", type=int, default=num_filters, help="maximum number of biquads (default: %(default)s)")
+    a.add_argument("--limit", type=int, default=50)
+    a = actions.add_parser("export", help="write a preset to a parameter file")
+    a.add_argument("id", type=int)
+    a.add_argument("output")
+    p.set_defaults(func=cmd_presets)
+
+    p = commands.add_parser("bank", help="pack parameter files into a binary preset bank, or unpack one")
+    actions = p.add_subparsers(dest="action", required=True)
+    a = actions.add_parser("pack", help="write one preset per parameter file into a bank")
+    a.add_argument("output")
+    a.add_argument("files", nargs="+")
+    a.add_argument("--float64", action="store_true", help="store float64 values (default: float32, as used by the device)")
+    a = actions.add_parser("unpack", help="write every preset of a bank to its own parameter file")
+    a.add_argument("bank")
+    a.add_argument("directory")
+    a = actions.add_parser("list", help="list the presets in a bank")
+    a.add_argument("bank")
+    p.set_defaults(func=cmd_bank)
+
+    p = commands.add_parser("optimize", help="remove, merge and reorder the filters of a parameter file without changing its response")
+    p.add_argument("file")
+    p.add_argument("--out", help="parameter file to write the optimized filters to")
+    p.add_argument("--filters", type=int, default=num_filters, help="pad the output to this many filters with pass-through stages (default: %(default)s)")
+    p.add_argument("--no-pad", action="store_true", help="write only the stages that are left, for firmware that runs a variable number of stages")
+    p.add_argument("--no-reorder", action="store_true", help="keep the order of the stages")
+    p.add_argument("--model", choices=("df1_f32", "df2t_f32"), default="df1_f32", help="CMSIS-DSP function the cost estimate is for (default: %(default)s)")
+    p.add_argument("--block", type=int, default=32, help="samples per block on the device, for the cost estimate (default: %(default)s)")
+    p.set_defaults(func=cmd_optimize)
+
+    p = commands.add_parser("check", help="simulate parameter files or banks on a float32 device and report presets that misbehave")
+    p.add_argument("files", nargs="+", help="parameter files and .rsbk banks")
+    p.add_argument("--structure", choices=("df1", "df2t"), default="df1", help="biquad structure of the firmware (default: %(default)s)")
+    p.add_argument("--level", type=float, default=-20, metavar="DBFS", help="level of the noise test signal (default: %(default)s)")
+    p.add_argument("--samples", type=int, default=8192, help="length of the test signal, and of the silence after it (default: %(default)s)")
+    p.set_defaults(func=cmd_check)
+
+    p = commands.add_parser("emulate", help="run a device emulator on a pseudo terminal, to use the GUI or CLI without hardware")
+    add_emulator_arguments(p)
+    p.set_defaults(func=cmd_emulate)
+
+    p = commands.add_parser("loadtest", help="upload many presets to a device emulator and check the device ends up with the last one")
+    p.add_argument("--uploads", type=int, default=100)
+    p.add_argument("--changed", type=int, default=1, help="filters changed between uploads, 0 for full uploads (default: %(default)s)")
+    p.add_argument("--reliable", action="store_true", help="use the acknowledged upload protocol")
+    p.add_argument("--window", type=int, default=4, help="frames in flight in reliable mode (default: %(default)s)")
+    p.add_argument("--ack-timeout", type=float, default=0.25, metavar="SECONDS", help="retransmission timeout in reliable mode (default: %(default)s)")
+    p.add_argument("--pty", action="store_true", help="go through a pseudo terminal and the serial driver instead of an rsemu:// URL")
+    p.add_argument("--baud", type=int, default=115200)
+    add_emulator_arguments(p)
+    p.set_defaults(func=cmd_loadtest)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
@@ -0,0 +1,457 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               comms.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        Serial protocol between the host and the ROOM SHAKER
+#                       embedded device.
+#   Application Notes:  
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+## DEPENDENCIES
+###############################################################################
+
+import binascii
+import codecs
+import collections
+import functools
+import queue
+import struct
+import threading
+import time
+
+import serial
+import serial.tools.list_ports
+
+from .config import num_filters
+from .instrument import probes
+
+# rsemu:// URLs open the device emulator (see protocol_rsemu.py) wherever a port name is accepted
+if "rscore" not in serial.protocol_handler_packages:
+    serial.protocol_handler_packages.append("rscore")
+
+
+###############################################################################
+## SERIAL PORT
+###############################################################################
+
+
+# Raised when the device doesn't confirm an upload
+class upload_error(Exception):
+    pass
+
+
+# Precompiled packet layouts; '=' keeps the native float format of struct.pack('f') but without alignment padding
+MORE = 0xAA
+COMMIT = 0xBB
+FRAME_START = 0x7E
+QUERY_FILTERS = 0xC1                # Answered with "FILTERS <n>" by firmware that knows its filter count
+AUTOEQ = 0xDE
+FRAME_HEADER = struct.Struct('>BBB')
+FRAME_CRC = struct.Struct('>H')
+
+@functools.lru_cache(maxsize=None)
+def packet_layout(num_values):
+    return struct.Struct(f'=BB{num_values}fB')
+
+
+# Class to record one upload, for throughput telemetry
+class transfer:
+
+    def __init__(self, port, filters, packets, num_bytes, write_time, total_time, retransmissions, reliable):
+        self.port = port
+        self.time = time.time()
+        self.filters = filters
+        self.packets = packets
+        self.bytes = num_bytes                      # Including retransmissions
+        self.write_time = write_time                # Time spent in ser.write()
+        self.total_time = total_time                # Until the upload was flushed (and acknowledged, in reliable mode)
+        self.retransmissions = retransmissions
+        self.reliable = reliable
+
+    # Effective throughput in bytes per second
+    def throughput(self):
+        return self.bytes / self.total_time if self.total_time > 0 else float('inf')
+
+    def summary(self):
+        text = f"{self.bytes} bytes in {1000*self.total_time:.1f} ms (write {1000*self.write_time:.1f} ms, {self.throughput()/1000:.1f} kB/s)"
+        if self.reliable:
+            text += f", {self.retransmissions} retransmissions"
+        return text
+
+
+# Class to interact with the serial port
+class sport:
+
+    ser = None
+
+    def __init__(self, baudrate=9600, timeout=0.1, max_lines=1000, reliable=False, window_size=4, ack_timeout=0.25, max_retries=5, write_timeout=None, flush=True, history=100):
+        self.baudrate = baudrate
+        self.timeout = timeout                          # Reads block for at most this long, so the reader can notice a shutdown
+        self.write_timeout = write_timeout              # None blocks until the OS accepts the data; otherwise writes raise serial.SerialTimeoutException
+        self.flush = flush                              # Wait for the OS to transmit each upload before reporting it done
+        self.portname = None
+        self.lines = queue.Queue(maxsize=max_lines)     # Complete lines received from the device, drained by the GUI
+        self.dropped_lines = 0
+        self.reader = None
+        self.stop_event = threading.Event()
+
+        # Reliable upload protocol; requires firmware that acknowledges frames
+        self.reliable = reliable
+        self.window_size = window_size                  # Frames in flight before waiting for an acknowledgement
+        self.ack_timeout = ack_timeout                  # Seconds before an unacknowledged frame is sent again
+        self.max_retries = max_retries
+        self.acks = queue.Queue()
+        self.seq = 0
+
+        # Coefficients last committed to the device on each port, as packed float32 rows
+        # Reliable uploads are acknowledged; legacy ones are assumed to have arrived, so a lost legacy packet leaves the
+        # device behind until a full upload (force_full, "Force Full Sync" in the GUI) or the port is opened again
+        self.shadow = {}
+
+        # Telemetry: the most recent uploads, and counters for the one in progress
+        self.transfers = collections.deque(maxlen=history)
+        self.bytes_sent = 0
+        self.write_time = 0.0
+
+        # Live measurement data (levels, spectra) reported by the device; a telemetry.channel, or None to show it as text
+        self.live = None
+
+        # Number of filters reported by the device, None until it answers QUERY_FILTERS
+        self.filter_count = None
+        self.filter_count_reported = threading.Event()
+
+    # Function to enumerate available COM ports
+    def list_ports(self):
+        ports = serial.tools.list_ports.comports()
+        vals = []
+        for port, desc, hwid in sorted(ports):
+            # print(f"{port}: {desc} [{hwid}]")
+            vals.append(port)
+        return vals
+
+    # Function to open a specific COM port (or any pyserial URL, e.g. loop://) and start the reader thread
+    def bind(self, portname):
+        self.close()
+        self.ser = self.open_port(portname)
+        self.portname = portname
+        self.shadow.pop(portname, None)             # The device may have been reset while the port was closed
+        self.filter_count = None
+        self.filter_count_reported.clear()
+        self.start_reader()
+
+    def open_port(self, portname):
+        return serial.serial_for_url(portname, self.baudrate, timeout=self.timeout, write_timeout=self.write_timeout)
+
+    # Function to change the baud rate, also on the open port
+    def set_baudrate(self, baudrate):
+        self.baudrate = baudrate
+        if self.ser is not None:
+            self.ser.baudrate = baudrate
+
+    # Function to write to the port, counting bytes and time for the telemetry
+    def write(self, data):
+        start = time.perf_counter()
+        self.ser.write(data)
+        self.write_time += time.perf_counter() - start
+        self.bytes_sent += len(data)
+
+    # Function to summarize the recorded uploads
+    def telemetry(self):
+        if not self.transfers:
+            return {"uploads": 0}
+        total_bytes = sum(t.bytes for t in self.transfers)
+        total_time = sum(t.total_time for t in self.transfers)
+        return {"uploads": len(self.transfers),
+                "bytes": total_bytes,
+                "mean_write_ms": 1000 * sum(t.write_time for t in self.transfers) / len(self.transfers),
+                "mean_total_ms": 1000 * total_time / len(self.transfers),
+                "throughput_bytes_per_s": total_bytes / total_time if total_time > 0 else float('inf'),
+                "retransmissions": sum(t.retransmissions for t in self.transfers)}
+
+    # Function to close the port and stop the reader thread
+    def close(self):
+        self.stop_event.set()
+        if self.reader is not None:
+            self.reader.join(timeout=2*self.timeout + 1)
+            self.reader = None
+        if self.ser is not None:
+            try:
+                self.ser.close()
+            except Exception:
+                pass
+            self.ser = None
+        self.stop_event.clear()
+
+    def start_reader(self):
+        self.reader = threading.Thread(target=self.read_loop, name="sport reader", daemon=True)
+        self.reader.start()
+
+    # Reader thread: blocking reads with a timeout, decoded incrementally into complete lines
+    def read_loop(self):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        partial = ""
+        while not self.stop_event.is_set():
+            try:
+                data = self.ser.read(max(1, self.ser.in_waiting))
+            except Exception as e:
+                self.push_line(f"Lost connection to {self.portname}: {e}")
+                decoder.reset()
+                partial = ""
+                self.reconnect()
+                continue
+
+            if data:
+                with probes.span("serial.read"):
+                    partial += decoder.decode(data)
+                    *complete, partial = partial.split("\n")
+                    for line in complete:
+                        self.route_line(line.rstrip("\r"))
+            elif partial:
+                # Nothing arrived for a whole timeout, so the device isn't going to finish this line
+                self.push_line(partial.rstrip("\r"))
+                partial = ""
+
+    # Function to separate acknowledgements and live measurement data from device chatter
+    def route_line(self, line):
+        words = line.split()
+        if len(words) == 2 and words[0] in ("ACK", "NAK") and words[1].isdigit():
+            self.acks.put((words[0], int(words[1])))
+        elif len(words) == 2 and words[0] == "FILTERS" and words[1].isdigit():
+            self.filter_count = int(words[1])
+            self.filter_count_reported.set()
+        elif self.live is not None and self.live.parse(line):
+            pass
+        else:
+            self.push_line(line)
+
+    # Function to hand a line to the GUI; when the GUI falls behind, the oldest lines are dropped rather than blocking the reader
+    def push_line(self, line):
+        while True:
+            try:
+                self.lines.put_nowait(line)
+                return
+            except queue.Full:
+                try:
+                    self.lines.get_nowait()
+                    self.dropped_lines += 1
+                except queue.Empty:
+                    pass
+
+    # Function to re-open the port after it disappeared (e.g. the device was unplugged or reset)
+    def reconnect(self):
+        try:
+            self.ser.close()
+        except Exception:
+            pass
+        while not self.stop_event.wait(1.0):
+            try:
+                self.ser = self.open_port(self.portname)
+            except Exception:
+                continue
+            self.shadow.pop(self.portname, None)     # The device may have been reset, so the next upload must be a full one
+            self.push_line(f"Reconnected to {self.portname}")
+            return
+
+    # Function to take up to max_lines received lines without blocking
+    def read_lines(self, max_lines=200):
+        lines = []
+        try:
+            while len(lines) < max_lines:
+                lines.append(self.lines.get_nowait())
+        except queue.Empty:
+            pass
+        return lines
+
+    # Function to upload filter parameters over COM port
+    # Only the filters that differ from the last upload on this port are sent, unless force_full is set
+    def upload_filters(self, values, reliable=None, force_full=False):
+
+        # Split data into one USB packet per filter
+        # The maximum FS USB packet size is 64 bytes. By pre-emptively
+        # splitting the data into two packets, we can control
+        # when/where the data is split and insert our own
+        # headers.
+
+        # BYTE 0: NUMBER OF FILTERS PARAMETERS IN THIS PACKET
+        # BYTE 1: STARTING FILTER INDEX
+        # BYTES 2 to n: FILTER PARAMETERS
+        # LAST BYTE: 0xAA (MORE TO COME) OR 0xBB (COMMIT)
+
+        if reliable is None:
+            reliable = self.reliable
+
+        # Compare what the device will actually receive (float32), not the float64 values in the GUI
+        packed = [struct.pack(f'{len(row)}f', *row) for row in values]
+        shadow = self.shadow.get(self.portname)
+        if force_full or shadow is None or len(shadow) != len(packed):
+            changed = list(range(len(packed)))
+        else:
+            changed = [i for i in range(len(packed)) if packed[i] != shadow[i]]
+
+        if not changed:
+            self.push_line("Filters already up to date, nothing to upload")
+            return 0.0
+
+        # One USB packet per changed filter, all packed into a single buffer; the last one commits
+        buffer, packets = self.encode_upload(values, changed)
+
+        # Whatever happens below, the device state is unknown until this upload is confirmed
+        self.shadow.pop(self.portname, None)
+
+        self.bytes_sent = 0
+        self.write_time = 0.0
+        start = time.perf_counter()
+        if reliable:
+            retransmissions = self.send_reliable(packets)
+        else:
+            self.write(buffer)
+            retransmissions = 0
+        if self.flush:
+            self.ser.flush()
+        elapsed = time.perf_counter() - start
+        self.shadow[self.portname] = packed
+
+        record = transfer(self.portname, len(changed), len(packets), self.bytes_sent, self.write_time, elapsed, retransmissions, reliable)
+        self.transfers.append(record)
+        self.push_line(f"Uploaded {len(changed)} of {len(values)} filters: {record.summary()}")
+        return elapsed
+
+    def encode_packet(self, values, filter_index, last=False):
+        return packet_layout(len(values)).pack(len(values), filter_index, *values, COMMIT if last else MORE)
+
+    # Function to encode the packets of an upload into one buffer; returns the buffer and a view of each packet in it
+    def encode_upload(self, values, indices):
+        layouts = [packet_layout(len(values[i])) for i in indices]
+        buffer = bytearray(sum(layout.size for layout in layouts))
+        view = memoryview(buffer)
+        packets = []
+        offset = 0
+        for i, layout in zip(indices, layouts):
+            layout.pack_into(buffer, offset, len(values[i]), i, *values[i], COMMIT if i == indices[-1] else MORE)
+            packets.append(view[offset:offset + layout.size])
+            offset += layout.size
+        return buffer, packets
+
+    def send_packet(self, values, filter_index, last=False):
+        self.write(self.encode_packet(values, filter_index, last))
+
+    # Function to wrap a packet in a reliable-mode frame
+    # BYTE 0: 0x7E (FRAME START)
+    # BYTE 1: SEQUENCE NUMBER
+    # BYTE 2: PACKET LENGTH
+    # BYTES 3 to n: PACKET (AS SENT BY send_packet)
+    # LAST 2 BYTES: CRC-16/CCITT OF BYTES 1 to n, BIG ENDIAN
+    # The device answers every frame with an "ACK <seq>" or "NAK <seq>" line
+    def encode_frame(self, packet, seq):
+        header = FRAME_HEADER.pack(FRAME_START, seq, len(packet))
+        crc = binascii.crc_hqx(packet, binascii.crc_hqx(header[1:], 0xFFFF))     # The CRC is computed incrementally, without joining the body first
+        return b''.join((header, packet, FRAME_CRC.pack(crc)))
+
+    # Function to send packets as acknowledged frames, keeping up to window_size of them in flight
+    # All data frames must be acknowledged before the commit (0xBB) frame is sent, so the device never commits a partial set
+    def send_reliable(self, packets):
+        if self.reader is None:
+            raise upload_error("Reliable uploads need the reader thread to receive acknowledgements")
+
+        # Forget acknowledgements left over from a previous upload
+        while True:
+            try:
+                self.acks.get_nowait()
+            except queue.Empty:
+                break
+
+        frames = []
+        for packet in packets:
+            frames.append((self.seq, self.encode_frame(packet, self.seq)))
+            self.seq = (self.seq + 1) % 256
+
+        retransmissions = self.send_window(frames[:-1])
+        retransmissions += self.send_window(frames[-1:])
+        return retransmissions
+
+    def send_window(self, frames):
+        retransmissions = 0
+        in_flight = {}      # seq -> [frame, time sent, retries]
+        next_frame = 0
+        while next_frame < len(frames) or in_flight:
+
+            # Fill the window, in one write
+            batch = []
+            while next_frame < len(frames) and len(in_flight) < self.window_size:
+                seq, frame = frames[next_frame]
+                batch.append(frame)
+                in_flight[seq] = [frame, 0.0, 0]
+                next_frame += 1
+            if batch:
+                self.write(b''.join(batch))
+                now = time.perf_counter()
+                for frame_seq, frame in frames[next_frame - len(batch):next_frame]:
+                    in_flight[frame_seq][1] = now
+
+            # Wait for an acknowledgement, at most until the oldest frame times out
+            deadline = min(entry[1] for entry in in_flight.values()) + self.ack_timeout
+            try:
+                kind, seq = self.acks.get(timeout=max(0.0, deadline - time.perf_counter()))
+            except queue.Empty:
+                kind, seq = None, None
+
+            if seq in in_flight:
+                if kind == "ACK":
+                    del in_flight[seq]
+                else:
+                    in_flight[seq][1] = 0.0     # NAK: retransmit this frame right away
+
+            # Selectively retransmit whatever was refused or timed out
+            now = time.perf_counter()
+            batch = []
+            for seq, entry in in_flight.items():
+                if now - entry[1] >= self.ack_timeout:
+                    entry[2] += 1
+                    if entry[2] > self.max_retries:
+                        raise upload_error(f"Frame {seq} was not acknowledged after {self.max_retries} retries")
+                    batch.append(entry[0])
+                    entry[1] = now
+                    retransmissions += 1
+            if batch:
+                self.write(b''.join(batch))
+
+        return retransmissions
+
+    # Function to ask the device how many filters it has; the answer arrives on the reader thread and sets filter_count
+    # The opcode is sent unframed, so only use this with firmware known to answer it: older firmware may read 0xC1 as the
+    # count byte of a packet and swallow the next upload
+    def request_filter_count(self):
+        self.filter_count = None
+        self.filter_count_reported.clear()
+        self.write(bytes([QUERY_FILTERS]))
+
+    # Function to ask the device how many filters it has and wait for the answer
+    # Firmware that doesn't answer within the timeout is assumed to have the default number of filters
+    def query_filter_count(self, timeout=0.5, default=num_filters):
+        self.request_filter_count()
+        if self.filter_count_reported.wait(timeout):
+            return self.filter_count
+        return default
+
+    def enable_autoeq(self):
+        
+        # Send 0xDE to indicate auto EQ mode is enabled
+        self.write(bytes([AUTOEQ]))
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
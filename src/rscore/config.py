@@ -0,0 +1,34 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               config.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        Firmware configuration shared by the GUI, the CLI and
+#                       the core library.
+#   Application Notes:
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+## Make sure these match the firmware config of the RoomShaker embedded device
+###############################################################################
+
+
+num_filters=6
+num_parameters=5
+FS=48076
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
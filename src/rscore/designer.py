@@ -0,0 +1,189 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               designer.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        Vectorized biquad designer covering the Audio EQ
+#                       Cookbook filter set plus the Linkwitz transform.
+#   Application Notes:  Every argument may be a scalar or an array; they are
+#                       broadcast together and one (N x 5) array of CMSIS-DSP
+#                       coefficients [b0, b1, b2, a1, a2] is returned.
+#                       https://webaudio.github.io/Audio-EQ-Cookbook/audio-eq-cookbook.html
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+## DEPENDENCIES
+###############################################################################
+
+import math
+
+import numpy as np
+
+from .config import FS
+
+
+###############################################################################
+## FILTER DESIGN
+###############################################################################
+
+
+FILTER_TYPES = ("peaking", "lowshelf", "highshelf", "lowpass", "highpass", "bandpass", "notch", "allpass", "linkwitz")
+
+# Function to design biquads of one or more types
+#   kind:       one of FILTER_TYPES, or an array of them (one per filter)
+#   f0:         center/corner frequency in Hz
+#   q:          quality factor
+#   gain_db:    gain in dB (peaking and shelves only)
+#   slope:      shelf slope S; when given it replaces q for the shelves, as in create_low_shelf()
+#   fp, qp:     target pole frequency and Q (linkwitz only); f0 and q are the existing ones being replaced
+def design(kind, f0, q=0.7071067811865476, gain_db=0.0, fs=FS, slope=None, fp=None, qp=None):
+
+    # Several types in one call: design each type on its own rows
+    if not isinstance(kind, str):
+        kind = np.asarray(kind)
+        args = np.broadcast_arrays(kind, f0, q, gain_db, np.nan if slope is None else slope, np.nan if fp is None else fp, np.nan if qp is None else qp)
+        kinds, f0, q, gain_db, slope, fp, qp = [np.atleast_1d(arg) for arg in args]
+        coefs = np.empty((len(kinds), 5))
+        for name in np.unique(kinds):
+            rows = kinds == name
+            coefs[rows] = design(str(name), f0[rows], q[rows], gain_db[rows], fs,
+                                 None if np.all(np.isnan(slope[rows])) else slope[rows],
+                                 None if np.all(np.isnan(fp[rows])) else fp[rows],
+                                 None if np.all(np.isnan(qp[rows])) else qp[rows])
+        return coefs
+
+    if kind not in FILTER_TYPES:
+        raise ValueError(f"unknown filter type '{kind}', expected one of {', '.join(FILTER_TYPES)}")
+
+    f0, q, gain_db = [np.atleast_1d(np.asarray(arg, dtype=float)) for arg in np.broadcast_arrays(f0, q, gain_db)]
+    if np.any(f0 <= 0) or np.any(f0 >= fs/2):
+        raise ValueError(f"frequencies must be between 0 and {fs/2} Hz")
+    if np.any(q <= 0):
+        raise ValueError("Q must be positive")
+
+    # Intermediate variables
+    A = 10**(gain_db/40)
+    w0 = 2*np.pi*f0/fs
+    cosw0 = np.cos(w0)
+    sinw0 = np.sin(w0)
+    if slope is not None and kind in ("lowshelf", "highshelf"):
+        alpha = (sinw0/2)*np.sqrt((A + 1/A)*(1/np.asarray(slope, dtype=float) - 1) + 2)
+    else:
+        alpha = sinw0/(2*q)
+    sqrtA = np.sqrt(A)
+    ones = np.ones_like(w0)
+
+    # Textbook coefficients, i.e. a0*y[n] = b0*x[n] + b1*x[n-1] + b2*x[n-2] - a1*y[n-1] - a2*y[n-2]
+    if kind == "peaking":
+        b0, b1, b2 = 1 + alpha*A, -2*cosw0, 1 - alpha*A
+        a0, a1, a2 = 1 + alpha/A, -2*cosw0, 1 - alpha/A
+    elif kind == "lowshelf":
+        b0 = A*((A+1) - (A-1)*cosw0 + 2*sqrtA*alpha)
+        b1 = 2*A*((A-1) - (A+1)*cosw0)
+        b2 = A*((A+1) - (A-1)*cosw0 - 2*sqrtA*alpha)
+        a0 = (A+1) + (A-1)*cosw0 + 2*sqrtA*alpha
+        a1 = -2*((A-1) + (A+1)*cosw0)
+        a2 = (A+1) + (A-1)*cosw0 - 2*sqrtA*alpha
+    elif kind == "highshelf":
+        b0 = A*((A+1) + (A-1)*cosw0 + 2*sqrtA*alpha)
+        b1 = -2*A*((A-1) + (A+1)*cosw0)
+        b2 = A*((A+1) + (A-1)*cosw0 - 2*sqrtA*alpha)
+        a0 = (A+1) - (A-1)*cosw0 + 2*sqrtA*alpha
+        a1 = 2*((A-1) - (A+1)*cosw0)
+        a2 = (A+1) - (A-1)*cosw0 - 2*sqrtA*alpha
+    elif kind == "lowpass":
+        b0, b1, b2 = (1 - cosw0)/2, 1 - cosw0, (1 - cosw0)/2
+        a0, a1, a2 = 1 + alpha, -2*cosw0, 1 - alpha
+    elif kind == "highpass":
+        b0, b1, b2 = (1 + cosw0)/2, -(1 + cosw0), (1 + cosw0)/2
+        a0, a1, a2 = 1 + alpha, -2*cosw0, 1 - alpha
+    elif kind == "bandpass":
+        b0, b1, b2 = alpha, 0*ones, -alpha                 # Constant 0 dB peak gain
+        a0, a1, a2 = 1 + alpha, -2*cosw0, 1 - alpha
+    elif kind == "notch":
+        b0, b1, b2 = ones, -2*cosw0, ones
+        a0, a1, a2 = 1 + alpha, -2*cosw0, 1 - alpha
+    elif kind == "allpass":
+        b0, b1, b2 = 1 - alpha, -2*cosw0, 1 + alpha
+        a0, a1, a2 = 1 + alpha, -2*cosw0, 1 - alpha
+    else:
+        # Linkwitz transform: replaces the poles at (f0, q) with poles at (fp, qp), bilinear transform pre-warped at their midpoint
+        if fp is None or qp is None:
+            raise ValueError("the linkwitz transform needs fp and qp")
+        fp, qp = [np.asarray(arg, dtype=float) for arg in np.broadcast_arrays(fp, qp, f0)[:2]]
+        if np.any(fp <= 0) or np.any(qp <= 0):
+            raise ValueError("fp and qp must be positive")
+        fc = (f0 + fp)/2
+        gn = 2*np.pi*fc/np.tan(np.pi*fc/fs)
+        d0 = (2*np.pi*f0)**2
+        d1 = 2*np.pi*f0/q
+        c0 = (2*np.pi*fp)**2
+        c1 = 2*np.pi*fp/qp
+        b0, b1, b2 = d0 + gn*d1 + gn**2, 2*(d0 - gn**2), d0 - gn*d1 + gn**2
+        a0, a1, a2 = c0 + gn*c1 + gn**2, 2*(c0 - gn**2), c0 - gn*c1 + gn**2
+
+    # Normalize and negate the a coefficients to comply with CMSIS-DSP
+    return np.column_stack((b0/a0, b1/a0, b2/a0, -a1/a0, -a2/a0))
+
+# Function to recover (kind, f0, q, gain_db) from the CMSIS-DSP coefficients of a peaking filter or shelf
+# Returns None for any other biquad, including the identity
+def estimate(coefs, fs=FS, tol=1e-6):
+    b0, b1, b2, a1, a2 = [float(c) for c in coefs]
+    a1, a2 = -a1, -a2                                       # Back to textbook signs
+
+    # Peaking: b1 == a1, and the remaining coefficients can be solved for directly
+    if abs(b1 - a1) <= tol * max(1.0, abs(a1)) and a2 > -1:
+        a0 = 2 / (1 + a2)
+        cosw0 = -a1 * a0 / 2
+        alpha_A = b0 * a0 - 1
+        alpha_over_A = a0 - 1
+        if abs(cosw0) < 1 and alpha_A > 0 and alpha_over_A > 0 and abs(alpha_A - alpha_over_A) > tol:     # Equal means 0 dB, i.e. the identity
+            w0 = math.acos(cosw0)
+            alpha = math.sqrt(alpha_A * alpha_over_A)
+            return "peaking", w0 * fs / (2 * math.pi), math.sin(w0) / (2 * alpha), 20 * math.log10(alpha_A / alpha_over_A)
+
+    # Shelves: unity gain at one end of the band, the shelf gain at the other
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dc_db = 20 * np.log10(abs((b0 + b1 + b2) / (1 + a1 + a2)))
+        nyquist_db = 20 * np.log10(abs((b0 - b1 + b2) / (1 - a1 + a2)))
+    if not (np.isfinite(dc_db) and np.isfinite(nyquist_db)):
+        return None
+    if abs(nyquist_db) < 0.01 and 0.01 <= abs(dc_db) <= 40:
+        kind, gain_db = "lowshelf", float(dc_db)
+    elif abs(dc_db) < 0.01 and 0.01 <= abs(nyquist_db) <= 40:       # Low pass filters are "shelves" down to -inf dB
+        kind, gain_db = "highshelf", float(nyquist_db)
+    else:
+        return None
+
+    # F0 and Q by least squares on the magnitude, starting from where the response crosses half the shelf gain
+    from scipy.optimize import least_squares
+    freqs = np.geomspace(fs / 1e5, 0.45 * fs, 256)
+    z = np.exp(-2j * np.pi * freqs / fs)
+    target = 20 * np.log10(np.abs((b0 + b1 * z + b2 * z * z) / (1 + a1 * z + a2 * z * z)))
+    k = int(np.argmin(np.abs(target - gain_db / 2)))
+
+    def residual(x):
+        c = design(kind, math.exp(x[0]), q=math.exp(x[1]), gain_db=gain_db, fs=fs)[0]
+        return 20 * np.log10(np.abs((c[0] + c[1] * z + c[2] * z * z) / (1 - c[3] * z - c[4] * z * z))) - target
+
+    upper = math.log(0.45 * fs)
+    result = least_squares(residual, [min(math.log(freqs[k]), upper - 1e-3), math.log(0.7071)], bounds=([math.log(freqs[0]), math.log(0.05)], [upper, math.log(20)]))
+    if np.sqrt(np.mean(result.fun ** 2)) > 0.01:
+        return None
+    return kind, math.exp(result.x[0]), math.exp(result.x[1]), gain_db
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
@@ -0,0 +1,243 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               devicemodel.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        Model of what the device does with a preset: the
+#                       coefficients rounded to float32 as send_packet() packs
+#                       them, and the cascade run in single precision in the
+#                       same operation order as CMSIS-DSP's DF1 and DF2T
+#                       float32 biquads. Checks many presets at once.
+#   Application Notes:  simulate() is bit-accurate as long as the firmware is
+#                       built without fused multiply-adds (-ffp-contract=off,
+#                       the default for CMSIS-DSP's C code) and without
+#                       flush-to-zero. It works on every preset and every
+#                       stage at once: at step t, stage s processes sample
+#                       t - s, so its input is what stage s - 1 produced at
+#                       step t - 1 and one Python iteration per sample covers
+#                       the whole batch.
+#
+#                       analyze() reports, per preset: the largest difference
+#                       between the ideal response and the response of the
+#                       float32 coefficients, the rounding noise of single
+#                       precision arithmetic (float32 run minus float64 run
+#                       on the same coefficients), whether the output keeps
+#                       going after the input stops (limit cycle), and how
+#                       close the poles are to the unit circle.
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+## DEPENDENCIES
+###############################################################################
+
+import numpy as np
+
+from .config import FS
+from .dsp import stack_cascades, batch_magnitude
+
+
+###############################################################################
+## SIMULATION
+###############################################################################
+
+
+STRUCTURES = ("df1", "df2t")
+
+# Function to get the coefficients the device receives; struct.pack('f') rounds to nearest, as astype() does
+def device_coefs(coefs):
+    return np.asarray(coefs, dtype=float).astype(np.float32)
+
+# Function to run signals through biquad cascades, sample by sample, in the firmware's operation order
+#   coefs:      (presets x stages x 5) or (stages x 5) CMSIS-DSP coefficients, used as they are in the given dtype
+#   x:          (samples,) input shared by every preset, or (presets x samples)
+#   dtype:      np.float32 for the device, np.float64 for a reference
+# Returns (presets x samples), or (samples,) for a single cascade
+def simulate(coefs, x, structure="df1", dtype=np.float32):
+    if structure not in STRUCTURES:
+        raise ValueError(f"unknown structure '{structure}', expected one of {', '.join(STRUCTURES)}")
+    coefs = np.asarray(coefs, dtype=dtype)
+    single = coefs.ndim == 2
+    coefs = coefs.reshape((-1,) + coefs.shape[-2:])
+    num_presets, num_stages = coefs.shape[:2]
+    x = np.asarray(x, dtype=dtype)
+    num_samples = x.shape[-1]
+    if num_stages == 0:
+        y = np.array(np.broadcast_to(x, (num_presets, num_samples)))
+        return y[0] if single else y
+
+    # Samples run along the first axis so every step reads and writes one contiguous row
+    padded = np.zeros((num_samples + num_stages - 1, num_presets), dtype=dtype)
+    padded[:num_samples] = np.broadcast_to(x, (num_presets, num_samples)).T
+    y = np.empty((num_samples, num_presets), dtype=dtype)
+    b0, b1, b2, a1, a2 = [np.ascontiguousarray(coefs[..., k]) for k in range(5)]
+    inp, acc, tmp, out = [np.zeros((num_presets, num_stages), dtype=dtype) for _ in range(4)]
+
+    if structure == "df1":
+        # acc = b0*x[n] + b1*x[n-1] + b2*x[n-2] + a1*y[n-1] + a2*y[n-2], left to right
+        x1, x2, y2 = [np.zeros((num_presets, num_stages), dtype=dtype) for _ in range(3)]
+        for t in range(len(padded)):
+            inp[:, 0] = padded[t]
+            inp[:, 1:] = out[:, :-1]
+            np.multiply(b0, inp, out=acc)
+            np.multiply(b1, x1, out=tmp)
+            acc += tmp
+            np.multiply(b2, x2, out=tmp)
+            acc += tmp
+            np.multiply(a1, out, out=tmp)
+            acc += tmp
+            np.multiply(a2, y2, out=tmp)
+            acc += tmp
+            x2, x1, inp = x1, inp, x2
+            y2, out, acc = out, acc, y2
+            if t >= num_stages - 1:
+                y[t - num_stages + 1] = out[:, -1]
+    else:
+        # acc = b0*x[n] + d1; d1 = b1*x[n] + d2 + a1*acc; d2 = b2*x[n] + a2*acc
+        d1, d2 = [np.zeros((num_presets, num_stages), dtype=dtype) for _ in range(2)]
+        for t in range(len(padded)):
+            inp[:, 0] = padded[t]
+            inp[:, 1:] = out[:, :-1]
+            np.multiply(b0, inp, out=acc)
+            acc += d1
+            np.multiply(b1, inp, out=d1)
+            d1 += d2
+            np.multiply(a1, acc, out=tmp)
+            d1 += tmp
+            np.multiply(b2, inp, out=d2)
+            np.multiply(a2, acc, out=tmp)
+            d2 += tmp
+            out, acc = acc, out
+            if t >= num_stages - 1:
+                y[t - num_stages + 1] = out[:, -1]
+
+    y = np.ascontiguousarray(y.T)
+    return y[0] if single else y
+
+# Function to get the largest pole radius of every stage; coefs is (... x 5)
+def pole_radius(coefs):
+    a1, a2 = np.asarray(coefs[..., 3], dtype=float), np.asarray(coefs[..., 4], dtype=float)
+    disc = a1 * a1 + 4 * a2                         # Roots of z^2 - a1*z - a2
+    real = np.maximum(np.abs(a1 + np.sqrt(np.maximum(disc, 0))), np.abs(a1 - np.sqrt(np.maximum(disc, 0)))) / 2
+    return np.where(disc < 0, np.sqrt(np.maximum(-a2, 0)), real)
+
+
+###############################################################################
+## ANALYSIS
+###############################################################################
+
+
+MAX_DEVIATION_DB = 0.1          # Coefficient rounding that changes the response by more than this is reported
+MIN_POLE_MARGIN = 1e-4          # Poles closer to the unit circle than this are reported
+MAX_NOISE_DBFS = -100.0         # Arithmetic noise above this is reported
+MAX_LIMIT_CYCLE_DBFS = -144.0   # Limit cycles below the 24 bit floor (e.g. among denormals) are counted but not reported
+MIN_LEVEL_DB = -60.0            # The response deviation is only measured where the ideal response is above this
+
+# Class to hold the device model's findings for a batch of presets; every attribute has one entry per preset
+class report:
+
+    def __init__(self, structure, deviation_db, deviation_freq, noise_dbfs, tail_dbfs, limit_cycle, overflow, pole_radius, radius_shift):
+        self.structure = structure
+        self.deviation_db = deviation_db        # Largest |device - ideal| magnitude difference from coefficient rounding
+        self.deviation_freq = deviation_freq    # Where it happens (Hz)
+        self.noise_dbfs = noise_dbfs            # Power of float32 output minus float64 output, relative to a full scale sine
+        self.tail_dbfs = tail_dbfs              # Peak output at the end of the silence after the test signal
+        self.limit_cycle = limit_cycle          # Output not decaying in the silence, although the float64 run does
+        self.overflow = overflow                # The float32 run produced inf or nan
+        self.pole_radius = pole_radius          # Largest pole radius of the float32 coefficients
+        self.radius_shift = radius_shift        # Largest change of a stage's pole radius from rounding to float32
+
+    def __len__(self):
+        return len(self.deviation_db)
+
+    # Function to get the margin between the largest pole and the unit circle
+    def pole_margin(self):
+        return 1 - self.pole_radius
+
+    # Function to describe what is wrong with one preset; empty when it should behave on the device as designed
+    def problems(self, i):
+        found = []
+        if self.pole_radius[i] >= 1:
+            found.append(f"unstable on the device (pole radius {self.pole_radius[i]:.9f})")
+        elif 1 - self.pole_radius[i] < MIN_POLE_MARGIN:
+            found.append(f"pole within {1 - self.pole_radius[i]:.2g} of the unit circle")
+        if self.overflow[i]:
+            found.append("overflows in float32")
+        if self.overflow[i] or self.pole_radius[i] >= 1:
+            return found                # The arithmetic figures don't mean anything then
+        if self.deviation_db[i] > MAX_DEVIATION_DB:
+            found.append(f"float32 coefficients change the response by {self.deviation_db[i]:.2f} dB at {self.deviation_freq[i]:.1f} Hz")
+        if self.noise_dbfs[i] > MAX_NOISE_DBFS:
+            found.append(f"rounding noise at {self.noise_dbfs[i]:.1f} dBFS")
+        if self.limit_cycle[i] and self.tail_dbfs[i] > MAX_LIMIT_CYCLE_DBFS:
+            found.append(f"limit cycle at {self.tail_dbfs[i]:.1f} dBFS")
+        return found
+
+    # Function to format the findings as a table, one line per preset; the name column fits the longest name
+    def format_table(self, names):
+        width = max([len("PRESET")] + [len(name) for name in names])
+        lines = [f"{'PRESET':{width}s} {'DEV (dB)':>9s} {'AT (Hz)':>8s} {'NOISE':>7s} {'TAIL':>7s} {'MARGIN':>9s}  PROBLEMS"]
+        margins = self.pole_margin()
+        for i, name in enumerate(names):
+            lines.append(f"{name:{width}s} {self.deviation_db[i]:9.4f} {self.deviation_freq[i]:8.1f} {self.noise_dbfs[i]:7.1f} {self.tail_dbfs[i]:7.1f} {margins[i]:9.2e}  "
+                         + ("; ".join(self.problems(i)) or "OK"))
+        return "\n".join(lines)
+
+# Function to check how a batch of presets will behave on the device
+#   presets:        list of (stages x 5) coefficient arrays, or a (presets x stages x 5) array
+#   freqs:          grid for the response deviation (default: 1 Hz to just below Nyquist)
+#   level_db:       level of the white noise test signal, dB relative to a full scale sine
+#   signal_samples: length of the test signal; it is followed by tail_samples of silence
+def analyze(presets, fs=FS, structure="df1", freqs=None, level_db=-20.0, signal_samples=8192, tail_samples=8192, seed=0):
+    ideal = stack_cascades(presets) if not isinstance(presets, np.ndarray) or presets.ndim != 3 else np.asarray(presets, dtype=float)
+    device = device_coefs(ideal)
+    if freqs is None:
+        freqs = np.geomspace(1, 0.499 * fs, 2048)
+    freqs = np.asarray(freqs, dtype=float)
+
+    # Coefficient rounding, evaluated exactly (in float64) for the float32 values; where the response is far down (the stop
+    # band of a low pass) a dB difference means nothing, so only frequencies within MIN_LEVEL_DB count
+    ideal_db = batch_magnitude(ideal, fs, freqs)
+    difference = np.where(ideal_db > MIN_LEVEL_DB, np.abs(batch_magnitude(device.astype(float), fs, freqs) - ideal_db), 0)
+    worst = np.argmax(difference, axis=1)
+    deviation_db = difference[np.arange(len(ideal)), worst]
+
+    stage_radius = pole_radius(device)
+    radius = np.max(stage_radius, axis=1, initial=0)
+    shift = np.max(np.abs(stage_radius - pole_radius(ideal)), axis=1, initial=0)
+
+    # Arithmetic: the same float32 coefficients run in float32 and in float64, on noise followed by silence
+    rng = np.random.default_rng(seed)
+    x = np.concatenate((rng.standard_normal(signal_samples) * 10**(level_db / 20) / np.sqrt(2), np.zeros(tail_samples))).astype(np.float32)
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        y32 = simulate(device, x, structure, np.float32).astype(float)
+        y64 = simulate(device, x, structure, np.float64)
+        overflow = ~np.all(np.isfinite(y32), axis=1)
+        error = np.where(np.isfinite(y32), y32 - y64, 0)
+        noise_dbfs = 10 * np.log10(np.mean(error[:, :signal_samples]**2, axis=1) / 0.5)
+
+        # In the silence the output should keep decaying: a limit cycle holds its level over the last two quarters of the
+        # silence, although the poles should have at least halved it, while the float64 run has decayed well below it
+        quarter = max(1, tail_samples // 4)
+        last = np.max(np.abs(np.nan_to_num(y32[:, -quarter:])), axis=1)
+        before = np.max(np.abs(np.nan_to_num(y32[:, -2*quarter:-quarter])), axis=1)
+        reference = np.max(np.abs(y64[:, -quarter:]), axis=1)
+        tail_dbfs = 20 * np.log10(last)
+    limit_cycle = (last > 0) & (last >= 0.9 * before) & (radius**quarter < 0.5) & (last > 10 * reference) & ~overflow
+
+    return report(structure, deviation_db, freqs[worst], noise_dbfs, tail_dbfs, limit_cycle, overflow, radius, shift)
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
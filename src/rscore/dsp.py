@@ -0,0 +1,228 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               dsp.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        Filter math for the ROOM SHAKER: biquad design and
+#                       frequency response evaluation of biquad cascades.
+#   Application Notes:  Coefficients are in CMSIS-DSP form, [b0, b1, b2, a1, a2],
+#                       i.e. the a coefficients are negated relative to scipy.
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+## DEPENDENCIES
+###############################################################################
+
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+from .config import num_parameters, FS
+from .designer import design
+
+
+###############################################################################
+## FILTER DESIGN AND RESPONSE EVALUATION
+###############################################################################
+
+
+def hz_to_rads(hz):
+    return (hz * math.pi / 180)
+
+def rads_to_hz(rads):
+    return (rads * 180 / math.pi)
+
+def create_low_shelf(FS=FS, F0=50, SHELF_GAIN_dB=3, S=1):
+    # Modeled after the online Biquad Cookbook
+    # https://webaudio.github.io/Audio-EQ-Cookbook/audio-eq-cookbook.html
+    return design("lowshelf", F0, gain_db=SHELF_GAIN_dB, fs=FS, slope=S)[0].tolist()
+
+def create_allpass():
+    return [1.0, 0.0, 0.0, 0.0, 0.0]
+
+# Function to create a log-spaced frequency grid over the band we tune
+def log_grid(f_min=1, f_max=400, num_points=1024):
+    return np.geomspace(f_min, f_max, num_points)
+
+# Class to hold the evaluated frequency response of a biquad cascade
+class response:
+
+    def __init__(self, freqs, H, group_delay):
+        self.freqs = freqs
+        self.H = H
+        self.magnitude_db = 20 * np.log10(np.maximum(np.abs(H), 1e-12))   # Extract gain in dB, clamped so a zero on the grid doesn't produce -inf
+        self.phase_degrees = np.degrees(np.unwrap(np.angle(H)))             # Extract phase in degrees
+        self.group_delay = group_delay                                      # Group delay in seconds
+
+# Function to evaluate each biquad in a (num_filters x 5) coefficient array on a frequency grid
+# Returns the complex response and the group delay (in samples) of every stage as (num_filters x len(freqs)) arrays
+def stage_response(coefs, fs, freqs):
+
+    # NOTE: coefficients are in CMSIS-DSP form, i.e. the a coefficients are negated relative to the scipy/textbook difference equation
+    coefs = np.asarray(coefs, dtype=float).reshape(-1, num_parameters)
+    b = coefs[:, 0:3]
+    a = np.column_stack((np.ones(len(coefs)), -coefs[:, 3], -coefs[:, 4]))
+
+    # Powers of z^-1 on the unit circle, shared by every stage
+    z = np.exp(-2j * np.pi * np.asarray(freqs, dtype=float) / fs)
+    powers = np.stack((np.ones_like(z), z, z * z))
+    k = np.arange(3)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        num = b @ powers
+        den = a @ powers
+        H = num / den
+
+        # Group delay of B/A is the group delay of B minus the group delay of A
+        group_delay = np.real(((b * k) @ powers) / num) - np.real(((a * k) @ powers) / den)
+
+    return H, group_delay
+
+# Function to evaluate the cascaded response of a (num_filters x 5) coefficient array in a single broadcast
+def cascade_response(coefs, fs, freqs):
+    H, group_delay = stage_response(coefs, fs, freqs)
+    return response(np.asarray(freqs), np.prod(H, axis=0), np.sum(group_delay, axis=0) / fs)
+
+# Function to stack cascades with different numbers of stages into one (N x stages x 5) array, padding with pass-through stages
+def stack_cascades(coef_list):
+    coef_list = [np.asarray(coefs, dtype=float).reshape(-1, num_parameters) for coefs in coef_list]
+    stacked = np.tile(create_allpass(), (len(coef_list), max([len(coefs) for coefs in coef_list], default=0), 1))
+    for i, coefs in enumerate(coef_list):
+        stacked[i, :len(coefs)] = coefs
+    return stacked
+
+# Function to get the coefficients of |P(e^jw)|^2 = c0 + c1*phi + c2*phi^2, phi = sin^2(w/2), for polynomials p0 + p1*z^-1 + p2*z^-2
+# This is the cookbook's form; unlike a cosine series it doesn't lose precision near DC, where the bass filters are
+def power_coefs(p):
+    p0, p1, p2 = p[..., 0], p[..., 1], p[..., 2]
+    return np.stack(((p0 + p1 + p2)**2, -4*(p0*p1 + 4*p0*p2 + p1*p2), 16*p0*p2), axis=-1)
+
+# Function to evaluate the magnitude (dB) of N cascades at once; coefs is (N x stages x 5), as from stack_cascades()
+# Uses |B|^2 and |A|^2 as polynomials in sin^2(w/2), so the whole batch is two real matrix products, and takes a single log of
+# the product over the stages; presets are processed `chunk` at a time so the (chunk x stages x freqs) intermediates stay small
+def batch_magnitude(coefs, fs, freqs, chunk=64):
+    coefs = np.asarray(coefs, dtype=float)
+    w = 2 * np.pi * np.asarray(freqs, dtype=float) / fs
+    phi = np.sin(w / 2)**2
+    powers = np.stack((np.ones_like(phi), phi, phi * phi))      # (3 x freqs), shared by every stage
+    num = power_coefs(coefs[..., 0:3])
+    den = power_coefs(np.concatenate((np.ones(coefs.shape[:2] + (1,)), -coefs[..., 3:5]), axis=-1))
+
+    magnitude_db = np.empty((len(coefs), len(w)))
+    for start in range(0, len(coefs), chunk):
+        rows = slice(start, start + chunk)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            power = np.prod((num[rows] @ powers) / (den[rows] @ powers), axis=1)
+        magnitude_db[rows] = 10 * np.log10(np.clip(power, 1e-24, None))   # Same clamp as response(), so zeros don't produce -inf
+    return magnitude_db
+
+# Class to cache the response of individual biquads and keep the cascade product up to date incrementally
+class stage_cache:
+
+    identity = tuple(create_allpass())
+
+    def __init__(self, fs, freqs, max_entries=256, refresh_interval=64):
+        self.fs = fs
+        self.freqs = np.asarray(freqs, dtype=float)
+        self.grid_key = (fs, self.freqs.tobytes())     # Responses are only reusable on the exact same grid
+        self.max_entries = max_entries
+        self.refresh_interval = refresh_interval        # Rebuild the product from scratch every so often so rounding errors can't accumulate
+        self.entries = OrderedDict()
+        self.ones = np.ones(len(self.freqs), dtype=complex)
+        self.zeros = np.zeros(len(self.freqs))
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.identities = 0
+
+        # Current cascade
+        self.stage_keys = []
+        self.stage_H = []
+        self.stage_gd = []
+        self.H_all = self.ones
+        self.gd_all = self.zeros
+        self.incremental_updates = 0
+
+    # Function to get the response of a single biquad, evaluating it only if it isn't cached
+    def lookup(self, coefs):
+        coefs = tuple(coefs)
+
+        # Identity stages (create_allpass) never need evaluating
+        if coefs == self.identity:
+            self.identities += 1
+            return self.ones, self.zeros
+
+        key = (coefs, self.grid_key)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        H, group_delay = stage_response([coefs], self.fs, self.freqs)
+        entry = (H[0], group_delay[0])
+        self.entries[key] = entry
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)    # Evict least recently used
+        return entry
+
+    # Function to evaluate a (num_filters x 5) cascade, re-evaluating only the stages that changed since the last call
+    def evaluate(self, values):
+        keys = [tuple(row) for row in values]
+
+        # Different number of stages, start over
+        if len(keys) != len(self.stage_keys):
+            self.stage_keys = [None] * len(keys)
+            self.stage_H = [self.ones] * len(keys)
+            self.stage_gd = [self.zeros] * len(keys)
+            self.H_all = self.ones
+            self.gd_all = self.zeros
+
+        rebuild = False
+        for i, key in enumerate(keys):
+            if key == self.stage_keys[i]:
+                continue
+            H, group_delay = self.lookup(key)
+
+            # Divide the old stage out and multiply the new one in, unless the old one has a (near) zero on the grid
+            if not rebuild and self.incremental_updates < self.refresh_interval and np.min(np.abs(self.stage_H[i])) > 1e-6:
+                self.H_all = self.H_all / self.stage_H[i] * H
+                self.gd_all = self.gd_all - self.stage_gd[i] + group_delay
+                self.incremental_updates += 1
+            else:
+                rebuild = True
+
+            self.stage_keys[i] = key
+            self.stage_H[i] = H
+            self.stage_gd[i] = group_delay
+
+        if rebuild:
+            self.H_all = np.prod(self.stage_H, axis=0) if self.stage_H else self.ones
+            self.gd_all = np.sum(self.stage_gd, axis=0) if self.stage_gd else self.zeros
+            self.incremental_updates = 0
+
+        return response(self.freqs, self.H_all, self.gd_all / self.fs)
+
+    # Function to report cache counters
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "identities": self.identities, "entries": len(self.entries), "hit_rate": (self.hits / lookups) if lookups else 0.0}
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
@@ -0,0 +1,504 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               emulator.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        Software stand-in for a ROOM SHAKER, to test uploads,
+#                       the reader thread and the GUI without hardware.
+#   Application Notes:  The emulated device parses the byte stream the way the
+#                       firmware does: legacy packets (count, index, float32
+#                       values, 0xAA or 0xBB), reliable frames (0x7E, sequence,
+#                       length, packet, CRC-16, answered with ACK/NAK), 0xDE
+#                       (auto EQ) and 0xC1 (answered with "FILTERS <n>").
+#                       Packets are staged and only applied on 0xBB, and every
+#                       commit is reported with a line of text. A message that
+#                       stops arriving for FRAME_TIMEOUT is dropped.
+#
+#                       Each direction of the link can add latency, limit the
+#                       bandwidth (bytes are delivered in chunks of at most
+#                       10 ms) and lose or corrupt bytes; replies can be lost
+#                       line by line. The device can also send level readings
+#                       ("chatter") at a fixed rate, to load the reader.
+#
+#                       The emulator is reached either through a pseudo
+#                       terminal (Linux/macOS; open_pty() returns the port
+#                       name) or through rsemu:// URLs, which work anywhere a
+#                       pyserial URL does:
+#                           rsemu://?filters=16&latency=0.005&drop=0.001
+#                       Options: filters, legacy (no answer to 0xC1), latency
+#                       (s), bandwidth (bytes/s), uart (bandwidth follows the
+#                       baud rate), drop, corrupt, reply_drop (probabilities),
+#                       chatter (lines/s), seed, and name: ports opened with
+#                       the same name share one device, which keeps its
+#                       coefficients across close and re-open.
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+## DEPENDENCIES
+###############################################################################
+
+import binascii
+import collections
+import os
+import random
+import select
+import struct
+import threading
+import time
+
+from .config import num_filters, num_parameters
+from .comms import MORE, COMMIT, FRAME_START, QUERY_FILTERS, AUTOEQ, FRAME_CRC
+
+
+###############################################################################
+## DEVICE
+###############################################################################
+
+
+IDENTITY = (1.0, 0.0, 0.0, 0.0, 0.0)
+FRAME_TIMEOUT = 0.05                # Seconds of silence after which a partial message is dropped
+MAX_PACKET_VALUES = 32              # First bytes up to this start a legacy packet; anything else unknown is an error
+
+# Class to model the firmware's receive path; no timing or threads, bytes in and reply lines out
+class device:
+
+    def __init__(self, filters=num_filters, answer_query=True, frame_timeout=FRAME_TIMEOUT):
+        self.filters = filters
+        self.answer_query = answer_query            # False for firmware that predates 0xC1
+        self.frame_timeout = frame_timeout
+        self.active = [IDENTITY] * filters          # Coefficients in use, as float32 values
+        self.staged = list(self.active)             # Coefficients received since the last commit
+        self.autoeq = False
+        self.buffer = bytearray()
+        self.last_byte = 0.0
+        self.stats = collections.Counter()
+
+    # Function to take bytes from the host; returns the lines the device sends back
+    def receive(self, data, now):
+        if self.buffer and now - self.last_byte > self.frame_timeout:
+            self.stats["timeouts"] += 1
+            self.buffer.clear()
+        self.last_byte = now
+        self.buffer += data
+        replies = []
+        while self.buffer:
+            used = self.parse(replies)
+            if used == 0:
+                break                               # Wait for the rest of the message
+            del self.buffer[:used]
+        return replies
+
+    # Function to handle the message at the start of the buffer; returns the bytes used, 0 if it's incomplete
+    def parse(self, replies):
+        first = self.buffer[0]
+        if first == FRAME_START:
+            return self.parse_frame(replies)
+        if first == AUTOEQ:
+            self.autoeq = True
+            replies.append("Auto EQ enabled")
+            return 1
+        if first == QUERY_FILTERS:
+            if self.answer_query:
+                replies.append(f"FILTERS {self.filters}")
+            return 1
+        if 0 < first <= MAX_PACKET_VALUES:
+            size = 3 + 4 * first
+            if len(self.buffer) < size:
+                return 0
+            self.apply_packet(bytes(self.buffer[:size]), replies)
+            return size
+        self.stats["errors"] += 1
+        replies.append(f"ERR unexpected byte 0x{first:02X}")
+        return 1
+
+    # Function to handle a reliable-mode frame: 0x7E, sequence, length, packet, CRC-16/CCITT of everything after 0x7E
+    def parse_frame(self, replies):
+        if len(self.buffer) < 3:
+            return 0
+        seq, length = self.buffer[1], self.buffer[2]
+        size = 3 + length + FRAME_CRC.size
+        if len(self.buffer) < size:
+            return 0
+        body = bytes(self.buffer[1:3 + length])
+        if binascii.crc_hqx(body, 0xFFFF) != FRAME_CRC.unpack_from(self.buffer, 3 + length)[0]:
+            self.stats["crc_errors"] += 1
+            replies.append(f"NAK {seq}")
+            resync = self.buffer.find(FRAME_START, 1)       # The length may be wrong too, so look for the next frame
+            return resync if resync > 0 else len(self.buffer)
+        self.stats["frames"] += 1
+        if self.apply_packet(body[2:], replies):
+            replies.append(f"ACK {seq}")
+        else:
+            replies.append(f"NAK {seq}")
+        return size
+
+    # Function to stage the coefficients of one packet, and commit all staged ones on 0xBB; returns False if it was refused
+    def apply_packet(self, packet, replies):
+        count = packet[0] if packet else 0
+        if len(packet) != 3 + 4 * count or count != num_parameters or packet[-1] not in (MORE, COMMIT):
+            self.stats["errors"] += 1
+            replies.append(f"ERR bad packet ({len(packet)} bytes)")
+            return False
+        index = packet[1]
+        if index >= self.filters:
+            self.stats["errors"] += 1
+            replies.append(f"ERR filter {index} out of range")
+            return False
+        self.staged[index] = struct.unpack_from(f'<{count}f', packet, 2)
+        self.stats["packets"] += 1
+        if packet[-1] == COMMIT:
+            changed = sum(1 for old, new in zip(self.active, self.staged) if old != new)
+            self.active = list(self.staged)
+            self.stats["commits"] += 1
+            replies.append(f"Filters updated ({changed} of {self.filters} changed)")
+        return True
+
+
+###############################################################################
+## LINK
+###############################################################################
+
+
+# Class for one direction of the connection: latency, bandwidth and damage
+class link:
+
+    def __init__(self, latency=0.0, bandwidth=None, drop=0.0, corrupt=0.0, rng=None):
+        self.latency = latency
+        self.bandwidth = bandwidth                  # Bytes per second, None for no limit
+        self.drop = drop                            # Probability of losing each byte
+        self.corrupt = corrupt                      # Probability of flipping a bit in each byte
+        self.rng = rng or random.Random(0)
+        self.pending = collections.deque()          # (time due, bytes), in order
+        self.busy_until = 0.0                       # When the last byte put in has been sent
+        self.stats = collections.Counter()
+
+    # Function to send bytes; they become available at the other end as the bandwidth and latency allow
+    def put(self, data, now):
+        data = self.damage(data)
+        if not data:
+            return
+        if not self.bandwidth:
+            self.busy_until = now
+            self.pending.append((now + self.latency, data))
+            return
+        chunk = max(1, int(self.bandwidth * 0.01))
+        sent = max(now, self.busy_until)
+        for i in range(0, len(data), chunk):
+            part = data[i:i + chunk]
+            sent += len(part) / self.bandwidth
+            self.pending.append((sent + self.latency, part))
+        self.busy_until = sent
+
+    def damage(self, data):
+        if not self.drop and not self.corrupt:
+            return bytes(data)
+        out = bytearray()
+        for byte in data:
+            if self.rng.random() < self.drop:
+                self.stats["dropped"] += 1
+                continue
+            if self.rng.random() < self.corrupt:
+                byte ^= 1 << self.rng.randrange(8)
+                self.stats["corrupted"] += 1
+            out.append(byte)
+        return bytes(out)
+
+    # Function to take up to size bytes that have arrived by now
+    def take(self, now, size=None):
+        parts = []
+        taken = 0
+        while self.pending and self.pending[0][0] <= now and (size is None or taken < size):
+            due, part = self.pending[0]
+            if size is not None and taken + len(part) > size:
+                parts.append(part[:size - taken])
+                self.pending[0] = (due, part[size - taken:])
+                taken = size
+                break
+            parts.append(part)
+            taken += len(part)
+            self.pending.popleft()
+        return b''.join(parts)
+
+    # Function to count the bytes that have arrived by now
+    def ready(self, now):
+        return sum(len(part) for due, part in self.pending if due <= now)
+
+    def next_due(self):
+        return self.pending[0][0] if self.pending else None
+
+    def clear(self):
+        self.pending.clear()
+
+
+###############################################################################
+## EMULATOR
+###############################################################################
+
+
+MAX_BACKLOG = 0.01                  # Seconds of queued output beyond which chatter is skipped
+
+# Class to run an emulated device on a worker thread, behind a link in each direction
+class emulator:
+
+    def __init__(self, filters=num_filters, answer_query=True, latency=0.0, bandwidth=None, drop=0.0, corrupt=0.0, reply_drop=0.0, chatter=0.0, seed=0):
+        self.rng = random.Random(seed)
+        self.device = device(filters, answer_query)
+        self.to_device = link(latency, bandwidth, drop, corrupt, self.rng)
+        self.to_host = link(latency, bandwidth, 0.0, 0.0, self.rng)
+        self.reply_drop = reply_drop                # Probability of losing each reply line
+        self.chatter = chatter                      # Level readings sent per second
+        self.on_reply = None                        # Optional callback, called with every line the device sends
+        self.stats = collections.Counter()
+        self.cond = threading.Condition()
+        self.stopping = False
+        self.worker = None
+        self.master = None                          # Pseudo terminal, when open_pty() was called
+        self.slave = None
+        self.wake = None                            # Pipe to wake the pty thread when there is something to send
+        self.pump = None
+
+    def start(self):
+        if self.worker is None:
+            self.stopping = False
+            self.worker = threading.Thread(target=self.run, name="emulator", daemon=True)
+            self.worker.start()
+        return self
+
+    def stop(self):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        for thread in (self.worker, self.pump):
+            if thread is not None:
+                thread.join(timeout=1)
+        self.worker = self.pump = None
+        for fd in (self.master, self.slave) + (self.wake or ()):
+            if fd is not None:
+                os.close(fd)
+        self.master = self.slave = self.wake = None
+
+    # Worker thread: hand bytes to the device as they arrive and queue its replies and chatter
+    def run(self):
+        next_chatter = time.perf_counter()
+        with self.cond:
+            while not self.stopping:
+                now = time.perf_counter()
+                data = self.to_device.take(now)
+                if data:
+                    self.reply(self.device.receive(data, now), now)
+                if self.chatter and now >= next_chatter:
+                    # Like the firmware's transmit buffer, readings that don't fit are skipped rather than delaying the replies
+                    if self.to_host.busy_until - now < MAX_BACKLOG:
+                        self.reply([f"LVL {-40 + 20 * self.rng.random():.1f} {-40 + 20 * self.rng.random():.1f}"], now)
+                    else:
+                        self.stats["chatter_skipped"] += 1
+                    next_chatter = max(next_chatter + 1 / self.chatter, now - 0.1)      # Catch up after a stall, but not forever
+
+                wake = [t for t in (self.to_device.next_due(), next_chatter if self.chatter else None) if t is not None]
+                self.cond.wait(max(0.0, min(wake) - time.perf_counter()) if wake else None)
+
+    def reply(self, lines, now):
+        for line in lines:
+            if self.on_reply is not None:
+                self.on_reply(line)
+            if self.reply_drop and self.rng.random() < self.reply_drop:
+                self.stats["replies_dropped"] += 1
+                continue
+            self.stats["replies"] += 1
+            self.to_host.put((line + "\r\n").encode(), now)
+        if lines:
+            self.cond.notify_all()
+            if self.wake is not None:
+                try:
+                    os.write(self.wake[1], b'\0')
+                except BlockingIOError:
+                    pass                            # Already signalled
+
+    # Function for the host to send bytes to the device
+    def write(self, data):
+        with self.cond:
+            self.to_device.put(data, time.perf_counter())
+            self.cond.notify_all()
+        return len(data)
+
+    # Function for the host to read what the device sent; waits up to timeout for size bytes (None waits forever)
+    def read(self, size=1, timeout=None):
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        data = b''
+        with self.cond:
+            while not self.stopping:
+                now = time.perf_counter()
+                data += self.to_host.take(now, size - len(data))
+                if len(data) >= size or (deadline is not None and now >= deadline):
+                    break
+                wake = [t for t in (self.to_host.next_due(), deadline) if t is not None]
+                self.cond.wait(max(0.0, min(wake) - now) if wake else None)
+        return data
+
+    def in_waiting(self):
+        with self.cond:
+            return self.to_host.ready(time.perf_counter())
+
+    # Function to wait until everything the host wrote has been sent, as tcdrain() does
+    def flush(self):
+        while True:
+            with self.cond:
+                remaining = self.to_device.busy_until - time.perf_counter()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    # Function to wait until the device has received and answered everything sent so far
+    def wait_idle(self, timeout=5.0):
+        deadline = time.perf_counter() + timeout
+        with self.cond:
+            while self.to_device.pending and time.perf_counter() < deadline:
+                self.cond.wait(0.01)
+            return not self.to_device.pending
+
+    # Function to expose the emulator on a pseudo terminal; returns the port name to open
+    def open_pty(self):
+        if not hasattr(os, "openpty"):
+            raise OSError("pseudo terminals are not available on this platform, use an rsemu:// URL instead")
+        import tty
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)                      # No echo or line editing, whoever opens it
+        self.wake = os.pipe()
+        os.set_blocking(self.wake[1], False)
+        self.start()
+        self.pump = threading.Thread(target=self.pump_pty, name="emulator pty", daemon=True)
+        self.pump.start()
+        return os.ttyname(self.slave)
+
+    # Pty thread: move bytes between the pseudo terminal and the links
+    def pump_pty(self):
+        while not self.stopping:
+            with self.cond:
+                due = self.to_host.next_due()
+            wait = 0.05 if due is None else min(0.05, max(0.0, due - time.perf_counter()))
+            try:
+                readable, _, _ = select.select([self.master, self.wake[0]], [], [], wait)
+                if self.wake[0] in readable:
+                    os.read(self.wake[0], 4096)
+                if self.master in readable:
+                    self.write(os.read(self.master, 4096))
+                data = self.read(65536, timeout=0)
+                if data:
+                    os.write(self.master, data)
+            except OSError:
+                time.sleep(wait)                    # Nobody has the port open
+                continue
+
+
+# Emulators opened by name through rsemu:// URLs, so that re-opening a port finds the same device
+_named = {}
+_named_lock = threading.Lock()
+
+# Function to get the emulator with the given name, creating and starting it on first use; later options are ignored
+def named(name, **options):
+    with _named_lock:
+        if name not in _named:
+            _named[name] = emulator(**options).start()
+        return _named[name]
+
+
+###############################################################################
+## LOAD TEST
+###############################################################################
+
+
+# Class to hold the outcome of a load test
+class load_result:
+
+    def __init__(self):
+        self.uploads = 0
+        self.failures = 0
+        self.times = []                             # Seconds per successful upload
+        self.bytes = 0
+        self.retransmissions = 0
+        self.lines = 0
+        self.dropped_lines = 0
+        self.elapsed = 0.0
+        self.verified = False
+        self.device = {}                            # Device and link counters
+        self.errors = []
+
+    def ok(self):
+        return self.failures == 0 and self.verified
+
+    def summary(self):
+        times = sorted(self.times)
+        pick = lambda q: 1000 * times[min(len(times) - 1, int(q * len(times)))] if times else float('nan')
+        busy = sum(times)
+        lines = [f"{self.uploads - self.failures} of {self.uploads} uploads OK in {self.elapsed:.2f} s"
+                 f" (median {pick(0.5):.1f} ms, 99th percentile {pick(0.99):.1f} ms, max {pick(1.0):.1f} ms)",
+                 f"{self.bytes} bytes sent, {self.bytes / busy / 1000 if busy else 0:.1f} kB/s while uploading, {self.retransmissions} retransmissions",
+                 f"{self.lines} lines received ({self.lines / self.elapsed if self.elapsed else 0:.0f}/s), {self.dropped_lines} dropped by the reader queue",
+                 "device: " + ", ".join(f"{key} {value}" for key, value in sorted(self.device.items())),
+                 "final coefficients " + ("match the last upload" if self.verified else "DO NOT match the last upload")]
+        lines += [f"  {error}" for error in self.errors[:10]]
+        return "\n".join(lines)
+
+# Function to upload many presets through sport to an emulator and check the device ends up with the last one
+#   changed:    filters changed between uploads (the others are skipped by the incremental upload); 0 for full uploads
+#   use_pty:    go through a pseudo terminal and the OS serial driver instead of an rsemu:// URL
+#   options:    passed to emulator()
+def load_test(uploads=100, reliable=False, changed=1, use_pty=False, baudrate=115200, window_size=4, ack_timeout=0.25, seed=0, **options):
+    import serial
+    from .comms import sport, upload_error
+
+    res = load_result()
+    name = f"loadtest-{id(res)}"
+    emu = named(name, seed=seed, **options)
+    rng = random.Random(seed + 1)
+    port = sport(baudrate=baudrate, reliable=reliable, timeout=0.05, window_size=window_size, ack_timeout=ack_timeout, max_lines=100000)
+    try:
+        port.bind(emu.open_pty() if use_pty else f"rsemu://?name={name}")
+        count = port.query_filter_count(default=emu.device.filters)
+        values = [[rng.uniform(-2, 2) for _ in range(num_parameters)] for _ in range(count)]
+
+        start = time.perf_counter()
+        for _ in range(uploads):
+            for i in rng.sample(range(count), min(changed, count)) if changed > 0 else range(count):
+                values[i] = [rng.uniform(-2, 2) for _ in range(num_parameters)]
+            res.uploads += 1
+            try:
+                elapsed = port.upload_filters(values, force_full=changed <= 0)
+                res.times.append(elapsed)
+                res.bytes += port.transfers[-1].bytes
+                res.retransmissions += port.transfers[-1].retransmissions
+            except (upload_error, serial.SerialException) as e:
+                res.failures += 1
+                res.errors.append(str(e))
+            res.lines += len(port.read_lines(max_lines=100000))
+
+        emu.wait_idle()
+        time.sleep(0.1 + 2 * emu.to_host.latency)   # Let the last replies reach the reader
+        res.elapsed = time.perf_counter() - start
+        res.lines += len(port.read_lines(max_lines=100000))
+        res.dropped_lines = port.dropped_lines
+        with emu.cond:
+            res.verified = emu.device.active == [struct.unpack(f'<{num_parameters}f', struct.pack(f'<{num_parameters}f', *row)) for row in values]
+            res.device = dict(emu.device.stats + emu.to_device.stats + emu.stats)
+    finally:
+        port.close()
+        emu.stop()
+        with _named_lock:
+            _named.pop(name, None)
+    return res
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
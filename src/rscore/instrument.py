@@ -0,0 +1,176 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               instrument.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        Timing probes for the hot paths, kept in rolling
+#                       windows, with JSON and Chrome trace export.
+#   Application Notes:  Disabled by default; while disabled span() returns a
+#                       shared no-op context manager and timed() calls straight
+#                       through, so the probes can stay in place. Set the
+#                       ROOMSHAKER_PROFILE environment variable to enable them
+#                       from startup. Chrome traces open in chrome://tracing or
+#                       https://ui.perfetto.dev.
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+## DEPENDENCIES
+###############################################################################
+
+import collections
+import contextlib
+import functools
+import json
+import math
+import os
+import threading
+import time
+
+
+###############################################################################
+## PROBES
+###############################################################################
+
+
+NULL_SPAN = contextlib.nullcontext()
+
+# Class to keep the most recent durations of one probe
+class rolling:
+
+    def __init__(self, capacity=1024):
+        self.samples = collections.deque(maxlen=capacity)
+        self.count = 0                          # Since the last reset, not just in the window
+        self.total = 0.0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+    # Function to summarize the window: percentiles in ms and a histogram with power-of-two buckets in us
+    def summary(self):
+        samples = sorted(self.samples)
+        if not samples:
+            return {"count": self.count}
+        pick = lambda q: 1000 * samples[min(len(samples) - 1, int(q * len(samples)))]
+        histogram = collections.Counter(2 ** max(0, math.ceil(math.log2(max(s * 1e6, 1)))) for s in samples)
+        return {"count": self.count,
+                "mean_ms": 1000 * sum(samples) / len(samples),
+                "p50_ms": pick(0.50),
+                "p90_ms": pick(0.90),
+                "p99_ms": pick(0.99),
+                "max_ms": 1000 * samples[-1],
+                "total_ms": 1000 * self.total,
+                "histogram_us": {str(bucket): histogram[bucket] for bucket in sorted(histogram)}}
+
+# Class to time a block of code; made by recorder.span()
+class span:
+
+    __slots__ = ("recorder", "name", "start")
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.recorder.record(self.name, self.start, time.perf_counter())
+        return False
+
+# Class to collect timings from every probe
+class recorder:
+
+    def __init__(self, enabled=False, capacity=1024, max_events=100000):
+        self.enabled = enabled
+        self.capacity = capacity
+        self.windows = {}
+        self.events = collections.deque(maxlen=max_events)     # (name, start, end, thread id), for the trace
+        self.lock = threading.Lock()                           # Probes also run on the serial reader thread
+        self.origin = time.perf_counter()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self.lock:
+            self.windows = {}
+            self.events.clear()
+            self.origin = time.perf_counter()
+
+    # Function to time a block: "with probes.span('name'):"
+    def span(self, name):
+        if not self.enabled:
+            return NULL_SPAN
+        return span(self, name)
+
+    # Decorator to time every call of a function
+    def timed(self, name):
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.record(name, start, time.perf_counter())
+            return wrapper
+        return decorate
+
+    def record(self, name, start, end):
+        with self.lock:
+            stats = self.windows.get(name)
+            if stats is None:
+                stats = self.windows[name] = rolling(self.capacity)
+            stats.add(end - start)
+            self.events.append((name, start, end, threading.get_ident()))
+
+    def summary(self):
+        with self.lock:
+            return {name: stats.summary() for name, stats in sorted(self.windows.items())}
+
+    # Function to format the summary as fixed-width lines, for the overlay
+    def report(self):
+        lines = [f"{'probe':<18}{'n':>6}{'p50':>8}{'p99':>8}{'max':>8}  ms"]
+        for name, stats in self.summary().items():
+            if "p50_ms" in stats:
+                lines.append(f"{name[:18]:<18}{stats['count']:>6}{stats['p50_ms']:>8.2f}{stats['p99_ms']:>8.2f}{stats['max_ms']:>8.2f}")
+        return "\n".join(lines)
+
+    def export_json(self, filename):
+        with open(filename, 'w') as f:
+            json.dump({"probes": self.summary()}, f, indent=4)
+
+    # Function to write the recorded spans in the Chrome trace event format
+    def export_chrome_trace(self, filename):
+        with self.lock:
+            events = list(self.events)
+        pid = os.getpid()
+        trace = [{"name": name, "ph": "X", "ts": 1e6 * (start - self.origin), "dur": 1e6 * (end - start), "pid": pid, "tid": tid}
+                 for name, start, end, tid in events]
+        with open(filename, 'w') as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+
+# Shared recorder used by the GUI and the core modules
+probes = recorder(enabled=bool(os.environ.get("ROOMSHAKER_PROFILE")))
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
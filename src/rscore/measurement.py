@@ -0,0 +1,137 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               measurement.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        Loading and smoothing of measured responses and
+#                       target curves.
+#   Application Notes:  Files are plain text with one point per line:
+#                       frequency (Hz) and level (dB), separated by commas,
+#                       tabs or spaces. Extra columns (e.g. phase) are
+#                       ignored, as are lines starting with *, # or ;. This
+#                       covers REW's "Export measurement as text". Files are
+#                       read and converted in blocks, so exports with
+#                       hundreds of thousands of points load quickly.
+#                       Smoothing averages power over a 1/N octave window
+#                       centred on each output frequency.
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+## DEPENDENCIES
+###############################################################################
+
+import numpy as np
+
+
+###############################################################################
+## MEASUREMENTS
+###############################################################################
+
+
+# Function to convert a block of data lines to (points x 2) frequency/level rows
+# Blocks that don't convert in one go (column headers and the like) are converted line by line, skipping what isn't data
+def parse_block(lines):
+    lines = [line.replace(",", " ") for line in lines]
+    try:
+        return np.loadtxt(lines, usecols=(0, 1), ndmin=2, comments=None)
+    except ValueError:
+        pass
+    rows = []
+    for line in lines:
+        words = line.split()
+        try:
+            rows.append((float(words[0]), float(words[1])))
+        except (ValueError, IndexError):
+            continue
+    return np.array(rows).reshape(-1, 2)
+
+# Function to load a frequency response as (freqs, levels_db), sorted by frequency
+def load_response(filename, block_bytes=1 << 20):
+    blocks = []
+    with open(filename, 'r') as f:
+        while True:
+            lines = f.readlines(block_bytes)
+            if not lines:
+                break
+            lines = [line for line in lines if line.strip() and line.lstrip()[0] not in "*#;"]
+            if lines:
+                blocks.append(parse_block(lines))
+
+    data = np.concatenate(blocks) if blocks else np.zeros((0, 2))
+    data = data[data[:, 0] > 0]             # DC can't be placed on a log axis
+    if len(data) == 0:
+        raise ValueError(f"{filename}: no frequency/level data found")
+
+    order = np.argsort(data[:, 0], kind="stable")
+    return data[order, 0], data[order, 1]
+
+# Function to resample a response onto another frequency grid, interpolating on a log frequency axis
+def resample(freqs, levels_db, grid):
+    return np.interp(np.log(grid), np.log(freqs), levels_db)
+
+# Class to smooth one measurement onto frequency grids
+# The running integral of power over log frequency is computed once, after which any window width on any grid
+# is two interpolations; results are cached, so switching back to a smoothing already seen costs nothing
+class smoother:
+
+    def __init__(self, freqs, levels_db, max_entries=16):
+        self.freqs = np.asarray(freqs, dtype=float)
+        self.levels_db = np.asarray(levels_db, dtype=float)
+        self.octaves = np.log2(self.freqs)
+        self.power = 10 ** (self.levels_db / 10)
+        steps = np.diff(self.octaves)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.slopes = np.where(steps > 0, np.diff(self.power) / steps, 0.0)     # Power is linear between points
+        self.integral = np.concatenate(([0.0], np.cumsum(steps * (self.power[1:] + self.power[:-1]) / 2)))
+        self.max_entries = max_entries          # 0 disables the cache
+        self.cache = {}
+
+    # Function to get the levels (dB) on a grid, smoothed to 1/fraction octave (None for no smoothing)
+    # Grid points outside the measured range are NaN
+    def smooth(self, fraction, grid):
+        grid = np.asarray(grid, dtype=float)
+        key = (fraction, grid.tobytes())
+        levels = self.cache.get(key)
+        if levels is not None:
+            return levels
+
+        centres = np.log2(grid)
+        if not fraction or len(self.freqs) < 2:
+            levels = np.interp(centres, self.octaves, self.levels_db)
+        else:
+            lo = np.maximum(centres - 0.5 / fraction, self.octaves[0])
+            hi = np.minimum(centres + 0.5 / fraction, self.octaves[-1])
+            width = hi - lo
+            area = self.integral_at(hi) - self.integral_at(lo)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mean = np.where(width > 0, area / width, np.interp(centres, self.octaves, self.power))
+                levels = 10 * np.log10(mean)
+        levels[(grid < self.freqs[0]) | (grid > self.freqs[-1])] = np.nan
+
+        if self.max_entries:
+            if len(self.cache) >= self.max_entries:
+                self.cache.pop(next(iter(self.cache)))     # Oldest first
+            self.cache[key] = levels
+        return levels
+
+    # Function to get the integral of power from the first point up to x (in octaves), exact for power linear between points
+    def integral_at(self, x):
+        i = np.clip(np.searchsorted(self.octaves, x, side='right') - 1, 0, len(self.octaves) - 2)
+        dx = x - self.octaves[i]
+        return self.integral[i] + dx * (self.power[i] + dx * self.slopes[i] / 2)
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
@@ -0,0 +1,93 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               params.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        Reading, validating and writing filter parameter
+#                       files.
+#   Application Notes:  A parameter file holds one biquad per line as comma
+#                       separated b0, b1, b2, a1, a2 in CMSIS-DSP form (see
+#                       paramter_files/).
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+## DEPENDENCIES
+###############################################################################
+
+import csv
+import math
+
+from .config import num_filters, num_parameters
+
+
+###############################################################################
+## PARAMETER FILES
+###############################################################################
+
+
+# Function to read a parameter file as rows of strings, exactly as written in the file
+def read_rows(filename):
+    rows = []
+    with open(filename, 'r', newline='') as f:
+        csv_reader = csv.reader(f)
+        for row in csv_reader:
+            row = [word.strip() for word in row]
+            if any(row):                        # Skip blank lines
+                rows.append(row)
+    return rows
+
+# Function to read a parameter file as rows of floats
+def load_params(filename):
+    values = []
+    for i, row in enumerate(read_rows(filename)):
+        try:
+            values.append([float(word) for word in row])
+        except ValueError:
+            raise ValueError(f"{filename}, line {i+1}: not a number in {row}")
+    return values
+
+# Function to write rows of coefficients in the same format as the files in paramter_files/
+def write_params(filename, values):
+    with open(filename, 'w', newline='') as f:
+        for row in values:
+            f.write(", ".join(f"{val:.11f}" for val in row) + "\n")
+
+# Function to check a set of coefficients before it is sent to the device; returns a list of problems (empty if none)
+# Files with fewer filters than the device are fine, the remaining filters are left as they are
+def validate(values, expected_filters=num_filters):
+    errors = []
+    if len(values) == 0:
+        errors.append("no filters found")
+    if expected_filters is not None and len(values) > expected_filters:
+        errors.append(f"the device has {expected_filters} filters, found {len(values)}")
+
+    for i, row in enumerate(values):
+        if len(row) != num_parameters:
+            errors.append(f"filter {i}: expected {num_parameters} coefficients, found {len(row)}")
+            continue
+        if not all(math.isfinite(val) for val in row):
+            errors.append(f"filter {i}: coefficients must be finite")
+            continue
+
+        # Poles of 1 - a1*z^-1 - a2*z^-2 (CMSIS-DSP signs) are inside the unit circle iff (a1, a2) is inside the stability triangle
+        a1, a2 = row[3], row[4]
+        if not (abs(a2) < 1 and abs(a1) < 1 - a2):
+            errors.append(f"filter {i}: unstable (a1={a1}, a2={a2})")
+
+    return errors
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
@@ -0,0 +1,351 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               presets.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        Indexed preset library: an SQLite file holding every
+#                       imported preset with its precomputed response.
+#   Application Notes:  Imports parameter files (as in paramter_files/), BEQ
+#                       catalog JSON files and miniDSP biquad text exported
+#                       by BEQ Designer. Each preset is indexed by title, tags,
+#                       shelf gain and corner frequency, and its magnitude and
+#                       phase on the plot grid are stored with it, so searching
+#                       and previewing never re-parses or re-evaluates.
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+## DEPENDENCIES
+###############################################################################
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+
+import numpy as np
+
+from .config import num_parameters, FS
+from .designer import design
+from .dsp import log_grid, stage_response
+from .params import load_params
+
+
+###############################################################################
+## PARSERS
+###############################################################################
+
+
+# BEQ catalog filter types and the designer types they correspond to
+BEQ_TYPES = {
+    "lowshelf": "lowshelf", "ls": "lowshelf",
+    "highshelf": "highshelf", "hs": "highshelf",
+    "peakingeq": "peaking", "peak": "peaking", "peq": "peaking",
+    "lowpass": "lowpass", "lpf": "lowpass",
+    "highpass": "highpass", "hpf": "highpass",
+}
+
+# Class to hold a parsed preset before it is stored
+class preset:
+
+    def __init__(self, title, coefs, source="", kind="txt", tags=(), year=None, author=None):
+        self.title = title
+        self.coefs = np.asarray(coefs, dtype=float).reshape(-1, num_parameters)
+        self.source = source
+        self.kind = kind
+        self.tags = sorted({tag.strip().lower().replace("|", "/") for tag in tags if tag and tag.strip()})
+        self.year = year
+        self.author = author
+
+# Function to read a parameter file as a preset titled after the file
+def parse_text(filename):
+    title = os.path.splitext(os.path.basename(filename))[0]
+    return [preset(title, load_params(filename), source=filename, kind="txt")]
+
+# Function to read miniDSP biquad text ("biquad1, b0=..., b1=..., ..."), as exported by BEQ Designer
+# miniDSP negates a1 and a2 the same way CMSIS-DSP does, so the values are used as they are
+def parse_minidsp(filename):
+    with open(filename, 'r') as f:
+        text = f.read()
+    rows = []
+    for block in re.split(r"biquad\d*\s*,", text, flags=re.IGNORECASE)[1:]:
+        found = dict(re.findall(r"\b(b0|b1|b2|a1|a2)\s*=\s*([-+0-9.eE]+)", block))
+        try:
+            rows.append([float(found[name]) for name in ("b0", "b1", "b2", "a1", "a2")])
+        except (KeyError, ValueError):
+            raise ValueError(f"{filename}: biquad {len(rows) + 1} is incomplete")
+    if not rows:
+        raise ValueError(f"{filename}: no biquads found")
+    title = os.path.splitext(os.path.basename(filename))[0]
+    return [preset(title, rows, source=filename, kind="minidsp")]
+
+# Function to check the filters of one BEQ catalog entry; returns (types, freqs, qs, gains) for design()
+def beq_filters(filters, fs=FS):
+    kinds, freqs, qs, gains = [], [], [], []
+    for f in filters:
+        kind = BEQ_TYPES.get(str(f.get("type", "")).replace(" ", "").lower())
+        if kind is None:
+            raise ValueError(f"unsupported filter type {f.get('type')!r}")
+        freq, q = float(f["freq"]), float(f.get("q", 0.7071067811865476))
+        if not (0 < freq < fs/2) or q <= 0:
+            raise ValueError(f"filter out of range: {f}")
+        kinds.append(kind)
+        freqs.append(freq)
+        qs.append(q)
+        gains.append(float(f.get("gain", 0.0)))
+    if not kinds:
+        raise ValueError("no filters")
+    return kinds, freqs, qs, gains
+
+# Function to read a BEQ catalog (a JSON list of entries, each with a title and a list of filters)
+# Entries that can't be designed are skipped; returns (presets, number skipped)
+def parse_beq_catalog(filename, fs=FS):
+    with open(filename, 'r', encoding='utf-8') as f:
+        catalog = json.load(f)
+    if isinstance(catalog, dict):
+        catalog = catalog.get("entries") or catalog.get("catalogue") or [catalog]
+
+    # Check every entry, then design the filters of the whole catalog in one call
+    entries, columns, skipped = [], ([], [], [], []), 0
+    for entry in catalog:
+        try:
+            found = beq_filters(entry.get("filters", []), fs)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            skipped += 1
+            continue
+        entries.append((entry, len(found[0])))
+        for column, values in zip(columns, found):
+            column.extend(values)
+    if not entries:
+        return [], skipped
+    kinds, freqs, qs, gains = [np.array(column) for column in columns]
+    coefs = design(kinds, freqs, q=qs, gain_db=gains, fs=fs)
+
+    presets, start = [], 0
+    for entry, stages in entries:
+        tags = list(entry.get("genres", [])) + list(entry.get("audioTypes", [])) + [entry.get("content_type", ""), entry.get("edition", ""), entry.get("language", "")]
+        year = entry.get("year")
+        presets.append(preset(entry.get("title", "untitled"), coefs[start:start+stages], source=entry.get("catalogue_url") or filename, kind="beq", tags=[str(tag) for tag in tags],
+                              year=int(year) if str(year).isdigit() else None, author=entry.get("author")))
+        start += stages
+    return presets, skipped
+
+# Function to read any supported file; returns (presets, number skipped)
+def parse_file(filename):
+    if filename.lower().endswith(".json"):
+        return parse_beq_catalog(filename)
+    with open(filename, 'r') as f:
+        head = f.read(4096)
+    if re.search(r"biquad\d*\s*,", head, flags=re.IGNORECASE):
+        return parse_minidsp(filename), 0
+    return parse_text(filename), 0
+
+
+###############################################################################
+## RESPONSES AND FEATURES
+###############################################################################
+
+
+# Function to evaluate the magnitude (dB) and phase (degrees) of many presets at once, (presets x freqs) each
+# All the stages of all the presets are evaluated in one broadcast and summed per preset in the log domain
+def responses(coef_list, fs, freqs):
+    stages = np.concatenate(coef_list)
+    starts = np.cumsum([0] + [len(coefs) for coefs in coef_list[:-1]])
+    H, _ = stage_response(stages, fs, freqs)
+    magnitude = np.add.reduceat(20 * np.log10(np.maximum(np.abs(H), 1e-12)), starts, axis=0)
+    phase = np.degrees(np.unwrap(np.add.reduceat(np.angle(H), starts, axis=0), axis=1))
+    return magnitude, phase
+
+# Function to summarize a bass EQ response: the largest boost (or smallest cut) up to 100 Hz and
+# the frequency above it where the response falls to half that boost in dB; the corner is None for cuts
+# A grid that starts above 100 Hz is summarized at its lowest point
+def features(freqs, magnitude):
+    bass = np.flatnonzero(freqs <= 100)
+    if len(bass) == 0:
+        bass = np.array([np.argmin(freqs)])
+    k = bass[np.argmax(magnitude[bass])]
+    gain = float(magnitude[k])
+    if gain <= 0:
+        return gain, None
+    below = np.flatnonzero(magnitude[k:] < gain / 2)
+    return gain, float(freqs[k + below[0]]) if len(below) else float(freqs[-1])
+
+
+###############################################################################
+## LIBRARY
+###############################################################################
+
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS presets (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    source TEXT,
+    year INTEGER,
+    author TEXT,
+    tags TEXT NOT NULL,                 -- separated by |
+    stages INTEGER NOT NULL,
+    shelf_gain_db REAL,
+    corner_hz REAL,
+    coefs BLOB NOT NULL,
+    magnitude BLOB NOT NULL,
+    phase BLOB NOT NULL,
+    digest TEXT NOT NULL UNIQUE
+);
+CREATE INDEX IF NOT EXISTS presets_title ON presets (title COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS presets_gain ON presets (shelf_gain_db);
+CREATE INDEX IF NOT EXISTS presets_corner ON presets (corner_hz);
+"""
+
+# Function to find the default library file, in the per-user data directory
+def default_path():
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_DATA_HOME") or os.path.join(os.path.expanduser("~"), ".local", "share")
+    return os.path.join(base, "roomshaker", "presets.sqlite")
+
+# Class to describe a stored preset (without its coefficients and response)
+class entry:
+
+    COLUMNS = "id, title, kind, source, year, author, tags, stages, shelf_gain_db, corner_hz"
+
+    def __init__(self, row):
+        self.id, self.title, self.kind, self.source, self.year, self.author, tags, self.stages, self.shelf_gain_db, self.corner_hz = row
+        self.tags = tags.split("|") if tags else []
+
+    def label(self):
+        year = f" ({self.year})" if self.year else ""
+        gain = f"{self.shelf_gain_db:+.1f} dB" if self.shelf_gain_db is not None else ""
+        corner = f" @ {self.corner_hz:.0f} Hz" if self.corner_hz is not None else ""
+        return f"{self.title}{year}  [{self.stages} biquads, {gain}{corner}]"
+
+# Class to store, index and search presets
+class library:
+
+    def __init__(self, filename=None, fs=FS, f_min=1, f_max=400, num_points=1024):
+        self.filename = filename or default_path()
+        if self.filename != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.filename)), exist_ok=True)
+        self.db = sqlite3.connect(self.filename)
+        self.db.executescript(SCHEMA)
+
+        # Responses are stored on one grid; a library made for another grid (or sample rate) is re-evaluated
+        self.fs = fs
+        self.freqs = log_grid(f_min, f_max, num_points)
+        grid = json.dumps([SCHEMA_VERSION, fs, f_min, f_max, num_points])
+        stored = self.db.execute("SELECT value FROM meta WHERE key = 'grid'").fetchone()
+        if stored is None:
+            self.db.execute("INSERT INTO meta VALUES ('grid', ?)", (grid,))
+            self.db.commit()
+        elif stored[0] != grid:
+            self.recompute()
+            self.db.execute("UPDATE meta SET value = ? WHERE key = 'grid'", (grid,))
+            self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM presets").fetchone()[0]
+
+    # Function to store presets, evaluating their responses in batches; returns the number added (duplicates are ignored)
+    def add(self, presets, batch=512):
+        added = 0
+        with self.db:
+            for i in range(0, len(presets), batch):
+                chunk = [p for p in presets[i:i+batch] if len(p.coefs)]
+                if not chunk:
+                    continue
+                magnitude, phase = responses([p.coefs for p in chunk], self.fs, self.freqs)
+                rows = []
+                for p, mag, ph in zip(chunk, magnitude, phase):
+                    gain, corner = features(self.freqs, mag)
+                    digest = hashlib.sha1(p.title.encode() + p.coefs.tobytes()).hexdigest()
+                    rows.append((p.title, p.kind, p.source, p.year, p.author, "|".join(p.tags), len(p.coefs), gain, corner,
+                                 p.coefs.tobytes(), mag.astype(np.float32).tobytes(), ph.astype(np.float32).tobytes(), digest))
+                before = self.db.total_changes
+                self.db.executemany("INSERT OR IGNORE INTO presets (title, kind, source, year, author, tags, stages, shelf_gain_db, corner_hz, coefs, magnitude, phase, digest) "
+                                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                added += self.db.total_changes - before
+        return added
+
+    # Function to import files of any supported kind; returns (added, skipped)
+    def import_files(self, filenames):
+        presets, skipped = [], 0
+        for filename in filenames:
+            found, bad = parse_file(filename)
+            presets.extend(found)
+            skipped += bad
+        return self.add(presets), skipped
+
+    # Function to re-evaluate every stored response, after the grid or sample rate has changed
+    def recompute(self):
+        rows = self.db.execute("SELECT id, coefs FROM presets").fetchall()
+        if not rows:
+            return
+        coef_list = [np.frombuffer(blob).reshape(-1, num_parameters) for _, blob in rows]
+        magnitude, phase = responses(coef_list, self.fs, self.freqs)
+        with self.db:
+            for (preset_id, _), mag, ph in zip(rows, magnitude, phase):
+                gain, corner = features(self.freqs, mag)
+                self.db.execute("UPDATE presets SET magnitude = ?, phase = ?, shelf_gain_db = ?, corner_hz = ? WHERE id = ?",
+                                (mag.astype(np.float32).tobytes(), ph.astype(np.float32).tobytes(), gain, corner, preset_id))
+
+    # Function to search presets; every given criterion must match
+    #   text:       words that must all appear in the title or tags (case insensitive)
+    #   tags:       tags that must all be present
+    def search(self, text=None, tags=(), min_gain=None, max_gain=None, min_corner=None, max_corner=None, max_stages=None, limit=200):
+        where, args = [], []
+        for word in (text or "").split():
+            where.append("(title LIKE ? OR tags LIKE ?)")
+            args.extend([f"%{word}%"] * 2)
+        for tag in tags:
+            where.append("('|' || tags || '|') LIKE ?")
+            args.append(f"%|{tag.lower()}|%")
+        for column, op, value in (("shelf_gain_db", ">=", min_gain), ("shelf_gain_db", "<=", max_gain),
+                                  ("corner_hz", ">=", min_corner), ("corner_hz", "<=", max_corner), ("stages", "<=", max_stages)):
+            if value is not None:
+                where.append(f"{column} {op} ?")
+                args.append(value)
+
+        query = f"SELECT {entry.COLUMNS} FROM presets"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY title COLLATE NOCASE, year LIMIT ?"
+        return [entry(row) for row in self.db.execute(query, args + [limit])]
+
+    # Function to get the coefficients of a preset, (stages x 5)
+    def coefs(self, preset_id):
+        row = self.db.execute("SELECT coefs FROM presets WHERE id = ?", (preset_id,)).fetchone()
+        if row is None:
+            raise KeyError(preset_id)
+        return np.frombuffer(row[0]).reshape(-1, num_parameters)
+
+    # Function to get the stored magnitude (dB) and phase (degrees) of a preset on self.freqs
+    def response(self, preset_id):
+        row = self.db.execute("SELECT magnitude, phase FROM presets WHERE id = ?", (preset_id,)).fetchone()
+        if row is None:
+            raise KeyError(preset_id)
+        return np.frombuffer(row[0], dtype=np.float32), np.frombuffer(row[1], dtype=np.float32)
+
+    def remove(self, preset_id):
+        with self.db:
+            self.db.execute("DELETE FROM presets WHERE id = ?", (preset_id,))
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
@@ -0,0 +1,152 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               protocol_rsemu.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        pyserial handler for rsemu:// URLs, which connect to
+#                       the device emulator instead of a serial port.
+#   Application Notes:  Found by serial_for_url() because comms.py adds
+#                       "rscore" to serial.protocol_handler_packages. The URL
+#                       options are listed in emulator.py. Each open creates
+#                       a fresh device unless the URL names one.
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+## DEPENDENCIES
+###############################################################################
+
+import urllib.parse
+
+from serial.serialutil import SerialBase, SerialException, PortNotOpenError, to_bytes
+
+from . import emulator
+
+
+###############################################################################
+## URL HANDLER
+###############################################################################
+
+
+# URL option -> (emulator() argument, conversion)
+OPTIONS = {
+    "filters": ("filters", int),
+    "latency": ("latency", float),
+    "bandwidth": ("bandwidth", float),
+    "drop": ("drop", float),
+    "corrupt": ("corrupt", float),
+    "reply_drop": ("reply_drop", float),
+    "chatter": ("chatter", float),
+    "seed": ("seed", int),
+}
+
+# Class to present an emulated device as a pyserial port
+class Serial(SerialBase):
+
+    def __init__(self, *args, **kwargs):
+        self.emulator = None
+        self.owned = False                  # Emulators created for this port are stopped with it; named ones live on
+        self.uart = False                   # The link runs at the baud rate, like a UART bridge instead of USB CDC
+        super().__init__(*args, **kwargs)
+
+    def open(self):
+        if self.is_open:
+            raise SerialException("Port is already open.")
+        if self._port is None:
+            raise SerialException("Port must be configured before it can be used.")
+        name, options = self.from_url(self._port)
+        if name is None:
+            self.emulator = emulator.emulator(**options).start()
+            self.owned = True
+        else:
+            self.emulator = emulator.named(name, **options)
+            self.owned = False
+        self.is_open = True
+        self._reconfigure_port()
+        self.reset_input_buffer()
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            if self.owned:
+                self.emulator.stop()
+        super().close()
+
+    # Function to split an rsemu:// URL into the emulator's name (or None) and its options
+    def from_url(self, url):
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme != "rsemu":
+            raise SerialException(f'expected "rsemu://[?option=value&...]", got {url!r}')
+        name = None
+        options = {}
+        try:
+            for option, values in urllib.parse.parse_qs(parts.query, keep_blank_values=True).items():
+                if option == "name":
+                    name = values[0]
+                elif option == "legacy":
+                    options["answer_query"] = False
+                elif option == "uart":
+                    self.uart = True
+                elif option in OPTIONS:
+                    key, convert = OPTIONS[option]
+                    options[key] = convert(values[0])
+                else:
+                    raise ValueError(f"unknown option {option!r}")
+        except ValueError as e:
+            raise SerialException(f"{url}: {e}")
+        return name, options
+
+    def _reconfigure_port(self):
+        if self.uart and self.emulator is not None:
+            with self.emulator.cond:
+                self.emulator.to_device.bandwidth = self.emulator.to_host.bandwidth = self._baudrate / 10     # 8N1
+
+    @property
+    def in_waiting(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        return self.emulator.in_waiting()
+
+    def read(self, size=1):
+        if not self.is_open:
+            raise PortNotOpenError()
+        if not self.emulator.worker:
+            raise SerialException("the emulated device was stopped")
+        return self.emulator.read(size, self._timeout)
+
+    def write(self, data):
+        if not self.is_open:
+            raise PortNotOpenError()
+        return self.emulator.write(to_bytes(data))
+
+    def flush(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        self.emulator.flush()
+
+    def reset_input_buffer(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        with self.emulator.cond:
+            self.emulator.to_host.clear()
+
+    def reset_output_buffer(self):
+        if not self.is_open:
+            raise PortNotOpenError()
+        with self.emulator.cond:
+            self.emulator.to_device.clear()
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
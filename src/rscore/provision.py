@@ -0,0 +1,120 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               provision.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        Concurrent upload of one parameter set to many ROOM
+#                       SHAKER devices.
+#   Application Notes:  Every device gets its own sport instance on its own
+#                       worker thread, so the total time is that of the
+#                       slowest device. A device only counts as verified when
+#                       the reliable protocol is used, since that is the only
+#                       mode in which the device acknowledges what it received.
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+## DEPENDENCIES
+###############################################################################
+
+import fnmatch
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .comms import sport
+
+
+###############################################################################
+## PROVISIONING
+###############################################################################
+
+
+# Class to hold the outcome of provisioning one device
+class result:
+
+    def __init__(self, port):
+        self.port = port
+        self.ok = False
+        self.verified = False
+        self.message = ""
+        self.output = []
+        self.open_time = 0.0
+        self.upload_time = 0.0
+        self.total_time = 0.0
+        self.transfer = None                # Telemetry of the upload, see comms.transfer
+
+# Function to turn a list of port names, pyserial URLs and globs (e.g. "/dev/ttyACM*", "COM1?") into port names
+# URLs are used as they are, since their query strings contain '?'; a glob that matches nothing raises ValueError
+def expand_ports(patterns, available):
+    ports = []
+    for pattern in patterns:
+        if "://" not in pattern and any(ch in pattern for ch in "*?["):
+            matches = [port for port in available if fnmatch.fnmatch(port, pattern)]
+            if not matches:
+                raise ValueError(f"no ports match {pattern}")
+        else:
+            matches = [pattern]
+        for port in matches:
+            if port not in ports:
+                ports.append(port)
+    return ports
+
+# Function to open, upload to and close a single device
+def provision_one(port, values, baudrate=9600, reliable=False, listen=0.0, timeout=0.1, write_timeout=None, flush=True):
+    res = result(port)
+    start = time.perf_counter()
+    dev = sport(baudrate=baudrate, reliable=reliable, timeout=timeout, write_timeout=write_timeout, flush=flush)
+    try:
+        dev.bind(port)
+        res.open_time = time.perf_counter() - start
+        res.upload_time = dev.upload_filters(values, force_full=True)
+        res.transfer = dev.transfers[-1]
+        res.verified = reliable
+        res.ok = True
+    except Exception as e:
+        res.message = str(e)
+    finally:
+        time.sleep(listen)
+        res.output = dev.read_lines(max_lines=1000)
+        dev.close()
+    res.total_time = time.perf_counter() - start
+    return res
+
+# Function to provision every port in parallel; results are returned in the order of the ports
+def provision(values, ports, max_workers=None, baudrate=9600, reliable=False, listen=0.0, timeout=0.1, write_timeout=None, flush=True):
+    if not ports:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers or len(ports)) as pool:
+        futures = [pool.submit(provision_one, port, values, baudrate, reliable, listen, timeout, write_timeout, flush) for port in ports]
+        return [future.result() for future in futures]
+
+# Function to format results as a plain text table
+def format_table(results):
+    rows = [("PORT", "STATUS", "VERIFIED", "OPEN ms", "UPLOAD ms", "TOTAL ms", "BYTES", "kB/s", "MESSAGE")]
+    for res in results:
+        rows.append((res.port,
+                     "OK" if res.ok else "FAILED",
+                     "yes" if res.verified else "no",
+                     f"{1000*res.open_time:.1f}",
+                     f"{1000*res.upload_time:.1f}",
+                     f"{1000*res.total_time:.1f}",
+                     str(res.transfer.bytes) if res.transfer else "-",
+                     f"{res.transfer.throughput()/1000:.1f}" if res.transfer else "-",
+                     res.message))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows)
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
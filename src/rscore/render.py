@@ -0,0 +1,214 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               render.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        Offline rendering of WAV files through a biquad
+#                       cascade, to audition a preset before uploading it.
+#   Application Notes:  The input is memory-mapped and processed block by
+#                       block with sosfilt, carrying the filter state across
+#                       blocks, and the output is written as it is produced,
+#                       so memory use doesn't depend on the file length.
+#                       Supports PCM 16/24/32 bit and 32 bit float WAV files;
+#                       the output has the same format as the input.
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+## DEPENDENCIES
+###############################################################################
+
+import os
+import struct
+import tempfile
+import time
+
+import numpy as np
+
+
+###############################################################################
+## WAV FILES
+###############################################################################
+
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# Class to describe the sample data of a WAV file
+class wav_info:
+
+    def __init__(self, format_tag, channels, sample_rate, bits, data_offset, data_size):
+        self.format_tag = format_tag
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.bits = bits
+        self.data_offset = data_offset
+        self.data_size = data_size
+        self.frame_size = channels * bits // 8
+        self.frames = data_size // self.frame_size
+
+# Function to find the format and the sample data in a WAV file without reading the samples
+def read_wav_info(filename):
+    with open(filename, 'rb') as f:
+        f.seek(0, 2)
+        file_size = f.tell()
+        f.seek(0)
+        riff, size, wave = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave != b'WAVE':
+            raise ValueError(f"{filename} is not a WAV file")
+
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"{filename} has no data chunk")
+            chunk_id, chunk_size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                raw = f.read(chunk_size)
+                format_tag, channels, sample_rate, _, _, bits = struct.unpack('<HHIIHH', raw[:16])
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(raw) >= 26:
+                    format_tag = struct.unpack('<H', raw[24:26])[0]    # First two bytes of the sub-format GUID
+                fmt = (format_tag, channels, sample_rate, bits)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise ValueError(f"{filename}: data chunk before fmt chunk")
+                info = wav_info(*fmt, f.tell(), min(chunk_size, file_size - f.tell()))   # Recorders that were interrupted leave the size unset
+                break
+            else:
+                f.seek(chunk_size, 1)
+            if chunk_size % 2:
+                f.seek(1, 1)                # Chunks are padded to an even size
+
+    if (info.format_tag, info.bits) not in ((WAVE_FORMAT_PCM, 16), (WAVE_FORMAT_PCM, 24), (WAVE_FORMAT_PCM, 32), (WAVE_FORMAT_IEEE_FLOAT, 32)):
+        raise ValueError(f"{filename}: unsupported sample format (format {info.format_tag}, {info.bits} bit)")
+    return info
+
+# Function to memory-map the samples of a WAV file as a (frames x channels) array, or (frames x channels x 3) bytes for 24 bit
+def map_samples(filename, info):
+    if info.frames == 0:
+        return np.zeros((0, info.channels, 3) if info.bits == 24 else (0, info.channels))     # Empty files can't be mapped
+    if info.bits == 24:
+        return np.memmap(filename, dtype=np.uint8, mode='r', offset=info.data_offset, shape=(info.frames, info.channels, 3))
+    dtype = np.float32 if info.format_tag == WAVE_FORMAT_IEEE_FLOAT else {16: np.int16, 32: np.int32}[info.bits]
+    return np.memmap(filename, dtype=np.dtype(dtype).newbyteorder('<'), mode='r', offset=info.data_offset, shape=(info.frames, info.channels))
+
+# Function to convert a block of samples to float64 in [-1, 1)
+def to_float(block, info):
+    if info.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        return block.astype(np.float64)
+    if info.bits == 24:
+        block = block.astype(np.int32)
+        block = (block[..., 0] | (block[..., 1] << 8) | (block[..., 2] << 16)) << 8 >> 8      # Sign extend
+        return block / float(1 << 23)
+    return block / float(1 << (info.bits - 1))
+
+# Function to convert a block of float64 samples back to the file's sample format, clipping integer formats
+def from_float(block, info):
+    if info.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        return block.astype('<f4').tobytes()
+    scale = float(1 << (info.bits - 1))
+    ints = np.clip(np.round(block * scale), -scale, scale - 1).astype(np.int64)
+    if info.bits == 24:
+        out = np.empty(ints.shape + (3,), dtype=np.uint8)
+        out[..., 0] = ints & 0xFF
+        out[..., 1] = (ints >> 8) & 0xFF
+        out[..., 2] = (ints >> 16) & 0xFF
+        return out.tobytes()
+    return ints.astype({16: '<i2', 32: '<i4'}[info.bits]).tobytes()
+
+# Class to write a WAV file incrementally; the header sizes are filled in on close
+class wav_writer:
+
+    def __init__(self, filename, info):
+        self.f = open(filename, 'wb')
+        self.info = info
+        self.data_size = 0
+        self.f.write(self.header())
+
+    def header(self):
+        byte_rate = self.info.sample_rate * self.info.frame_size
+        fmt = struct.pack('<HHIIHH', self.info.format_tag, self.info.channels, self.info.sample_rate, byte_rate, self.info.frame_size, self.info.bits)
+        return (struct.pack('<4sI4s', b'RIFF', 4 + 8 + len(fmt) + 8 + self.data_size + (self.data_size % 2), b'WAVE') +
+                struct.pack('<4sI', b'fmt ', len(fmt)) + fmt +
+                struct.pack('<4sI', b'data', self.data_size))
+
+    def write(self, data):
+        self.f.write(data)
+        self.data_size += len(data)
+
+    def close(self):
+        if self.data_size % 2:
+            self.f.write(b'\x00')
+        self.f.seek(0)
+        self.f.write(self.header())
+        self.f.close()
+
+
+###############################################################################
+## RENDERING
+###############################################################################
+
+
+# Function to convert CMSIS-DSP coefficients (b0, b1, b2, a1, a2) to scipy second order sections
+def to_sos(coefs):
+    coefs = np.asarray(coefs, dtype=float).reshape(-1, 5)
+    return np.column_stack((coefs[:, 0:3], np.ones(len(coefs)), -coefs[:, 3], -coefs[:, 4]))
+
+# Function to get the process umask, which can only be read by setting it
+def current_umask():
+    mask = os.umask(0o022)
+    os.umask(mask)
+    return mask
+
+# Function to run a WAV file through a biquad cascade; returns (frames, seconds of audio, seconds taken)
+#   progress:   optional callback, called with the fraction done after every block
+# The output is written to a temporary file next to it and renamed at the end, so rendering a file onto itself works
+# (the input stays mapped until the end) and a failed render leaves no partial output behind
+def render(coefs, in_filename, out_filename, block_frames=65536, progress=None):
+    from scipy.signal import sosfilt
+
+    start = time.perf_counter()
+    info = read_wav_info(in_filename)
+    samples = map_samples(in_filename, info)
+    sos = to_sos(coefs)
+    state = np.zeros((len(sos), 2, info.channels))     # Filter state, carried from one block to the next
+
+    fd, temp_filename = tempfile.mkstemp(suffix=".wav", prefix=".render-", dir=os.path.dirname(os.path.abspath(out_filename)))
+    os.close(fd)
+    os.chmod(temp_filename, os.stat(out_filename).st_mode & 0o777 if os.path.exists(out_filename) else 0o666 & ~current_umask())    # mkstemp makes it private
+    done = False
+    try:
+        writer = wav_writer(temp_filename, info)
+        try:
+            for i in range(0, info.frames, block_frames):
+                block = to_float(samples[i:i+block_frames], info)
+                block, state = sosfilt(sos, block, axis=0, zi=state)
+                writer.write(from_float(block, info))
+                if progress is not None:
+                    progress(min(1.0, (i + block_frames) / max(1, info.frames)))
+        finally:
+            writer.close()
+            del samples                                 # Unmap the input before it may be replaced
+        os.replace(temp_filename, out_filename)
+        done = True
+    finally:
+        if not done:
+            os.remove(temp_filename)
+
+    return info.frames, info.frames / info.sample_rate, time.perf_counter() - start
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
@@ -0,0 +1,181 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               telemetry.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        Live measurement data reported by the device, kept in
+#                       fixed-size ring buffers.
+#   Application Notes:  The device reports, one line each:
+#                         LVL <dB> [<dB> ...]           one level per channel
+#                         SPEC <f0> <df> <dB> [...]     spectrum, bin k at
+#                                                       f0 + k*df Hz
+#                       Lines are parsed on the serial reader thread as they
+#                       arrive; memory use is fixed by the ring capacities, so
+#                       it stays flat however long the session runs.
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+## DEPENDENCIES
+###############################################################################
+
+import threading
+import time
+
+import numpy as np
+
+
+###############################################################################
+## RING BUFFERS
+###############################################################################
+
+
+# Class to keep the last `capacity` rows of a (rows x width) array
+class ring:
+
+    def __init__(self, capacity, width=1, dtype=np.float32):
+        self.data = np.zeros((capacity, width), dtype=dtype)
+        self.head = 0                   # Next row to write
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, row):
+        self.data[self.head] = row
+        self.head = (self.head + 1) % len(self.data)
+        self.count = min(self.count + 1, len(self.data))
+
+    # Function to get the rows oldest first, as a copy
+    def ordered(self):
+        if self.count < len(self.data):
+            return self.data[:self.count].copy()
+        return np.concatenate((self.data[self.head:], self.data[:self.head]))
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+
+# Function to reduce a series to at most 2*buckets points, keeping the minimum and maximum of each bucket in time order
+# so that peaks survive however far the plot is zoomed out
+def minmax_decimate(x, y, buckets):
+    n = len(x)
+    if n <= 2 * buckets:
+        return x, y
+    size = n // buckets
+    start = n - size * buckets                  # The oldest few samples don't fill a bucket and are dropped
+    xs = x[start:].reshape(buckets, size)
+    ys = y[start:].reshape(buckets, size)
+    lo = ys.argmin(axis=1)
+    hi = ys.argmax(axis=1)
+    rows = np.arange(buckets)[:, None]
+    picks = np.sort(np.column_stack((lo, hi)), axis=1)
+    return xs[rows, picks].ravel(), ys[rows, picks].ravel()
+
+
+###############################################################################
+## CHANNEL
+###############################################################################
+
+
+# Class to parse telemetry lines and keep their data
+class channel:
+
+    def __init__(self, level_capacity=1 << 18, max_channels=8):
+        self.level_capacity = level_capacity
+        self.max_channels = max_channels
+        self.lock = threading.Lock()        # Written by the serial reader thread, read by the GUI
+        self.version = 0                    # Incremented on every new sample, so readers can skip redraws when nothing changed
+        self.malformed = 0
+        self.origin = time.perf_counter()
+        self.reset_levels(1)
+        self.spectrum_layout = None         # (f0, df, bins) as parsed, so an unchanged layout compares equal exactly
+        self.spectrum_freqs = None
+        self.spectrum = None
+        self.spectrum_peak = None
+
+    def reset_levels(self, channels):
+        self.level_times = ring(self.level_capacity, 1, np.float64)
+        self.levels = ring(self.level_capacity, channels, np.float32)
+
+    # Function to take a line from the device; returns True if it was telemetry (and shouldn't be shown as text)
+    def parse(self, line):
+        if line.startswith("LVL "):
+            handler = self.parse_level
+        elif line.startswith("SPEC "):
+            handler = self.parse_spectrum
+        else:
+            return False
+        try:
+            handler(line.split()[1:])
+        except (ValueError, IndexError):
+            self.malformed += 1
+        return True
+
+    def parse_level(self, words):
+        values = np.array(words, dtype=np.float32)
+        if not 0 < len(values) <= self.max_channels:
+            raise ValueError(words)
+        now = time.perf_counter() - self.origin
+        with self.lock:
+            if len(values) != self.levels.data.shape[1]:
+                self.reset_levels(len(values))          # The number of channels changed, the old history doesn't fit
+            self.level_times.append(now)
+            self.levels.append(values)
+            self.version += 1
+
+    def parse_spectrum(self, words):
+        f0, df = float(words[0]), float(words[1])
+        values = np.array(words[2:], dtype=np.float32)
+        if len(values) == 0 or df <= 0:
+            raise ValueError(words)
+        with self.lock:
+            layout = (f0, df, len(values))
+            if self.spectrum is None or layout != self.spectrum_layout:
+                self.spectrum_layout = layout
+                self.spectrum_freqs = f0 + df * np.arange(len(values))
+                self.spectrum_peak = values.copy()
+            else:
+                np.maximum(self.spectrum_peak, values, out=self.spectrum_peak)
+            self.spectrum = values
+            self.version += 1
+
+    # Function to get the level history of the last `seconds`, decimated to at most 2*buckets points per channel
+    # Returns one (times relative to now, levels) pair per channel
+    def level_history(self, seconds, buckets):
+        with self.lock:
+            times = self.level_times.ordered()[:, 0]
+            levels = self.levels.ordered()
+        now = time.perf_counter() - self.origin
+        start = np.searchsorted(times, now - seconds)     # Times are in order, so the window is a slice
+        times, levels = times[start:] - now, levels[start:]
+        return [minmax_decimate(times, column, buckets) for column in np.ascontiguousarray(levels.T)]
+
+    # Function to get the latest spectrum; returns (freqs, levels, peak hold) or None
+    def latest_spectrum(self):
+        with self.lock:
+            if self.spectrum is None:
+                return None
+            return self.spectrum_freqs, self.spectrum.copy(), self.spectrum_peak.copy()
+
+    def clear(self):
+        with self.lock:
+            self.level_times.clear()
+            self.levels.clear()
+            self.spectrum = self.spectrum_freqs = self.spectrum_peak = self.spectrum_layout = None
+            self.version += 1
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################
@@ -0,0 +1,106 @@
+###############################################################################
+#   Copyright (c) 2025, Nick Blanchard
+#
+#   This software is distributed under the MIT license and may be used and
+#   modified without restrictions.
+#
+#   File:               test_emulator.py
+#   Author:             Nick Blanchard
+#   Contact:            nblanchardaz@gmail.com
+#   Date:               10/16/2026
+#   Revision:           -
+#   Description:        Tests of the upload path against the device emulator,
+#                       through rsemu:// URLs, with and without faults on the
+#                       link.
+#   Application Notes:  Run from src with "python -m unittest discover tests"
+#                       (or "python -m pytest tests"). Needs numpy and
+#                       pyserial, no hardware and no display.
+#   Known Bugs:
+#   TODO:
+###############################################################################
+
+
+###############################################################################
+## DEPENDENCIES
+###############################################################################
+
+import struct
+import unittest
+
+from rscore import emulator
+from rscore.comms import sport
+from rscore.config import num_parameters
+
+
+###############################################################################
+## TESTS
+###############################################################################
+
+
+# Function to round coefficients to the float32 values the device stores
+def as_float32(values):
+    return [struct.unpack(f'<{num_parameters}f', struct.pack(f'<{num_parameters}f', *row)) for row in values]
+
+# Class to test the load test, which uploads random presets and checks what the device committed
+class load_test_cases(unittest.TestCase):
+
+    def test_reliable_upload_survives_faults(self):
+        res = emulator.load_test(uploads=40, reliable=True, changed=2, ack_timeout=0.05, seed=3,
+                                 latency=0.001, drop=0.005, corrupt=0.005, reply_drop=0.02)
+        self.assertTrue(res.verified, res.summary())
+        self.assertEqual(res.failures, 0, res.summary())
+        self.assertGreater(res.device["frames"], 0)
+
+    def test_legacy_upload_on_a_clean_link(self):
+        res = emulator.load_test(uploads=20, reliable=False, changed=1, seed=4)
+        self.assertTrue(res.ok(), res.summary())
+        self.assertEqual(res.device["commits"], 20)
+
+# Class to test the rsemu:// handler through the normal serial port class
+class url_cases(unittest.TestCase):
+
+    def setUp(self):
+        self.name = f"test-{id(self)}"
+        self.port = sport(timeout=0.05, ack_timeout=0.05)
+
+    def tearDown(self):
+        self.port.close()
+        emulator.named(self.name).stop()
+        with emulator._named_lock:
+            emulator._named.pop(self.name, None)
+
+    def test_options_and_upload(self):
+        self.port.bind(f"rsemu://?name={self.name}&filters=8&latency=0.001&drop=0.01&seed=5")
+        self.assertEqual(self.port.query_filter_count(), 8)
+        values = [[0.5 + i, 0.1, 0.0, 0.2 - i / 100, 0.0] for i in range(8)]
+        self.port.upload_filters(values, reliable=True)
+        emu = emulator.named(self.name)
+        emu.wait_idle()
+        with emu.cond:
+            self.assertEqual(emu.device.active, as_float32(values))
+            self.assertGreater(emu.to_device.stats["dropped"], 0)
+
+    def test_named_device_keeps_its_coefficients(self):
+        values = [[1.0, 0.0, 0.0, 0.0, 0.0]] * 6
+        self.port.bind(f"rsemu://?name={self.name}")
+        self.port.upload_filters(values, reliable=True)
+        self.port.close()
+        self.port.bind(f"rsemu://?name={self.name}&filters=16")     # Later options are ignored, it is the same device
+        self.assertEqual(self.port.query_filter_count(), 6)
+        emu = emulator.named(self.name)
+        with emu.cond:
+            self.assertEqual(emu.device.active, as_float32(values))
+
+    def test_legacy_firmware_does_not_answer_the_query(self):
+        self.port.bind(f"rsemu://?name={self.name}&legacy")
+        self.assertIsNone(self.port.query_filter_count(timeout=0.2, default=None))
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+###############################################################################
+# Author                Revision                Date
+#
+# N Blanchard           -                       10/16/2026
+###############################################################################